@@ -0,0 +1,220 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+# Lower numbers are admitted first
+PRIORITY_BOOKING = 0
+PRIORITY_CHAT = 1
+
+
+class AdmissionRejected(Exception):
+    """Raised when a call is shed instead of being sent upstream."""
+
+    def __init__(self, reason):
+        super().__init__(f"LLM call shed: {reason}")
+        self.reason = reason
+
+
+class TokenBucket:
+    """Holds up to `capacity` units and refills `capacity` units per `period` seconds."""
+
+    def __init__(self, capacity, period=60.0):
+        self.capacity = float(capacity)
+        self.refill_rate = self.capacity / period
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` units are available (0 when they already are)."""
+        missing = amount - self.available
+        return max(0.0, missing / self.refill_rate)
+
+
+class AdmissionController:
+    """
+    Per-process gate in front of the LLM provider.
+    Calls must fit the request and token buckets (sized to the provider's
+    per-minute quotas) and a concurrency limit. Waiters queue by priority;
+    when the queue is full or a waiter times out the call is shed.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, max_concurrent, max_queue, max_wait):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self._condition = threading.Condition()
+        self._queue = []  # heap of [priority, sequence, tokens, status, future]
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._admitted = 0
+        self._shed = {'queue_full': 0, 'timeout': 0, 'evicted': 0}
+        self._wait_seconds = 0.0
+
+    def _try_reserve(self, tokens):
+        """Take one request and `tokens` tokens; returns 0, or seconds to wait before retrying."""
+        now = time.monotonic()
+        self.request_bucket.refill(now)
+        self.token_bucket.refill(now)
+        wait = max(self.request_bucket.wait_time(1), self.token_bucket.wait_time(tokens))
+        if wait == 0:
+            self.request_bucket.available -= 1
+            self.token_bucket.available -= tokens
+        return wait
+
+    def _enqueue(self, priority, tokens, future):
+        """Queue a waiter, shedding the lowest-priority, newest one when the queue is full."""
+        waiter = [priority, next(self._sequence), tokens, None, future]
+        if len(self._queue) >= self.max_queue:
+            # Make room by shedding the lowest-priority, newest waiter if this call outranks it
+            worst = max(self._queue)
+            if worst[:2] < waiter[:2]:
+                self._shed['queue_full'] += 1
+                raise AdmissionRejected('queue_full')
+            self._remove(worst)
+            self._resolve(worst, 'evicted')
+        heapq.heappush(self._queue, waiter)
+        return waiter
+
+    def _remove(self, waiter):
+        self._queue.remove(waiter)
+        heapq.heapify(self._queue)
+        self._dispatch()
+
+    def _resolve(self, waiter, status):
+        """Mark a waiter 'admitted' or 'evicted' and wake it, on its own event loop if it is async."""
+        waiter[3] = status
+        future = waiter[4]
+        if future is not None:
+            future.get_loop().call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+        self._condition.notify_all()
+
+    def _dispatch(self):
+        """
+        Admit queued calls in priority order while capacity allows.
+        Returns the seconds until the head of the queue fits the buckets, or None.
+        """
+        while self._queue and self._in_flight < self.max_concurrent:
+            waiter = self._queue[0]
+            wait = self._try_reserve(waiter[2])
+            if wait:
+                return wait
+            heapq.heappop(self._queue)
+            self._in_flight += 1
+            self._admitted += 1
+            self._resolve(waiter, 'admitted')
+        return None
+
+    def _settle(self, waiter, started, deadline):
+        """True once the waiter is admitted; raises AdmissionRejected if it was evicted or timed out."""
+        if waiter[3] == 'admitted':
+            self._wait_seconds += time.monotonic() - started
+            return True
+        if waiter[3] == 'evicted':
+            self._shed['evicted'] += 1
+            raise AdmissionRejected('evicted')
+        if time.monotonic() >= deadline:
+            self._remove(waiter)
+            self._shed['timeout'] += 1
+            raise AdmissionRejected('timeout')
+        return False
+
+    def _limits(self, tokens, timeout):
+        """Return (tokens, started, deadline) for a new waiter."""
+        # A single call larger than the bucket would otherwise wait forever
+        tokens = min(tokens, self.token_bucket.capacity)
+        started = time.monotonic()
+        return tokens, started, started + (self.max_wait if timeout is None else min(self.max_wait, timeout))
+
+    def acquire(self, priority=PRIORITY_CHAT, tokens=0, timeout=None):
+        """
+        Block until the call may go upstream, or raise AdmissionRejected.
+        timeout shortens the wait below max_wait, e.g. to what is left of a request deadline.
+        """
+        tokens, started, deadline = self._limits(tokens, timeout)
+        with self._condition:
+            waiter = self._enqueue(priority, tokens, None)
+            while True:
+                wait = self._dispatch() if waiter[3] is None else None
+                if self._settle(waiter, started, deadline):
+                    return
+                remaining = deadline - time.monotonic()
+                self._condition.wait(remaining if wait is None else min(wait, remaining))
+
+    async def acquire_async(self, priority=PRIORITY_CHAT, tokens=0, timeout=None):
+        """
+        Async variant of acquire. The waiter joins the same priority queue but
+        waits on a future that is resolved from whichever thread frees capacity,
+        so no executor thread is held while it is queued.
+        """
+        tokens, started, deadline = self._limits(tokens, timeout)
+        future = asyncio.get_running_loop().create_future()
+        with self._condition:
+            waiter = self._enqueue(priority, tokens, future)
+        try:
+            while True:
+                with self._condition:
+                    wait = self._dispatch() if waiter[3] is None else None
+                    if self._settle(waiter, started, deadline):
+                        return
+                remaining = deadline - time.monotonic()
+                try:
+                    # Wake when resolved, when the buckets have refilled enough, or at the deadline
+                    await asyncio.wait_for(asyncio.shield(future), remaining if wait is None else min(wait, remaining))
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            with self._condition:
+                if waiter[3] == 'admitted':
+                    # Give the slot back if it was granted after the caller went away
+                    self._in_flight -= 1
+                    self._dispatch()
+                elif waiter[3] is None:
+                    self._remove(waiter)
+            raise
+
+    def release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._dispatch()
+            self._condition.notify_all()
+
+    @contextmanager
+    def admit(self, priority=PRIORITY_CHAT, tokens=0, timeout=None):
+        self.acquire(priority, tokens, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def admit_async(self, priority=PRIORITY_CHAT, tokens=0, timeout=None):
+        await self.acquire_async(priority, tokens, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._condition:
+            shed = sum(self._shed.values())
+            return {
+                'queue_depth': len(self._queue),
+                'queued_bookings': sum(1 for waiter in self._queue if waiter[0] == PRIORITY_BOOKING),
+                'in_flight': self._in_flight,
+                'admitted': self._admitted,
+                'shed': shed,
+                'shed_by_reason': dict(self._shed),
+                'avg_wait_ms': 1000 * self._wait_seconds / self._admitted if self._admitted else 0.0,
+                'requests_available': int(self.request_bucket.available),
+                'tokens_available': int(self.token_bucket.available)
+            }
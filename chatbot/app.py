@@ -1,12 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from chatbot import InsuranceChatbot
+from chatSessions import ChatSessions, parse_batch
+from warmUp import WarmUp
 
 app = Flask(__name__)
 CORS(app)
 
 chatbot = InsuranceChatbot()
 
+# Load models and open the Groq connection in the background; /ready reports when done
+warm_up = WarmUp(chatbot.warm_up_steps())
+warm_up.start()
+
+# Requests with a sessionId get their own conversation; others share the default one
+sessions = ChatSessions(chatbot, chatbot.config.MAX_CHAT_SESSIONS)
+batch_pool = ThreadPoolExecutor(chatbot.config.BATCH_CHAT_WORKERS, thread_name_prefix='chat-batch')
+
+def reply(bot, user_input):
+    """Answer one message in a conversation; returns the /chat response fields."""
+    if bot.booking is not None:
+        # A booking is in progress: this message answers its pending question
+        response = bot.collect_booking(user_input)
+    else:
+        response = bot.handle_intent(user_input)
+        
+        # Check if the response suggests scheduling an appointment
+        if bot.suggests_need_for_appointment(user_input) and not bot.appointment_scheduled:
+            response += " Would you like to schedule an appointment? (yes/no)"
+        
+        # Handle appointment scheduling one question per turn; the terminal form would block the server
+        if user_input.lower() == 'yes' and not bot.appointment_scheduled:
+            response = f"Great! {bot.start_booking()}"
+    
+    bot.save_interaction(user_input, response)
+    return {
+        'response': response,
+        'intent': bot.current_intent,
+        'appointment_scheduled': bot.appointment_scheduled
+    }
+
 @app.route('/chat', methods=['POST'])
 def chat():
     data = request.json
@@ -15,23 +50,48 @@ def chat():
     if not user_input:
         return jsonify({'error': 'No message provided'}), 400
     
-    response = chatbot.handle_intent(user_input)
-    
-    # Check if the response suggests scheduling an appointment
-    if chatbot.suggests_need_for_appointment(user_input) and not chatbot.appointment_scheduled:
-        response += " Would you like to schedule an appointment? (yes/no)"
-    
-    # Handle appointment scheduling
-    if user_input.lower() == 'yes' and not chatbot.appointment_scheduled:
-        appointment_details = chatbot.schedule_appointment()
-        response = f"Great! {appointment_details}"
+    session_id = data.get('sessionId')
+    with chatbot.profiler.profile('chat'), chatbot.tracer.span('chat'):
+        if not session_id:
+            return jsonify(reply(chatbot, user_input))
+        bot, lock = sessions.get(session_id)
+        with lock:
+            return jsonify({'sessionId': session_id, **reply(bot, user_input)})
+
+def answer_session(session_id, items):
+    """Answer one session's batch items in order; a failed item does not stop the rest."""
+    bot, lock = sessions.get(session_id)
+    answered = []
+    with lock:
+        for index, message in items:
+            try:
+                with chatbot.tracer.span('chat', batch=True):
+                    answered.append((index, {'sessionId': session_id, **reply(bot, message)}))
+            except Exception as e:
+                answered.append((index, {'sessionId': session_id, 'error': str(e)}))
+    return answered
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """
+    Answer {"messages": [{"sessionId", "message"}, ...]} in one call, e.g. a burst
+    from a messaging gateway. Sessions are answered concurrently (their LLM calls
+    overlap) and each session's messages in order. Results keep the request order;
+    items that fail carry an 'error' instead of a 'response'.
+    """
+    groups, results, error = parse_batch(request.get_json(silent=True), chatbot.config.BATCH_CHAT_MAX_ITEMS)
+    if error:
+        return jsonify({'error': error}), 400
     
-    chatbot.save_interaction(user_input, response)
+    with chatbot.profiler.profile('chat_batch'):
+        futures = [batch_pool.submit(answer_session, session_id, items) for session_id, items in groups.items()]
+        for future in futures:
+            for index, result in future.result():
+                results[index] = result
     
     return jsonify({
-        'response': response,
-        'intent': chatbot.current_intent,
-        'appointment_scheduled': chatbot.appointment_scheduled
+        'results': results,
+        'errors': sum('error' in result for result in results)
     })
 
 @app.route('/sentiment_analysis', methods=['GET'])
@@ -39,5 +99,34 @@ def get_sentiment_analysis():
     sentiment_stats = chatbot.sentiment_analyzer.get_sentiment_stats(chatbot.conversation_sentiments)
     return jsonify(sentiment_stats)
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 503 until warm-up has finished."""
+    return jsonify(warm_up.status()), 200 if warm_up.ready.is_set() else 503
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return jsonify({
+        'llm_coalescing': chatbot.single_flight.stats(),
+        'tokens': chatbot.token_ledger.stats(),
+        'admission': chatbot.admission.stats(),
+        'post_processing': chatbot.tasks.stats(),
+        'chat_sessions': sessions.stats()
+    })
+
+@app.route('/debug/traces', methods=['GET'])
+def get_traces():
+    limit = request.args.get('limit', type=int)
+    if request.args.get('format') == 'chrome':
+        return jsonify(chatbot.tracer.export_chrome_trace(limit))
+    return jsonify(chatbot.tracer.export_json(limit))
+
+@app.route('/debug/profile', methods=['GET', 'POST'])
+def profile_requests():
+    if request.method == 'POST':
+        data = request.json or {}
+        chatbot.profiler.arm(data.get('requests', 1))
+    return jsonify(chatbot.profiler.status())
+
 if __name__ == '__main__':
     app.run(debug=True , port=5005)
\ No newline at end of file
@@ -1,21 +1,40 @@
 import os
-import csv
+import copy
 import json
+import urllib.request
 from datetime import datetime
+from functools import cached_property
 from dotenv import load_dotenv
-from groq import Groq
-import re
 import random
 
+from requestTracer import Tracer, RequestProfiler
+from singleFlight import SingleFlight, fingerprint
+from faqAnswers import FaqAnswers
+from entityExtractor import EntityExtractor
+from bookingValidator import BookingValidator, write_bookings
+from conversationContext import ConversationContext, ConversationState
+from tokenLedger import TokenLedger
+from transcriptStore import TranscriptStore
+from transcriptIndex import TranscriptIndex
+from conversationFlow import ConversationFlow
+from admissionControl import AdmissionController, AdmissionRejected, PRIORITY_BOOKING, PRIORITY_CHAT
+from taskPipeline import TaskPipeline
+from reminderScheduler import ReminderScheduler
+from funnelMetrics import FunnelMetrics
+
 # Load environment variables
 load_dotenv()
 
 class Config:
     # API Settings
     GROQ_API_KEY = os.getenv('GROQ_API_KEY', '')
+    # Point at test files/mock_llm.py (e.g. http://localhost:8900) for offline load tests
+    GROQ_BASE_URL = os.getenv('GROQ_BASE_URL', 'https://api.groq.com')
     
     # Paths
-    CHATBOT_DATA_PATH = "chatbot_data.csv"
+    # Separate from chatbot.py's data/chat_transcripts: each log has one writing process
+    TRANSCRIPT_DIR = os.getenv('TRANSCRIPT_DIR', os.path.join("data", "transcripts"))
+    TRANSCRIPT_INDEX_PATH = os.getenv('TRANSCRIPT_INDEX_PATH', os.path.join("data", "transcripts.db"))
     APPOINTMENTS_CSV_PATH = "appointments.csv"
     USER_DATA_PATH = "user_data.csv"
     
@@ -32,16 +51,66 @@ class Config:
     # Token Limits
     MAX_SESSION_TOKENS = 2000
     MAX_RESPONSE_TOKENS = 300
+    MAX_PROMPT_TOKENS = 1500
+    
+    # Hugging Face tokenizer matching the Groq model, used for token accounting
+    TOKENIZER_MODEL = os.getenv('TOKENIZER_MODEL', 'meta-llama/Llama-3.2-3B-Instruct')
+    
+    # Interaction Log: time-partitioned segments, compressed on rollover
+    TRANSCRIPT_PARTITION = os.getenv('TRANSCRIPT_PARTITION', 'hour')  # 'hour' or 'day'
+    TRANSCRIPT_RETENTION_DAYS = int(os.getenv('TRANSCRIPT_RETENTION_DAYS', '90'))
+    # Support staff transcript search stays disabled unless this token is set
+    TRANSCRIPT_SEARCH_TOKEN = os.getenv('TRANSCRIPT_SEARCH_TOKEN', '')
+    
+    # Seconds each caller waits for an LLM completion
+    LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '30'))
+    
+    # LLM Admission Control, sized to the provider's per-minute quotas
+    LLM_REQUESTS_PER_MINUTE = int(os.getenv('LLM_REQUESTS_PER_MINUTE', '30'))
+    LLM_TOKENS_PER_MINUTE = int(os.getenv('LLM_TOKENS_PER_MINUTE', '7000'))
+    LLM_MAX_CONCURRENT = 8
+    LLM_MAX_QUEUE = 32  # calls allowed to wait for admission
+    LLM_QUEUE_TIMEOUT = 10  # seconds a call may wait before it is shed
+    
+    # Post-response work (sentiment, transcript logging, notifications) runs off the request path
+    POST_PROCESS_WORKERS = int(os.getenv('POST_PROCESS_WORKERS', '2'))
+    POST_PROCESS_QUEUE = 1000  # tasks allowed to wait before callers run them inline
+    POST_PROCESS_RETRIES = 3
+    # New bookings are POSTed here as JSON when set
+    BOOKING_WEBHOOK_URL = os.getenv('BOOKING_WEBHOOK_URL', '')
+    
+    # Appointment Reminders: fired at each lead time before a booking, plus a
+    # no-show event this long after it unless the customer checked in
+    REMINDER_LEAD_MINUTES = [int(minutes) for minutes in os.getenv('REMINDER_LEAD_MINUTES', '1440,60').split(',')]
+    NO_SHOW_GRACE_MINUTES = 30
+    REMINDER_MAX_LATENESS_MINUTES = 360  # overdue events older than this (e.g. after downtime) are dropped
+    REMINDER_SNAPSHOT_PATH = os.path.join("data", "reminders.snapshot")
+    # Reminder and no-show events are POSTed here as JSON when set
+    REMINDER_WEBHOOK_URL = os.getenv('REMINDER_WEBHOOK_URL', '')
+    
+    # Precomputed FAQ answers written by the RAG ingest step (test files/ingest.py), relative to chatbot/
+    FAQ_INDEX_PATH = os.getenv('FAQ_INDEX_PATH', os.path.join("..", "test files", "vectorstores", "faq_index"))
+    # Trained intent model (intentModel.py train); keyword matching is used until one exists
+    INTENT_MODEL_PATH = os.getenv('INTENT_MODEL_PATH', os.path.join("models", "intent_model"))
+    
+    # Tracing and Profiling
+    TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0.1'))
+    PROFILE_DIR = os.path.join("logs", "profiles")
+    
+    # WebSocket Settings
+    WS_HEARTBEAT_INTERVAL = 20  # seconds between server pings
+    WS_IDLE_TIMEOUT = 60  # close connections silent for longer than this
+    WS_MAX_PENDING_MESSAGES = 8  # per-connection inbound queue size
     
     # Conversation States
-    CONVERSATION_STATES = {
-        'GREETING': 'greeting',
-        'COLLECTING_NAME': 'collecting_name',
-        'UNDERSTANDING_NEED': 'understanding_need',
-        'INSURANCE_DISCUSSION': 'insurance_discussion',
-        'SCHEDULING_APPOINTMENT': 'scheduling_appointment',
-        'FAREWELL': 'farewell'
-    }
+    CONVERSATION_STATES = {state.name: state for state in ConversationState}
+    
+    # Session Storage
+    SESSION_STORE_PATH = os.path.join("data", "sessions.db")
+    SESSION_HISTORY_LIMIT = 20  # turns kept per conversation and sent to the LLM
+    
+    # Turns the transition table could not answer and sent to the LLM
+    FALLTHROUGH_LOG_PATH = os.path.join("logs", "llm_fallthrough.csv")
     
     # Relevance Keywords
     INSURANCE_KEYWORDS = [
@@ -98,45 +167,72 @@ class Config:
             "Perfect timing {name}! I'll help you book a consultation for {insurance_type}.",
             "Excellent choice {name}! Let's set up your {insurance_type} consultation."
         ],
-        
+        'ask_insurance_type': [
+            "Happy to book that for you. Which type of insurance would you like to discuss: " + ", ".join(INSURANCE_TYPES) + "?",
+            "Let's get you booked. Which insurance type is the consultation about?"
+        ],
+        'appointment_declined': [
+            "No problem. Ask me anything about {insurance_type}, and just say when you'd like to book a consultation.",
+            "Sure, no rush. What else would you like to know about {insurance_type}?"
+        ],
+        'booking_saved': [
+            "Perfect! I've scheduled your {insurance_type} consultation with Wing Heights Ghana for {preferred_date} at {preferred_time}. Is there anything else you'd like to know about our insurance services?"
+        ],
+        'busy': [
+            "I'm handling a lot of conversations right now and can't answer that in detail. Please try again in a moment, or ask me to book a consultation with an advisor.",
+            "Our assistant is very busy at the moment. Please ask again shortly, or let me book you a consultation with one of our advisors."
+        ]
     }
 
-class ConversationContext:
-    def __init__(self):
-        self.user_name = None
-        self.insurance_type = None
-        self.current_state = Config.CONVERSATION_STATES['GREETING']
-        self.collected_info = {}
-        self.last_message = None
-        self.appointment_suggested = False
-        self.conversation_history = []
-    
-    def update_state(self, new_state):
-        self.current_state = new_state
-    
-    def set_user_name(self, name):
-        self.user_name = name
-        self.collected_info['name'] = name
-    
-    def set_insurance_type(self, insurance_type):
-        self.insurance_type = insurance_type
-        self.collected_info['insurance_type'] = insurance_type
-    
-    def add_to_history(self, message, role='user'):
-        self.conversation_history.append({
-            'role': role,
-            'content': message,
-            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        })
-        self.last_message = message
+    # Booking details asked for one per turn by web and WebSocket sessions, in this order
+    BOOKING_QUESTIONS = {
+        'name': "May I have your full name for the booking?",
+        'email': "What email address should we send the confirmation to? Say 'skip' if you'd rather not share one.",
+        'mobile': "What mobile number can our advisor reach you on? (10 digits)",
+        'insurance_type': "Which insurance type is the consultation about: " + ", ".join(INSURANCE_TYPES) + "?",
+        'preferred_date': "Which date suits you? (YYYY-MM-DD)",
+        'preferred_time': "And what time? (HH:MM, 24-hour format)"
+    }
+
+    # Conversation Flow: (state, event, action, next state, response template)
+    # Events are intents plus 'name', 'insurance_type', 'confirm', 'decline' and
+    # 'booking_details' (an answer to a booking question) taken from the message;
+    # '*' matches any state. Unmatched turns go to the LLM.
+    CONVERSATION_TRANSITIONS = [
+        ('*', 'greeting', 'greet', None, None),
+        ('*', 'farewell', 'farewell', 'FAREWELL', None),
+        ('*', 'name', 'set_name', 'UNDERSTANDING_NEED', 'name_greeting'),
+        ('GREETING', 'insurance_type', 'set_insurance_type', 'INSURANCE_DISCUSSION', 'insurance_inquiry'),
+        ('UNDERSTANDING_NEED', 'insurance_type', 'set_insurance_type', 'INSURANCE_DISCUSSION', 'insurance_inquiry'),
+        ('INSURANCE_DISCUSSION', 'insurance_type', 'set_insurance_type', 'INSURANCE_DISCUSSION', 'insurance_inquiry'),
+        ('GREETING', 'appointment_request', None, 'UNDERSTANDING_NEED', 'ask_insurance_type'),
+        ('UNDERSTANDING_NEED', 'appointment_request', None, None, 'ask_insurance_type'),
+        ('INSURANCE_DISCUSSION', 'confirm', 'schedule', 'SCHEDULING_APPOINTMENT', None),
+        ('INSURANCE_DISCUSSION', 'appointment_request', 'schedule', 'SCHEDULING_APPOINTMENT', None),
+        ('INSURANCE_DISCUSSION', 'decline', None, None, 'appointment_declined'),
+        ('SCHEDULING_APPOINTMENT', 'booking_details', 'schedule', None, None)
+    ]
 
 class IntentClassifier:
+    # Trained intentModel.HashedIntentModel; keyword matching is used while this is None
+    model = None
+
+    @classmethod
+    def load_model(cls, path):
+        """Use the trained model at `path` if one exists; NumPy is only imported when it does."""
+        if os.path.exists(f"{path}.npy"):
+            from intentModel import HashedIntentModel
+            cls.model = HashedIntentModel.load(path)
+        return cls.model
+
     @staticmethod
     def classify_intent(query, intents):
         """
-        Classify the user's intent based on keyword matching.
+        Classify the user's intent with the trained model, or by keyword matching.
         Returns the most likely intent and confidence score.
         """
+        if IntentClassifier.model is not None:
+            return IntentClassifier.model.classify_intent(query, intents)
         query_lower = query.lower()
         
         intent_matches = {}
@@ -169,26 +265,29 @@ class UserInputCollector:
         if 'name' not in details:
             while True:
                 name = input("Full Name: ").strip()
-                if re.match(r'^[A-Za-z\s]{2,50}$', name):
+                error = BookingValidator.validate_name(name)
+                if not error:
                     details['name'] = name
                     break
-                print("Invalid name. Use only alphabets (2-50 characters).")
+                print(error)
         
         # Email collection
         while True:
             email = input("Email (optional, press Enter to skip): ").strip()
-            if email == "" or re.match(r'^[\w\.-]+@[\w\.-]+\.\w+$', email):
+            error = BookingValidator.validate_email(email)
+            if not error:
                 details['email'] = email or 'Not Provided'
                 break
-            print("Invalid email format. Please try again.")
+            print(error)
         
         # Mobile number collection
         while True:
             mobile = input("Mobile Number: ").strip()
-            if re.match(r'^[0-9]{10}$', mobile):
+            error = BookingValidator.validate_mobile(mobile)
+            if not error:
                 details['mobile'] = mobile
                 break
-            print("Invalid mobile number. Use 10 digits.")
+            print(error)
         
         # Insurance type (if not prefilled)
         if 'insurance_type' not in details:
@@ -207,32 +306,97 @@ class UserInputCollector:
         # Date selection
         while True:
             date = input("Preferred Date (YYYY-MM-DD): ").strip()
-            try:
-                datetime.strptime(date, '%Y-%m-%d')
+            error = BookingValidator.validate_date(date)
+            if not error:
                 details['preferred_date'] = date
                 break
-            except ValueError:
-                print("Invalid date format. Use YYYY-MM-DD.")
+            print(error)
         
         # Time selection
         while True:
             time = input("Preferred Time (HH:MM, 24-hour format): ").strip()
-            try:
-                datetime.strptime(time, '%H:%M')
+            error = BookingValidator.validate_time(time)
+            if not error:
                 details['preferred_time'] = time
                 break
-            except ValueError:
-                print("Invalid time format. Use HH:MM in 24-hour format.")
+            print(error)
         
         details['appointment_needed'] = True
         return details
 
 class InsuranceChatbot:
+    SESSION_LIMIT_RESPONSE = "We've reached the length limit for this conversation. Please start a new chat to continue."
+    
+    # Steps the conversation flow table can trigger, by name
+    FLOW_ACTIONS = {
+        'greet': lambda bot, message, entities: bot.handle_greeting(message, entities),
+        'farewell': lambda bot, message, entities: bot.handle_farewell(),
+        'set_name': lambda bot, message, entities: bot.context.set_user_name(entities.name),
+        'set_insurance_type': lambda bot, message, entities: bot.context.set_insurance_type(entities.insurance_type),
+        'schedule': lambda bot, message, entities: bot.book_appointment(message, entities)
+    }
+    
+    # Only the terminal chat (run) may prompt with input(); servers collect booking details over turns
+    interactive = False
+    # MAX_SESSION_TOKENS applies to per-session bots (new_session) and the terminal chat;
+    # sessionless web requests share the default context, which must never run out
+    limits_session = False
+    
     def __init__(self):
         self.config = Config()
-        self.client = Groq(api_key=self.config.GROQ_API_KEY)
-        self.tokens_count = 0
-        self.context = ConversationContext()
+        self._client = None
+        self._async_client = None
+        self.last_prompt_tokens = 0
+        self.session_id = None
+        self.context = ConversationContext(self.config.SESSION_HISTORY_LIMIT)
+        self.tracer = Tracer(sample_rate=self.config.TRACE_SAMPLE_RATE)
+        # Every context, including restored sessions, reports state changes here
+        self.funnel = FunnelMetrics()
+        ConversationContext.funnel = self.funnel
+        self.profiler = RequestProfiler(output_dir=self.config.PROFILE_DIR)
+        self.single_flight = SingleFlight()
+        self.faq_answers = FaqAnswers(self.config.FAQ_INDEX_PATH)
+        IntentClassifier.load_model(self.config.INTENT_MODEL_PATH)
+        self.entity_extractor = EntityExtractor(self.config.INSURANCE_TYPES)
+        self.admission = AdmissionController(
+            self.config.LLM_REQUESTS_PER_MINUTE,
+            self.config.LLM_TOKENS_PER_MINUTE,
+            self.config.LLM_MAX_CONCURRENT,
+            self.config.LLM_MAX_QUEUE,
+            self.config.LLM_QUEUE_TIMEOUT
+        )
+        self.flow = ConversationFlow(
+            self.config.CONVERSATION_TRANSITIONS,
+            self.FLOW_ACTIONS,
+            self.config.RESPONSE_TEMPLATES,
+            log_path=self.config.FALLTHROUGH_LOG_PATH
+        )
+        self.transcripts = TranscriptStore(
+            self.config.TRANSCRIPT_DIR,
+            self.config.TRANSCRIPT_PARTITION,
+            self.config.TRANSCRIPT_RETENTION_DAYS
+        )
+        self.transcript_index = TranscriptIndex(self.config.TRANSCRIPT_INDEX_PATH)
+        self.tasks = TaskPipeline(
+            self.config.POST_PROCESS_WORKERS,
+            self.config.POST_PROCESS_QUEUE,
+            self.config.POST_PROCESS_RETRIES
+        )
+        self.reminders = ReminderScheduler(
+            self.config.USER_DATA_PATH,
+            self.config.REMINDER_SNAPSHOT_PATH,
+            self.send_reminder,
+            self.report_no_show,
+            self.config.REMINDER_LEAD_MINUTES,
+            self.config.NO_SHOW_GRACE_MINUTES,
+            self.config.REMINDER_MAX_LATENESS_MINUTES
+        )
+        self.token_ledger = TokenLedger(
+            self.config.TOKENIZER_MODEL,
+            self.config.MAX_SESSION_TOKENS,
+            self.config.MAX_RESPONSE_TOKENS,
+            self.config.MAX_PROMPT_TOKENS
+        )
         
         self.messages = [
             {
@@ -250,33 +414,26 @@ class InsuranceChatbot:
     
     def extract_name(self, message):
         """Extract name from introduction messages."""
-        name_patterns = [
-            r"(?i)(?:i am|i'm|this is|name is|call me)\s+([A-Za-z]+)",
-            r"(?i)^([A-Za-z]+)\s+here",
-            r"(?i)^hi|hello|hey\s+(?:this is\s+)?([A-Za-z]+)"
-        ]
-        
-        for pattern in name_patterns:
-            match = re.search(pattern, message)
-            if match:
-                return match.group(1)
-        return None
+        return self.entity_extractor.extract(message).name
 
-    def handle_greeting(self, message):
+    def handle_greeting(self, message, entities=None):
         """Handle greeting messages."""
-        name = self.extract_name(message)
+        name = (entities or self.entity_extractor.extract(message)).name
         if name:
-            name = name.capitalize()
             self.context.set_user_name(name)
             return self.format_response('name_greeting', name=name)
         return self.format_response('greeting')
 
     def extract_insurance_type(self, message):
         """Extract insurance type from user message."""
-        for insurance_type in self.config.INSURANCE_TYPES:
-            if insurance_type.lower() in message.lower():
-                return insurance_type
-        return None
+        return self.entity_extractor.extract(message).insurance_type
+
+    def remember_entities(self, entities):
+        """Keep appointment slots mentioned in chat so the booking form can be prefilled."""
+        for key in ('email', 'mobile', 'preferred_date', 'preferred_time'):
+            value = getattr(entities, key)
+            if value:
+                self.context.collected_info[key] = value
 
     def format_response(self, template_key, **kwargs):
         """Format response template with provided context."""
@@ -308,89 +465,355 @@ class InsuranceChatbot:
 
     def process_message(self, message):
         """Process incoming message and update context."""
-        self.context.add_to_history(message)
+        with self.tracer.span('process_message', state=self.context.current_state):
+            response = self.route_message(message)
+            
+            # If no specific condition is met, get AI response
+            if response is None:
+                response = self.get_ai_response(message)
+            self.record_response(response)
+            return response
+
+    async def process_message_async(self, message):
+        """Async variant of process_message that awaits the LLM call."""
+        with self.tracer.span('process_message', state=self.context.current_state):
+            response = self.route_message(message)
+            
+            if response is None:
+                response = await self.get_ai_response_async(message)
+            self.record_response(response)
+            return response
+
+    async def stream_message_async(self, message):
+        """Yield the reply to a message in chunks as the LLM produces them."""
+        response = self.route_message(message)
+        faq_entry = self.faq_answers.match(message) if response is None else None
+        if faq_entry is not None:
+            response = faq_entry['answer']
+        if response is not None:
+            self.record_response(response)
+            yield response
+            return
+        
+        parts = []
+        try:
+            request = self.prepare_ai_request(message)
+            if request is None:
+                self.record_response(self.SESSION_LIMIT_RESPONSE)
+                yield self.SESSION_LIMIT_RESPONSE
+                return
+            
+            async with self.admission.admit_async(self.llm_priority(), self.last_prompt_tokens + request['max_tokens']):
+                stream = await self.async_client.chat.completions.create(stream=True, **request)
+                
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+        
+        except AdmissionRejected as e:
+            self.tracer.annotate(shed=e.reason)
+            busy = self.format_response('busy')
+            parts.append(busy)
+            yield busy
+        
+        except Exception as e:
+            error = f"I apologize, but I encountered an error: {str(e)}"
+            parts.append(error)
+            yield error
+        
+        self.record_response(''.join(parts))
+
+    def record_response(self, response):
+        """Add the assistant reply and its token count to the history."""
+        self.context.add_to_history(response, role='assistant', tokens=self.token_ledger.count(response))
+
+    def new_session(self, context=None, session_id=None):
+        """Return a chatbot for a separate conversation that shares clients and instrumentation."""
+        session = copy.copy(self)
+        session._client = self.client
+        session._async_client = self.async_client
+        session.session_id = session_id
+        session.context = context or ConversationContext(self.config.SESSION_HISTORY_LIMIT)
+        session.last_prompt_tokens = 0
+        session.limits_session = True
+        return session
+
+    def route_message(self, message):
+        """
+        Update context and answer the message without the LLM where possible.
+        Returns None when the message needs an AI response.
+        """
+        self.context.add_to_history(message, tokens=self.token_ledger.count(message))
+        self.last_prompt_tokens = 0
         
         # Check for greeting intent first
-        intent_classifier = IntentClassifier()
-        intent, confidence = intent_classifier.classify_intent(message.lower(), self.config.INTENTS)
-        
-        # Handle greetings
-        if intent == 'greeting':
-            return self.handle_greeting(message)
-        
-        # Handle farewells
-        if intent == 'farewell':
-            self.context.update_state(Config.CONVERSATION_STATES['FAREWELL'])
-            return self.handle_farewell()
-        
-        # Extract name if not already known
-        if not self.context.user_name:
-            name = self.extract_name(message)
-            if name:
-                self.context.set_user_name(name)
-                self.context.update_state(Config.CONVERSATION_STATES['UNDERSTANDING_NEED'])
-                return self.format_response('name_greeting', name=name)
-        
-        # Extract insurance type if in appropriate state
-        if self.context.current_state == Config.CONVERSATION_STATES['UNDERSTANDING_NEED']:
-            insurance_type = self.extract_insurance_type(message)
-            if insurance_type:
-                self.context.set_insurance_type(insurance_type)
-                self.context.update_state(Config.CONVERSATION_STATES['INSURANCE_DISCUSSION'])
-                return self.format_response('insurance_inquiry', 
-                                         insurance_type=self.context.insurance_type)
+        with self.tracer.span('classify_intent'):
+            intent_classifier = IntentClassifier()
+            intent, confidence = intent_classifier.classify_intent(message.lower(), self.config.INTENTS)
+            self.tracer.annotate(intent=intent, confidence=confidence)
+        
+        # Pull every slot out of the message in one pass
+        with self.tracer.span('extract_entities'):
+            entities = self.entity_extractor.extract(message)
+            self.remember_entities(entities)
+        
+        # Look up the transition for this state and message
+        state = self.context.current_state
+        event, transition = self.flow.resolve(state, self.flow.events(message, intent, entities, self.context))
+        if transition is None:
+            self.flow.record_fallthrough(state, intent, message)
+            self.tracer.annotate(fast_path=False)
+            return None
         
-        # Handle appointment scheduling
-        if "yes" in message.lower() and self.context.current_state == Config.CONVERSATION_STATES['INSURANCE_DISCUSSION']:
-            self.context.update_state(Config.CONVERSATION_STATES['SCHEDULING_APPOINTMENT'])
-            return self.schedule_appointment()
+        self.flow.record_fast_path(state, event)
+        self.tracer.annotate(fast_path=True, event=event)
+        if transition.next_state is not None:
+            self.context.update_state(transition.next_state)
+        
+        response = None
+        if transition.action is not None:
+            response = self.FLOW_ACTIONS[transition.action](self, message, entities)
+        if transition.template is not None:
+            response = self.format_response(transition.template,
+                                            name=self.context.user_name or "there",
+                                            insurance_type=self.context.insurance_type)
+        return response
+
+    @property
+    def client(self):
+        """Groq client, created on first use so importing the bot does not load the SDK."""
+        if self._client is None:
+            from groq import Groq
+            self._client = Groq(api_key=self.config.GROQ_API_KEY, base_url=self.config.GROQ_BASE_URL)
+        return self._client
+
+    @property
+    def async_client(self):
+        """Async Groq client, created on first use."""
+        if self._async_client is None:
+            from groq import AsyncGroq
+            self._async_client = AsyncGroq(api_key=self.config.GROQ_API_KEY, base_url=self.config.GROQ_BASE_URL)
+        return self._async_client
+
+    @cached_property
+    def system_tokens(self):
+        # The system prompt never changes, so count it once (this loads the tokenizer)
+        return sum(self.token_ledger.message_tokens(message['content']) for message in self.messages)
+
+    def warm_up_steps(self, use_async=False):
+        """
+        Work that would otherwise land on the first request, as (name, step) pairs for WarmUp.
+        Async servers open the async client's connection pool instead of the sync one.
+        """
+        return [
+            ('tokenizer', lambda: self.system_tokens),
+            ('llm_connection', self.open_llm_connection_async if use_async else self.open_llm_connection)
+        ]
+
+    def open_llm_connection(self):
+        """Make one cheap API call so the client's pool holds a live TLS connection."""
+        self.client.models.list(timeout=self.config.LLM_TIMEOUT)
+
+    async def open_llm_connection_async(self):
+        await self.async_client.models.list(timeout=self.config.LLM_TIMEOUT)
+
+    def prepare_ai_request(self, query):
+        """
+        Build completion arguments from the system prompt, recent history and the query.
+        Returns None when the session has no tokens left for a reply.
+        """
+        max_tokens = self.token_ledger.response_budget(self.context.session_tokens if self.limits_session else 0)
+        if max_tokens == 0:
+            return None
+        
+        # Add context to the query
+        context_query = query
+        if self.context.user_name:
+            context_query = f"[User: {self.context.user_name}] {query}"
+        if self.context.insurance_type:
+            context_query = f"[Insurance: {self.context.insurance_type}] {context_query}"
+        
+        # The bounded history already ends with this query; send it with its context instead
+        history = self.context.conversation_history
+        if history and history[-1][0] == 'user' and history[-1][1] == query:
+            history = history[:-1]
+        
+        # Drop the oldest turns that do not fit, using the counts stored with each turn
+        reserved_tokens = self.system_tokens + self.token_ledger.message_tokens(context_query)
+        history, self.last_prompt_tokens = self.token_ledger.fit_history(history, reserved_tokens)
+        self.tracer.annotate(prompt_tokens=self.last_prompt_tokens, max_tokens=max_tokens)
+        
+        messages = self.messages + [{"role": role, "content": content} for role, content, _, _ in history]
+        messages.append({
+            "role": "user",
+            "content": context_query
+        })
         
-        # If no specific condition is met, get AI response
-        return self.get_ai_response(message)
+        return {
+            'messages': messages,
+            'model': "llama-3.2-3b-preview",
+            'temperature': 0.7,
+            'max_tokens': max_tokens,
+        }
 
-   
     def get_ai_response(self, query):
         """Generate AI response with context awareness."""
         try:
-            # Add context to the query
-            context_query = query
-            if self.context.user_name:
-                context_query = f"[User: {self.context.user_name}] {query}"
-            if self.context.insurance_type:
-                context_query = f"[Insurance: {self.context.insurance_type}] {context_query}"
+            # Serve vetted FAQ answers without calling the LLM
+            faq_entry = self.faq_answers.match(query)
+            if faq_entry is not None:
+                return faq_entry['answer']
             
-            self.messages.append({
-                "role": "user",
-                "content": context_query
-            })
+            request = self.prepare_ai_request(query)
+            if request is None:
+                return self.SESSION_LIMIT_RESPONSE
             
-            chat_completion = self.client.chat.completions.create(
-                messages=self.messages,
-                model="llama-3.2-3b-preview",
-                temperature=0.7,
-                max_tokens=self.config.MAX_RESPONSE_TOKENS,
-            )
+            with self.tracer.span('llm_call', model=request['model']):
+                chat_completion = self.single_flight.do(
+                    fingerprint(request),
+                    lambda: self.call_llm(request),
+                    timeout=self.config.LLM_TIMEOUT
+                )
             
-            response = chat_completion.choices[0].message.content
+            return chat_completion.choices[0].message.content
+        
+        except AdmissionRejected as e:
+            # Shed load to a template instead of an error when the provider quota is spent
+            self.tracer.annotate(shed=e.reason)
+            return self.format_response('busy')
+        
+        except Exception as e:
+            return f"I apologize, but I encountered an error: {str(e)}"
+
+    async def get_ai_response_async(self, query):
+        """Generate AI response without blocking the event loop."""
+        try:
+            # Serve vetted FAQ answers without calling the LLM
+            faq_entry = self.faq_answers.match(query)
+            if faq_entry is not None:
+                return faq_entry['answer']
             
-            self.messages.append({
-                "role": "assistant",
-                "content": response
-            })
+            request = self.prepare_ai_request(query)
+            if request is None:
+                return self.SESSION_LIMIT_RESPONSE
             
-            return response
+            with self.tracer.span('llm_call', model=request['model']):
+                chat_completion = await self.single_flight.do_async(
+                    fingerprint(request),
+                    lambda: self.call_llm_async(request),
+                    timeout=self.config.LLM_TIMEOUT
+                )
+            
+            return chat_completion.choices[0].message.content
+        
+        except AdmissionRejected as e:
+            self.tracer.annotate(shed=e.reason)
+            return self.format_response('busy')
         
         except Exception as e:
             return f"I apologize, but I encountered an error: {str(e)}"
 
+    def llm_priority(self):
+        """Booking-flow turns are admitted ahead of general chat."""
+        if self.context.current_state == ConversationState.SCHEDULING_APPOINTMENT:
+            return PRIORITY_BOOKING
+        return PRIORITY_CHAT
+
+    def call_llm(self, request):
+        """Send a completion request once admission control lets it through."""
+        with self.admission.admit(self.llm_priority(), self.last_prompt_tokens + request['max_tokens']):
+            return self.client.chat.completions.create(timeout=self.config.LLM_TIMEOUT, **request)
+
+    async def call_llm_async(self, request):
+        async with self.admission.admit_async(self.llm_priority(), self.last_prompt_tokens + request['max_tokens']):
+            return await self.async_client.chat.completions.create(timeout=self.config.LLM_TIMEOUT, **request)
+
+    def book_appointment(self, message, entities):
+        """Book from the terminal form in the CLI, or one question per turn everywhere else."""
+        if self.interactive:
+            return self.schedule_appointment()
+        return self.collect_booking(message, entities)
+
+    def collect_booking(self, message, entities):
+        """
+        Take the answer to the last booking question, then ask for the next missing
+        detail. Slots already mentioned in chat are not asked for again. Once every
+        detail is valid the booking is saved and confirmed.
+        """
+        info = self.context.collected_info
+        awaiting = info.pop('awaiting', None)
+        error = None
+        if awaiting is not None:
+            value, error = self.read_booking_answer(awaiting, message, entities)
+            if error is not None:
+                info.pop(awaiting, None)
+            elif awaiting == 'name':
+                self.context.set_user_name(value)
+            elif awaiting == 'insurance_type':
+                self.context.set_insurance_type(value)
+            else:
+                info[awaiting] = value
+        
+        missing = next((slot for slot in self.config.BOOKING_QUESTIONS if not info.get(slot)), None)
+        if missing is None:
+            # A skipped email is stored as 'Not Provided', which the validator reads as empty
+            booking, errors = BookingValidator.validate(
+                {slot: '' if info[slot] == 'Not Provided' else info[slot] for slot in self.config.BOOKING_QUESTIONS},
+                self.config.INSURANCE_TYPES
+            )
+            if not errors:
+                self.save_user_data(booking)
+                info.update(booking)
+                return self.format_response('booking_saved', **booking)
+            # A detail mentioned earlier in chat did not pass validation; ask for it again
+            missing, error = next(iter(errors.items()))
+            info.pop(missing, None)
+        
+        info['awaiting'] = missing
+        question = self.config.BOOKING_QUESTIONS[missing]
+        return f"{error} {question}" if error else question
+
+    def read_booking_answer(self, slot, message, entities):
+        """Return (value, error) for a reply to the booking question for `slot`."""
+        answer = message.strip()
+        if slot == 'name':
+            name = entities.name
+            if name is None and answer.split() and answer.split()[0].lower() not in self.entity_extractor.NAME_STOPWORDS:
+                name = answer
+            name = name or ""
+            return name, BookingValidator.validate_name(name)
+        if slot == 'email':
+            if answer.lower() in ('skip', 'none') or self.flow.DECLINE_PATTERN.search(answer):
+                return 'Not Provided', None
+            email = entities.email or answer
+            return email, BookingValidator.validate_email(email)
+        if slot == 'mobile':
+            mobile = entities.mobile or answer
+            return mobile, BookingValidator.validate_mobile(mobile)
+        if slot == 'insurance_type':
+            if entities.insurance_type:
+                return entities.insurance_type, None
+            if answer.isdigit() and 1 <= int(answer) <= len(self.config.INSURANCE_TYPES):
+                return self.config.INSURANCE_TYPES[int(answer) - 1], None
+            return None, "Please choose one of the listed insurance types."
+        if slot == 'preferred_date':
+            date = entities.preferred_date or answer
+            return date, BookingValidator.validate_date(date)
+        time = entities.preferred_time or answer
+        return time, BookingValidator.validate_time(time)
+
     def schedule_appointment(self):
         """Enhanced appointment scheduling with context awareness."""
         print(f"\nADA: Great! Let's schedule your {self.context.insurance_type} consultation with Wing Heights Ghana.")
         
         # Pre-fill known information
         prefilled_data = {
-            'name': self.context.user_name,
-            'insurance_type': self.context.insurance_type
+            key: value for key, value in (
+                ('name', self.context.user_name),
+                ('insurance_type', self.context.insurance_type)
+            ) if value
         }
         
         appointment_details = UserInputCollector.collect_user_details(
@@ -408,42 +831,83 @@ class InsuranceChatbot:
 
     def save_user_data(self, user_details):
         """Save user details to CSV."""
-        file_exists = os.path.exists(self.config.USER_DATA_PATH)
-        
-        with open(self.config.USER_DATA_PATH, mode='a', newline='', encoding='utf-8') as file:
-            writer = csv.DictWriter(file, fieldnames=user_details.keys())
-            
-            if not file_exists:
-                writer.writeheader()
-            
-            writer.writerow(user_details)
+        self.save_bookings([user_details])
+
+    def save_bookings(self, bookings):
+        """
+        Append bookings to the user data CSV in one write, then queue their
+        notifications. Chat bookings and bulk imports both go through here.
+        Returns the number of bookings saved.
+        """
+        if not bookings:
+            return 0
+        with self.tracer.span('save_user_data', bookings=len(bookings)):
+            saved = write_bookings(self.config.USER_DATA_PATH, bookings)
+        
+        # The bookings are stored before the reply; the notifications can wait
+        if self.config.BOOKING_WEBHOOK_URL:
+            for booking in bookings:
+                self.tasks.submit('booking_notification', self.notify_booking, dict(booking))
+        # Let the reminder scheduler pick up the new rows now rather than at its next poll
+        self.reminders.wake()
+        return saved
+
+    def notify_booking(self, appointment_details):
+        """POST a new booking to BOOKING_WEBHOOK_URL; errors are raised so the task is retried."""
+        self.post_json(self.config.BOOKING_WEBHOOK_URL, appointment_details)
+
+    def send_reminder(self, booking, minutes_before):
+        """Reminder hook: queue a 'reminder' event for REMINDER_WEBHOOK_URL."""
+        if self.config.REMINDER_WEBHOOK_URL:
+            event = {'event': 'reminder', 'minutes_before': minutes_before, 'booking': booking}
+            self.tasks.submit('appointment_reminder', self.post_json, self.config.REMINDER_WEBHOOK_URL, event)
+
+    def report_no_show(self, booking):
+        """No-show hook: queue a 'no_show' event for REMINDER_WEBHOOK_URL."""
+        if self.config.REMINDER_WEBHOOK_URL:
+            event = {'event': 'no_show', 'booking': booking}
+            self.tasks.submit('appointment_no_show', self.post_json, self.config.REMINDER_WEBHOOK_URL, event)
+
+    def post_json(self, url, payload):
+        """POST payload as JSON; errors are raised so the task is retried."""
+        request = urllib.request.Request(
+            url,
+            data=json.dumps(payload, default=str).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=10):
+            pass
 
     def save_interaction(self, query, response):
-        """Save interaction details to CSV."""
+        """Queue the interaction to be logged after the reply is sent."""
         interaction_data = {
             'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'session_id': self.session_id,
             'name': self.context.user_name or 'Unknown',
             'insurance_type': self.context.insurance_type or 'Not Specified',
             'query': query,
             'response': response,
             'conversation_state': self.context.current_state,
-            'query_tokens': len(query.split()),
-            'response_tokens': len(response.split())
+            'query_tokens': self.token_ledger.count(query),
+            'response_tokens': self.token_ledger.count(response),
+            'prompt_tokens': self.last_prompt_tokens,
+            'session_tokens': self.context.session_tokens
         }
         
-        file_exists = os.path.exists(self.config.CHATBOT_DATA_PATH)
-        
-        with open(self.config.CHATBOT_DATA_PATH, mode='a', newline='', encoding='utf-8') as file:
-            writer = csv.DictWriter(file, fieldnames=interaction_data.keys())
-            
-            if not file_exists:
-                writer.writeheader()
-            
-            writer.writerow(interaction_data)
+        # Keyed by session so one conversation's turns are logged in order
+        self.tasks.submit('log_interaction', self.log_interaction, interaction_data, key=self.session_id or id(self))
+
+    def log_interaction(self, interaction_data):
+        """Append one interaction to the transcript log, then queue its search indexing."""
+        with self.tracer.span('save_interaction'):
+            record = self.transcripts.append(interaction_data)
+        # Indexed as a separate task so a retry never appends the transcript twice
+        self.tasks.submit('index_interaction', self.transcript_index.add, record)
 
     def count_tokens(self, text):
-        """Simple token counting."""
-        return len(text.split())
+        """Count tokens with the model's tokenizer, memoized per text."""
+        return self.token_ledger.count(text)
 
     def handle_farewell(self):
         """Handle farewell state with context-aware goodbye."""
@@ -459,8 +923,10 @@ class InsuranceChatbot:
         print("\nADA: Hello! I'm ADA, your friendly AI assistant.")
         print("     I'm here to help you with any questions you may have.")
         print("     Feel free to introduce yourself and let me know what brings you here today!\n")
+        self.interactive = True
+        self.limits_session = True
         
-        while self.tokens_count <= self.config.MAX_SESSION_TOKENS:
+        while not self.token_ledger.session_exhausted(self.context.session_tokens):
             try:
                 query = input("YOU: ").strip()
                 
@@ -471,15 +937,13 @@ class InsuranceChatbot:
                     print(f"ADA: {farewell}")
                     break
                 
-                # Process message and get response
-                response = self.process_message(query)
-                print(f"ADA: {response}")
-                
-                # Save interaction
-                self.save_interaction(query, response)
-                
-                # Update token count
-                self.tokens_count += (self.count_tokens(query) + self.count_tokens(response))
+                # Process message, save interaction and trace the whole turn
+                with self.profiler.profile('turn'), self.tracer.span('turn'):
+                    response = self.process_message(query)
+                    print(f"ADA: {response}")
+                    
+                    # Save interaction
+                    self.save_interaction(query, response)
                 
             except Exception as e:
                 print(f"An unexpected error occurred: {str(e)}")
@@ -0,0 +1,125 @@
+import asyncio
+
+from quart import Quart, request, jsonify
+from quart_cors import cors
+from chatbot import InsuranceChatbot
+from chatSessions import ChatSessions, parse_batch
+from warmUp import WarmUp
+
+# Async counterpart of app.py: same routes and JSON contract, but the Groq
+# call is awaited and CSV/sentiment work runs in a worker thread.
+# Serve with an ASGI server, e.g. `hypercorn asyncApp:app --bind 0.0.0.0:5005`
+app = cors(Quart(__name__))
+
+chatbot = InsuranceChatbot()
+warm_up = WarmUp(chatbot.warm_up_steps(use_async=True))
+# Requests with a sessionId get their own conversation; others share the default one
+sessions = ChatSessions(chatbot, chatbot.config.MAX_CHAT_SESSIONS, lock_factory=asyncio.Lock)
+
+@app.before_serving
+async def start_warm_up():
+    # Not awaited: the server accepts connections (and answers /ready) while models load
+    app.add_background_task(warm_up.run_async)
+
+async def reply(bot, user_input):
+    """Answer one message in a conversation; returns the /chat response fields."""
+    if bot.booking is not None:
+        # A booking is in progress: this message answers its pending question (the last one writes the CSV)
+        response = await asyncio.to_thread(bot.collect_booking, user_input)
+    else:
+        response = await bot.handle_intent_async(user_input)
+        
+        # Check if the response suggests scheduling an appointment
+        if bot.suggests_need_for_appointment(user_input) and not bot.appointment_scheduled:
+            response += " Would you like to schedule an appointment? (yes/no)"
+        
+        # Handle appointment scheduling one question per turn; the terminal form would block the server
+        if user_input.lower() == 'yes' and not bot.appointment_scheduled:
+            response = f"Great! {bot.start_booking()}"
+    
+    # Only queues post-response work; the thread hop keeps an inline run (queue full) off the event loop
+    await asyncio.to_thread(bot.save_interaction, user_input, response)
+    return {
+        'response': response,
+        'intent': bot.current_intent,
+        'appointment_scheduled': bot.appointment_scheduled
+    }
+
+@app.route('/chat', methods=['POST'])
+async def chat():
+    data = await request.get_json()
+    user_input = data.get('message')
+    
+    if not user_input:
+        return jsonify({'error': 'No message provided'}), 400
+    
+    session_id = data.get('sessionId')
+    with chatbot.tracer.span('chat'):
+        if not session_id:
+            return jsonify(await reply(chatbot, user_input))
+        bot, lock = sessions.get(session_id)
+        async with lock:
+            return jsonify({'sessionId': session_id, **await reply(bot, user_input)})
+
+async def answer_session(session_id, items):
+    """Answer one session's batch items in order; a failed item does not stop the rest."""
+    bot, lock = sessions.get(session_id)
+    answered = []
+    async with lock:
+        for index, message in items:
+            try:
+                with chatbot.tracer.span('chat', batch=True):
+                    answered.append((index, {'sessionId': session_id, **await reply(bot, message)}))
+            except Exception as e:
+                answered.append((index, {'sessionId': session_id, 'error': str(e)}))
+    return answered
+
+@app.route('/chat/batch', methods=['POST'])
+async def chat_batch():
+    """
+    Answer {"messages": [{"sessionId", "message"}, ...]} in one call.
+    Sessions run as concurrent tasks, each session's messages in order.
+    """
+    groups, results, error = parse_batch(await request.get_json(silent=True), chatbot.config.BATCH_CHAT_MAX_ITEMS)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    answered = await asyncio.gather(*(answer_session(session_id, items) for session_id, items in groups.items()))
+    for session_results in answered:
+        for index, result in session_results:
+            results[index] = result
+    
+    return jsonify({
+        'results': results,
+        'errors': sum('error' in result for result in results)
+    })
+
+@app.route('/sentiment_analysis', methods=['GET'])
+async def get_sentiment_analysis():
+    sentiment_stats = chatbot.sentiment_analyzer.get_sentiment_stats(chatbot.conversation_sentiments)
+    return jsonify(sentiment_stats)
+
+@app.route('/ready', methods=['GET'])
+async def ready():
+    """Readiness probe: 503 until warm-up has finished."""
+    return jsonify(warm_up.status()), 200 if warm_up.ready.is_set() else 503
+
+@app.route('/metrics', methods=['GET'])
+async def get_metrics():
+    return jsonify({
+        'llm_coalescing': chatbot.single_flight.stats(),
+        'tokens': chatbot.token_ledger.stats(),
+        'admission': chatbot.admission.stats(),
+        'post_processing': chatbot.tasks.stats(),
+        'chat_sessions': sessions.stats()
+    })
+
+@app.route('/debug/traces', methods=['GET'])
+async def get_traces():
+    limit = request.args.get('limit', type=int)
+    if request.args.get('format') == 'chrome':
+        return jsonify(chatbot.tracer.export_chrome_trace(limit))
+    return jsonify(chatbot.tracer.export_json(limit))
+
+if __name__ == '__main__':
+    app.run(debug=True, port=5005)
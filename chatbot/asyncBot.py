@@ -0,0 +1,293 @@
+import asyncio
+import hmac
+import json
+import time
+
+from quart import Quart, request, jsonify, websocket
+from quart_cors import cors
+from appointmentBot import InsuranceChatbot, ConversationContext, validate_environment, create_data_directories
+from sessionStore import SessionStore
+from bookingValidator import BookingValidator
+from connectionMetrics import ConnectionMetrics
+from transcriptStore import parse_time
+from warmUp import WarmUp
+
+# Async counterpart of bot.py: same routes and JSON contract, but the Groq
+# call is awaited so a slow completion no longer pins a worker thread.
+# Serve with an ASGI server, e.g. `hypercorn asyncBot:app --bind 0.0.0.0:5005`
+app = cors(Quart(__name__))
+
+# Initialize chatbot
+if validate_environment():
+    create_data_directories()
+    chatbot = InsuranceChatbot()
+else:
+    raise Exception("Environment validation failed")
+
+session_store = SessionStore(chatbot.config.SESSION_STORE_PATH)
+warm_up = WarmUp(chatbot.warm_up_steps(use_async=True))
+
+@app.before_serving
+async def start_warm_up():
+    # Not awaited: the server accepts connections (and answers /ready) while models load
+    app.add_background_task(warm_up.run_async)
+    # Reminder and no-show events for stored bookings, on their own thread
+    chatbot.reminders.start()
+
+def load_session(session_id):
+    """Chatbot bound to a stored conversation, or the shared one when no session id is given."""
+    if not session_id:
+        return chatbot
+    return chatbot.new_session(session_store.load(session_id), session_id)
+
+connection_metrics = ConnectionMetrics()
+
+def session_state(session):
+    """Conversation state sent to clients after each reply."""
+    return {
+        'state': session.context.current_state,
+        'userDetails': {
+            'name': session.context.user_name,
+            'insuranceType': session.context.insurance_type,
+            'collectedInfo': session.context.collected_info
+        }
+    }
+
+@app.route('/api/chat', methods=['POST'])
+async def chat():
+    try:
+        data = await request.get_json()
+        message = data.get('message')
+        action = data.get('action', 'chat')  # Default action is chat
+        
+        if not message and action == 'chat':
+            return jsonify({'error': 'No message provided'}), 400
+
+        # Conversations with a session id are stored and can be resumed by any worker
+        session_id = data.get('sessionId')
+        bot = load_session(session_id)
+
+        response_data = {
+            'response': '',
+            'insuranceTypes': bot.config.INSURANCE_TYPES
+        }
+
+        # Handle different actions
+        if action == 'chat':
+            with chatbot.tracer.span('api_chat'):
+                response = await bot.process_message_async(message)
+            await asyncio.to_thread(bot.save_interaction, message, response)
+            response_data['response'] = response
+            
+        elif action == 'schedule':
+            # Handle appointment scheduling
+            appointment_details, errors = BookingValidator.validate({
+                'name': data.get('name'),
+                'email': data.get('email'),
+                'mobile': data.get('mobile'),
+                'insurance_type': data.get('insuranceType'),
+                'preferred_date': data.get('preferredDate'),
+                'preferred_time': data.get('preferredTime')
+            }, bot.config.INSURANCE_TYPES)
+            
+            if errors:
+                return jsonify({'error': 'Invalid appointment details', 'fieldErrors': errors}), 400
+            
+            bot.context.set_user_name(appointment_details['name'])
+            bot.context.set_insurance_type(appointment_details['insurance_type'])
+            # Keep the CSV write off the event loop
+            await asyncio.to_thread(bot.save_user_data, appointment_details)
+            bot.context.collected_info.update(appointment_details)
+            
+            response_data['response'] = f"Appointment scheduled for {appointment_details['preferred_date']} at {appointment_details['preferred_time']}"
+            
+        elif action == 'reset':
+            bot.context = ConversationContext(bot.config.SESSION_HISTORY_LIMIT)
+            response_data['response'] = "Conversation reset successfully"
+        
+        # Report state after the action so details mentioned in chat can prefill the booking form
+        response_data['state'] = bot.context.current_state
+        response_data['userDetails'] = {
+            'name': bot.context.user_name,
+            'insuranceType': bot.context.insurance_type,
+            'collectedInfo': bot.context.collected_info
+        }
+
+        if session_id:
+            await asyncio.to_thread(session_store.save, session_id, bot.context)
+            response_data['sessionId'] = session_id
+            
+        return jsonify(response_data)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.websocket('/ws/chat')
+async def chat_socket():
+    """
+    Persistent chat connection bound to one conversation session.
+    Client frames: {"type": "message", "message": ...}, {"type": "ping"}, {"type": "pong"}.
+    Server frames: "ready" on connect, "chunk" deltas followed by "done",
+    plus "ping", "pong" and "error".
+    """
+    # Resume a stored conversation when the client passes ?sessionId=...
+    session_id = websocket.args.get('sessionId')
+    if session_id:
+        session = chatbot.new_session(await asyncio.to_thread(session_store.load, session_id), session_id)
+    else:
+        session = chatbot.new_session()
+    config = chatbot.config
+    inbox = asyncio.Queue(maxsize=config.WS_MAX_PENDING_MESSAGES)
+    last_seen = time.monotonic()
+    connection_metrics.connection_opened()
+
+    async def send(payload):
+        await websocket.send(json.dumps(payload))
+        connection_metrics.message_sent()
+
+    async def receive_loop():
+        nonlocal last_seen
+        while True:
+            raw = await websocket.receive()
+            last_seen = time.monotonic()
+            connection_metrics.message_received()
+            
+            try:
+                payload = json.loads(raw)
+            except ValueError:
+                await send({'type': 'error', 'error': 'Invalid JSON frame'})
+                continue
+            
+            kind = payload.get('type', 'message')
+            if kind == 'ping':
+                await send({'type': 'pong'})
+            elif kind == 'message':
+                message = payload.get('message')
+                if not message:
+                    await send({'type': 'error', 'error': 'No message provided'})
+                    continue
+                # Backpressure: refuse new messages while too many are pending
+                try:
+                    inbox.put_nowait(message)
+                except asyncio.QueueFull:
+                    connection_metrics.message_dropped()
+                    await send({'type': 'error', 'error': 'Too many pending messages', 'message': message})
+
+    async def heartbeat_loop():
+        while True:
+            await asyncio.sleep(config.WS_HEARTBEAT_INTERVAL)
+            if time.monotonic() - last_seen > config.WS_IDLE_TIMEOUT:
+                connection_metrics.heartbeat_timed_out()
+                await websocket.close(1001)
+                return
+            await send({'type': 'ping'})
+
+    async def process_loop():
+        while True:
+            message = await inbox.get()
+            parts = []
+            with chatbot.tracer.span('ws_message'):
+                async for delta in session.stream_message_async(message):
+                    parts.append(delta)
+                    await send({'type': 'chunk', 'delta': delta})
+            await asyncio.to_thread(session.save_interaction, message, ''.join(parts))
+            if session_id:
+                await asyncio.to_thread(session_store.save, session_id, session.context)
+            await send(dict(session_state(session), type='done', response=''.join(parts)))
+
+    await send(dict(session_state(session), type='ready', insuranceTypes=config.INSURANCE_TYPES))
+
+    tasks = [
+        asyncio.create_task(receive_loop()),
+        asyncio.create_task(heartbeat_loop()),
+        asyncio.create_task(process_loop())
+    ]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        connection_metrics.connection_closed()
+
+@app.route('/ws/metrics', methods=['GET'])
+async def get_socket_metrics():
+    return jsonify(connection_metrics.snapshot())
+
+def support_authorized():
+    """Support endpoints are off unless TRANSCRIPT_SEARCH_TOKEN is set and the caller sends it."""
+    token = chatbot.config.TRANSCRIPT_SEARCH_TOKEN
+    return bool(token) and hmac.compare_digest(request.headers.get('X-Support-Token', ''), token)
+
+@app.route('/api/transcripts/search', methods=['GET'])
+async def search_transcripts():
+    """Find logged turns by text (q), time range (start/end), state and sessionId."""
+    if not support_authorized():
+        return jsonify({'error': 'Transcript search is not available'}), 403
+    try:
+        results = await asyncio.to_thread(
+            chatbot.transcript_index.search,
+            request.args.get('q'),
+            parse_time(request.args.get('start')),
+            parse_time(request.args.get('end')),
+            request.args.get('state'),
+            request.args.get('sessionId'),
+            min(request.args.get('limit', 50, type=int), 500)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'results': results})
+
+@app.route('/api/transcripts/<session_id>', methods=['GET'])
+async def get_transcript(session_id):
+    if not support_authorized():
+        return jsonify({'error': 'Transcript search is not available'}), 403
+    turns = await asyncio.to_thread(chatbot.transcript_index.conversation, session_id)
+    return jsonify({'sessionId': session_id, 'turns': turns})
+
+@app.route('/api/appointments/<int:booking_id>/<action>', methods=['POST'])
+async def update_appointment(booking_id, action):
+    """Support staff mark a booking (id from a reminder event) as 'cancel' or 'check-in'."""
+    if not support_authorized():
+        return jsonify({'error': 'Appointment changes are not available'}), 403
+    if action == 'cancel':
+        found = chatbot.reminders.cancel(booking_id)
+    elif action == 'check-in':
+        found = chatbot.reminders.check_in(booking_id)
+    else:
+        return jsonify({'error': f"Unknown action '{action}'"}), 400
+    if not found:
+        return jsonify({'error': f"No booking with id {booking_id}"}), 404
+    return jsonify({'bookingId': booking_id, 'action': action})
+
+@app.route('/ready', methods=['GET'])
+async def ready():
+    """Readiness probe: 503 until warm-up has finished."""
+    return jsonify(warm_up.status()), 200 if warm_up.ready.is_set() else 503
+
+@app.route('/api/metrics', methods=['GET'])
+async def get_metrics():
+    return jsonify({
+        'llm_coalescing': chatbot.single_flight.stats(),
+        'tokens': chatbot.token_ledger.stats(),
+        'conversation_flow': chatbot.flow.stats(),
+        'admission': chatbot.admission.stats(),
+        'post_processing': chatbot.tasks.stats(),
+        'reminders': chatbot.reminders.stats()
+    })
+
+@app.route('/api/funnel', methods=['GET'])
+async def get_funnel():
+    """Sessions reaching each conversation stage, transitions and time in state, all-time and per rolling window."""
+    return jsonify(chatbot.funnel.stats())
+
+@app.route('/debug/traces', methods=['GET'])
+async def get_traces():
+    limit = request.args.get('limit', type=int)
+    if request.args.get('format') == 'chrome':
+        return jsonify(chatbot.tracer.export_chrome_trace(limit))
+    return jsonify(chatbot.tracer.export_json(limit))
+
+if __name__ == '__main__':
+    app.run(debug=True, port=5005)
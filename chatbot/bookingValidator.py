@@ -0,0 +1,186 @@
+import argparse
+import csv
+import functools
+import io
+import os
+import re
+from datetime import datetime
+
+# Column order used by user_data.csv
+BOOKING_FIELDS = [
+    'name', 'email', 'mobile', 'insurance_type',
+    'preferred_date', 'preferred_time', 'appointment_needed'
+]
+
+# Web form and partner feed spellings of the same fields
+FIELD_ALIASES = {
+    'insuranceType': 'insurance_type',
+    'preferredDate': 'preferred_date',
+    'preferredTime': 'preferred_time',
+    'phone': 'mobile'
+}
+
+
+class BookingValidator:
+    NAME_PATTERN = re.compile(r'^[A-Za-z\s]{2,50}$')
+    EMAIL_PATTERN = re.compile(r'^[\w\.-]+@[\w\.-]+\.\w+$')
+    MOBILE_PATTERN = re.compile(r'^[0-9]{10}$')
+
+    @staticmethod
+    def validate_name(name):
+        if BookingValidator.NAME_PATTERN.match(name):
+            return None
+        return "Invalid name. Use only alphabets (2-50 characters)."
+
+    @staticmethod
+    def validate_email(email):
+        """Email is optional; an empty value is valid."""
+        if email == "" or BookingValidator.EMAIL_PATTERN.match(email):
+            return None
+        return "Invalid email format. Please try again."
+
+    @staticmethod
+    def validate_mobile(mobile):
+        if BookingValidator.MOBILE_PATTERN.match(mobile):
+            return None
+        return "Invalid mobile number. Use 10 digits."
+
+    @staticmethod
+    def validate_date(date):
+        try:
+            datetime.strptime(date, '%Y-%m-%d')
+            return None
+        except ValueError:
+            return "Invalid date format. Use YYYY-MM-DD."
+
+    @staticmethod
+    def validate_time(time):
+        try:
+            datetime.strptime(time, '%H:%M')
+            return None
+        except ValueError:
+            return "Invalid time format. Use HH:MM in 24-hour format."
+
+    @staticmethod
+    def validate(data, insurance_types):
+        """
+        Validate one booking dict with the same rules as the interactive flow.
+        Returns (booking, errors): the cleaned booking in BOOKING_FIELDS order,
+        and a dict of field -> error message (empty when valid).
+        """
+        values = {}
+        for key, value in data.items():
+            field = FIELD_ALIASES.get(key, key)
+            values[field] = str(value).strip() if value is not None else ""
+
+        errors = {}
+        checks = {
+            'name': BookingValidator.validate_name,
+            'email': BookingValidator.validate_email,
+            'mobile': BookingValidator.validate_mobile,
+            'preferred_date': BookingValidator.validate_date,
+            'preferred_time': BookingValidator.validate_time
+        }
+        for field, check in checks.items():
+            error = check(values.get(field, ""))
+            if error:
+                errors[field] = error
+
+        # Accept insurance types case-insensitively but store the canonical name
+        known_types = {insurance_type.lower(): insurance_type for insurance_type in insurance_types}
+        insurance_type = known_types.get(values.get('insurance_type', "").lower())
+        if insurance_type is None:
+            errors['insurance_type'] = f"Invalid insurance type. Choose one of: {', '.join(insurance_types)}."
+
+        booking = {
+            'name': values.get('name', ""),
+            'email': values.get('email') or 'Not Provided',
+            'mobile': values.get('mobile', ""),
+            'insurance_type': insurance_type,
+            'preferred_date': values.get('preferred_date', ""),
+            'preferred_time': values.get('preferred_time', ""),
+            'appointment_needed': True
+        }
+        return booking, errors
+
+    @staticmethod
+    def validate_many(rows, insurance_types):
+        """
+        Validate many bookings in one pass.
+        Returns (valid_bookings, row_errors) where row numbers start at 1.
+        """
+        valid = []
+        row_errors = []
+        for row_number, row in enumerate(rows, 1):
+            booking, errors = BookingValidator.validate(row, insurance_types)
+            if errors:
+                row_errors.append({'row': row_number, 'errors': errors})
+            else:
+                valid.append(booking)
+        return valid, row_errors
+
+
+def write_bookings(path, bookings):
+    """Append bookings to the user data CSV in a single write."""
+    if not bookings:
+        return 0
+
+    file_exists = os.path.exists(path) and os.path.getsize(path) > 0
+    fieldnames = BOOKING_FIELDS
+    if file_exists:
+        # Follow the existing header so columns stay aligned
+        with open(path, newline='', encoding='utf-8') as file:
+            fieldnames = next(csv.reader(file), BOOKING_FIELDS)
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+    if not file_exists:
+        writer.writeheader()
+    writer.writerows(bookings)
+
+    with open(path, mode='a', newline='', encoding='utf-8') as file:
+        file.write(buffer.getvalue())
+        file.flush()
+        os.fsync(file.fileno())
+    return len(bookings)
+
+
+def import_bookings(rows, insurance_types, save, strict=False):
+    """
+    Validate a batch of bookings and pass the valid ones to save(bookings),
+    which stores them and returns how many it wrote.
+    In strict mode nothing is saved if any row is invalid.
+    """
+    valid, row_errors = BookingValidator.validate_many(rows, insurance_types)
+    imported = 0
+    if not (strict and row_errors):
+        imported = save(valid)
+    return {
+        'imported': imported,
+        'rejected': len(row_errors),
+        'errors': row_errors
+    }
+
+
+def main():
+    from appointmentBot import Config
+
+    parser = argparse.ArgumentParser(description="Validate and import bookings from a partner CSV feed.")
+    parser.add_argument('feed', help="CSV file with a header row")
+    parser.add_argument('--output', default=Config.USER_DATA_PATH, help="User data CSV to append to")
+    parser.add_argument('--strict', action='store_true', help="Import nothing if any row is invalid")
+    args = parser.parse_args()
+
+    with open(args.feed, newline='', encoding='utf-8') as file:
+        save = functools.partial(write_bookings, args.output)
+        result = import_bookings(csv.DictReader(file), Config.INSURANCE_TYPES, save, args.strict)
+
+    for row_error in result['errors']:
+        # Header is line 1, so data row N is on line N + 1
+        details = "; ".join(f"{field}: {message}" for field, message in row_error['errors'].items())
+        print(f"Line {row_error['row'] + 1}: {details}")
+    print(f"Imported {result['imported']} bookings, rejected {result['rejected']}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,14 @@
+import csv
+import hmac
+import io
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from appointmentBot import InsuranceChatbot, validate_environment, create_data_directories
+from appointmentBot import InsuranceChatbot, ConversationContext, validate_environment, create_data_directories
+from sessionStore import SessionStore
+from bookingValidator import BookingValidator, import_bookings
+from transcriptStore import parse_time
+from warmUp import WarmUp
 
 app = Flask(__name__)
 CORS(app)
@@ -12,6 +20,20 @@ if validate_environment():
 else:
     raise Exception("Environment validation failed")
 
+session_store = SessionStore(chatbot.config.SESSION_STORE_PATH)
+
+# Load models and open the Groq connection in the background; /ready reports when done
+warm_up = WarmUp(chatbot.warm_up_steps())
+warm_up.start()
+# Reminder and no-show events for stored bookings
+chatbot.reminders.start()
+
+def load_session(session_id):
+    """Chatbot bound to a stored conversation, or the shared one when no session id is given."""
+    if not session_id:
+        return chatbot
+    return chatbot.new_session(session_store.load(session_id), session_id)
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     try:
@@ -22,48 +44,171 @@ def chat():
         if not message and action == 'chat':
             return jsonify({'error': 'No message provided'}), 400
 
+        # Conversations with a session id are stored and can be resumed by any worker
+        session_id = data.get('sessionId')
+        bot = load_session(session_id)
+
         response_data = {
             'response': '',
-            'state': chatbot.context.current_state,
-            'userDetails': {
-                'name': chatbot.context.user_name,
-                'insuranceType': chatbot.context.insurance_type,
-                'collectedInfo': chatbot.context.collected_info
-            },
-            'insuranceTypes': chatbot.config.INSURANCE_TYPES
+            'insuranceTypes': bot.config.INSURANCE_TYPES
         }
 
         # Handle different actions
         if action == 'chat':
-            response = chatbot.process_message(message)
+            with chatbot.profiler.profile('api_chat'), chatbot.tracer.span('api_chat'):
+                response = bot.process_message(message)
+                bot.save_interaction(message, response)
             response_data['response'] = response
             
         elif action == 'schedule':
             # Handle appointment scheduling
-            appointment_details = {
+            appointment_details, errors = BookingValidator.validate({
                 'name': data.get('name'),
                 'email': data.get('email'),
                 'mobile': data.get('mobile'),
                 'insurance_type': data.get('insuranceType'),
                 'preferred_date': data.get('preferredDate'),
                 'preferred_time': data.get('preferredTime')
-            }
+            }, bot.config.INSURANCE_TYPES)
+            
+            if errors:
+                return jsonify({'error': 'Invalid appointment details', 'fieldErrors': errors}), 400
             
-            chatbot.context.set_user_name(appointment_details['name'])
-            chatbot.context.set_insurance_type(appointment_details['insurance_type'])
-            chatbot.save_user_data(appointment_details)
-            chatbot.context.collected_info.update(appointment_details)
+            bot.context.set_user_name(appointment_details['name'])
+            bot.context.set_insurance_type(appointment_details['insurance_type'])
+            bot.save_user_data(appointment_details)
+            bot.context.collected_info.update(appointment_details)
             
             response_data['response'] = f"Appointment scheduled for {appointment_details['preferred_date']} at {appointment_details['preferred_time']}"
             
         elif action == 'reset':
-            chatbot.context = chatbot.ConversationContext()
+            bot.context = ConversationContext(bot.config.SESSION_HISTORY_LIMIT)
             response_data['response'] = "Conversation reset successfully"
+        
+        # Report state after the action so details mentioned in chat can prefill the booking form
+        response_data['state'] = bot.context.current_state
+        response_data['userDetails'] = {
+            'name': bot.context.user_name,
+            'insuranceType': bot.context.insurance_type,
+            'collectedInfo': bot.context.collected_info
+        }
+
+        if session_id:
+            session_store.save(session_id, bot.context)
+            response_data['sessionId'] = session_id
             
         return jsonify(response_data)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/appointments/bulk', methods=['POST'])
+def bulk_import_appointments():
+    """
+    Validate and store many bookings at once.
+    Accepts a CSV upload ('file'), a text/csv body, or JSON {"bookings": [...]}.
+    Pass strict=true to import nothing when any row is invalid.
+    """
+    try:
+        strict = request.args.get('strict', 'false').lower() == 'true'
+        
+        if 'file' in request.files:
+            rows = csv.DictReader(io.StringIO(request.files['file'].read().decode('utf-8')))
+        elif request.mimetype == 'text/csv':
+            rows = csv.DictReader(io.StringIO(request.get_data(as_text=True)))
+        else:
+            data = request.json or {}
+            rows = data.get('bookings', [])
+            strict = data.get('strict', strict)
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                return jsonify({'error': "'bookings' must be a list of booking objects"}), 400
+        
+        # Same save path as chat bookings, so webhooks fire and reminders are scheduled
+        result = import_bookings(rows, chatbot.config.INSURANCE_TYPES, chatbot.save_bookings, strict)
+        status = 400 if strict and result['rejected'] else 200
+        return jsonify(result), status
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def support_authorized():
+    """Support endpoints are off unless TRANSCRIPT_SEARCH_TOKEN is set and the caller sends it."""
+    token = chatbot.config.TRANSCRIPT_SEARCH_TOKEN
+    return bool(token) and hmac.compare_digest(request.headers.get('X-Support-Token', ''), token)
+
+@app.route('/api/transcripts/search', methods=['GET'])
+def search_transcripts():
+    """Find logged turns by text (q), time range (start/end), state and sessionId."""
+    if not support_authorized():
+        return jsonify({'error': 'Transcript search is not available'}), 403
+    try:
+        results = chatbot.transcript_index.search(
+            request.args.get('q'),
+            parse_time(request.args.get('start')),
+            parse_time(request.args.get('end')),
+            request.args.get('state'),
+            request.args.get('sessionId'),
+            min(request.args.get('limit', 50, type=int), 500)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'results': results})
+
+@app.route('/api/transcripts/<session_id>', methods=['GET'])
+def get_transcript(session_id):
+    if not support_authorized():
+        return jsonify({'error': 'Transcript search is not available'}), 403
+    return jsonify({'sessionId': session_id, 'turns': chatbot.transcript_index.conversation(session_id)})
+
+@app.route('/api/appointments/<int:booking_id>/<action>', methods=['POST'])
+def update_appointment(booking_id, action):
+    """Support staff mark a booking (id from a reminder event) as 'cancel' or 'check-in'."""
+    if not support_authorized():
+        return jsonify({'error': 'Appointment changes are not available'}), 403
+    if action == 'cancel':
+        found = chatbot.reminders.cancel(booking_id)
+    elif action == 'check-in':
+        found = chatbot.reminders.check_in(booking_id)
+    else:
+        return jsonify({'error': f"Unknown action '{action}'"}), 400
+    if not found:
+        return jsonify({'error': f"No booking with id {booking_id}"}), 404
+    return jsonify({'bookingId': booking_id, 'action': action})
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 503 until warm-up has finished."""
+    return jsonify(warm_up.status()), 200 if warm_up.ready.is_set() else 503
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return jsonify({
+        'llm_coalescing': chatbot.single_flight.stats(),
+        'tokens': chatbot.token_ledger.stats(),
+        'conversation_flow': chatbot.flow.stats(),
+        'admission': chatbot.admission.stats(),
+        'post_processing': chatbot.tasks.stats(),
+        'reminders': chatbot.reminders.stats()
+    })
+
+@app.route('/api/funnel', methods=['GET'])
+def get_funnel():
+    """Sessions reaching each conversation stage, transitions and time in state, all-time and per rolling window."""
+    return jsonify(chatbot.funnel.stats())
+
+@app.route('/debug/traces', methods=['GET'])
+def get_traces():
+    limit = request.args.get('limit', type=int)
+    if request.args.get('format') == 'chrome':
+        return jsonify(chatbot.tracer.export_chrome_trace(limit))
+    return jsonify(chatbot.tracer.export_json(limit))
+
+@app.route('/debug/profile', methods=['GET', 'POST'])
+def profile_requests():
+    if request.method == 'POST':
+        data = request.json or {}
+        chatbot.profiler.arm(data.get('requests', 1))
+    return jsonify(chatbot.profiler.status())
+
 if __name__ == '__main__':
     app.run(debug=True, port=5005)
\ No newline at end of file
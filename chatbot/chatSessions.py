@@ -0,0 +1,64 @@
+import threading
+from collections import OrderedDict
+
+
+class ChatSessions:
+    """
+    In-memory conversations for app.py / asyncApp.py, keyed by session id.
+    Each session is a chatbot from InsuranceChatbot.new_session plus a lock, so
+    one session's messages are answered in order while other sessions run
+    concurrently. Pass asyncio.Lock as `lock_factory` on an event loop.
+    The least recently used sessions are dropped beyond `max_sessions`.
+    """
+
+    def __init__(self, chatbot, max_sessions=10000, lock_factory=threading.Lock):
+        self.chatbot = chatbot
+        self.max_sessions = max_sessions
+        self.lock_factory = lock_factory
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._evicted = 0
+
+    def get(self, session_id):
+        """(bot, lock) for a session, created on first use."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = self._sessions[session_id] = (self.chatbot.new_session(), self.lock_factory())
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self._evicted += 1
+            else:
+                self._sessions.move_to_end(session_id)
+            return entry
+
+    def stats(self):
+        with self._lock:
+            return {'sessions': len(self._sessions), 'evicted': self._evicted}
+
+
+def parse_batch(data, max_items):
+    """
+    Split a batch request {"messages": [{"sessionId", "message"}, ...]} by session.
+    Returns (groups, results, error): groups maps each session id to its
+    [(index, message)] in request order, results holds the per-item errors
+    already known (None elsewhere), and error rejects the whole batch.
+    """
+    items = data.get('messages') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return None, None, 'Provide a non-empty "messages" list'
+    if len(items) > max_items:
+        return None, None, f'At most {max_items} messages per batch'
+
+    groups = OrderedDict()
+    results = [None] * len(items)
+    for index, item in enumerate(items):
+        session_id = item.get('sessionId') if isinstance(item, dict) else None
+        message = item.get('message') if isinstance(item, dict) else None
+        if not session_id or not isinstance(session_id, str):
+            results[index] = {'sessionId': session_id, 'error': 'No sessionId provided'}
+        elif not message or not isinstance(message, str):
+            results[index] = {'sessionId': session_id, 'error': 'No message provided'}
+        else:
+            groups.setdefault(session_id, []).append((index, message))
+    return groups, results, None
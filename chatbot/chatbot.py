@@ -1,25 +1,75 @@
+import copy
 import csv
 import json
 from datetime import datetime
-from groq import Groq
+from functools import cached_property
 import random
 import os
+import urllib.request
 
 from config import Config
 from intentClassifier import IntentClassifier
+from bookingValidator import BookingValidator
 from userInputs import UserInputCollector
 from sentimentAnalyser import SentimentAnalyzer
+from requestTracer import Tracer, RequestProfiler
+from singleFlight import SingleFlight, fingerprint
+from faqAnswers import FaqAnswers
+from tokenLedger import TokenLedger
+from transcriptStore import TranscriptStore
+from transcriptIndex import TranscriptIndex
+from admissionControl import AdmissionController, AdmissionRejected, PRIORITY_BOOKING, PRIORITY_CHAT
+from taskPipeline import TaskPipeline
 
 class InsuranceChatbot:
+    IRRELEVANT_QUERY_RESPONSE = "I apologize, but I can only assist with insurance-related queries. Could you rephrase your question?"
+    SESSION_LIMIT_RESPONSE = "We've reached the length limit for this conversation. Please start a new chat to continue."
+    # MAX_SESSION_TOKENS applies to per-session bots (new_session) and the terminal chat;
+    # sessionless web requests share the default bot, which must never run out
+    limits_session = False
+    
     def __init__(self):
         self.config = Config()
-        self.client = Groq(api_key=self.config.GROQ_API_KEY)
+        self._client = None
+        self._async_client = None
         self.tokens_count = 0
+        self.last_prompt_tokens = 0
         self.user_details = None
         self.appointment_scheduled = False
+        # Answers collected so far while a chat booking is in progress, else None
+        self.booking = None
         self.current_intent = None
         self.sentiment_analyzer = SentimentAnalyzer()
         self.conversation_sentiments = []
+        self.tracer = Tracer(sample_rate=self.config.TRACE_SAMPLE_RATE)
+        self.profiler = RequestProfiler(output_dir=self.config.PROFILE_DIR)
+        self.single_flight = SingleFlight()
+        self.faq_answers = FaqAnswers(self.config.FAQ_INDEX_PATH)
+        IntentClassifier.load_model(self.config.INTENT_MODEL_PATH)
+        self.admission = AdmissionController(
+            self.config.LLM_REQUESTS_PER_MINUTE,
+            self.config.LLM_TOKENS_PER_MINUTE,
+            self.config.LLM_MAX_CONCURRENT,
+            self.config.LLM_MAX_QUEUE,
+            self.config.LLM_QUEUE_TIMEOUT
+        )
+        self.transcripts = TranscriptStore(
+            self.config.TRANSCRIPT_DIR,
+            self.config.TRANSCRIPT_PARTITION,
+            self.config.TRANSCRIPT_RETENTION_DAYS
+        )
+        self.transcript_index = TranscriptIndex(self.config.TRANSCRIPT_INDEX_PATH)
+        self.tasks = TaskPipeline(
+            self.config.POST_PROCESS_WORKERS,
+            self.config.POST_PROCESS_QUEUE,
+            self.config.POST_PROCESS_RETRIES
+        )
+        self.token_ledger = TokenLedger(
+            self.config.TOKENIZER_MODEL,
+            self.config.MAX_SESSION_TOKENS,
+            self.config.MAX_RESPONSE_TOKENS,
+            self.config.MAX_PROMPT_TOKENS
+        )
         
         # Initialize conversation with enhanced system context
         self.messages = [
@@ -35,16 +85,70 @@ class InsuranceChatbot:
                 6. Offer clear, actionable advice about insurance matters"""
             }
         ]
+        
+        # (role, content, tokens) for every turn; only the newest that fit are sent
+        self.conversation = []
+    
+    def new_session(self):
+        """Return a chatbot for a separate conversation that shares clients and instrumentation."""
+        session = copy.copy(self)
+        session._client = self.client
+        session._async_client = self.async_client
+        session.tokens_count = 0
+        session.last_prompt_tokens = 0
+        session.limits_session = True
+        session.user_details = None
+        session.appointment_scheduled = False
+        session.booking = None
+        session.current_intent = None
+        session.conversation = []
+        session.conversation_sentiments = []
+        return session
     
     def handle_intent(self, query):
         """
         Dynamically handle different user intents with specialized responses.
         """
+        with self.tracer.span('handle_intent'):
+            response = self.route_intent(query)
+            
+            # If no specific intent handling, use AI response generation
+            if response is None:
+                response = self.get_ai_response(query)
+            self.count_turn(query, response)
+            return response
+    
+    async def handle_intent_async(self, query):
+        """
+        Async variant of handle_intent that awaits the LLM call.
+        """
+        with self.tracer.span('handle_intent'):
+            response = self.route_intent(query)
+            
+            if response is None:
+                response = await self.get_ai_response_async(query)
+            self.count_turn(query, response)
+            return response
+    
+    def count_turn(self, query, response):
+        """Charge a finished turn to the session, so every server path enforces MAX_SESSION_TOKENS."""
+        if self.limits_session:
+            self.tokens_count += self.count_tokens(query) + self.count_tokens(response)
+    
+    def route_intent(self, query):
+        """
+        Answer intents that have specialized responses.
+        Returns None when the query needs an AI response.
+        """
+        self.last_prompt_tokens = 0
+        
         # Classify intent
-        intent, confidence = IntentClassifier.classify_intent(
-            query, 
-            self.config.INTENTS
-        )
+        with self.tracer.span('classify_intent'):
+            intent, confidence = IntentClassifier.classify_intent(
+                query, 
+                self.config.INTENTS
+            )
+            self.tracer.annotate(intent=intent, confidence=confidence)
         
         # Store current intent
         self.current_intent = intent
@@ -67,8 +171,7 @@ class InsuranceChatbot:
         elif intent == 'claim_related':
             return "For claim-related inquiries, we'll need to gather some specific information. Would you like to discuss your claim in more detail?"
         
-        # If no specific intent handling, use AI response generation
-        return self.get_ai_response(query)
+        return None
     
     def is_query_relevant(self, query):
         """
@@ -81,7 +184,7 @@ class InsuranceChatbot:
         
         # Consider intents and keywords
         return (
-            confidence > 30 or  # Sufficient intent confidence
+            confidence > self.intent_threshold('relevant') or  # Sufficient intent confidence
             any(keyword in query.lower() for keyword in self.config.INSURANCE_KEYWORDS)
         )
     
@@ -96,12 +199,17 @@ class InsuranceChatbot:
         
         return (
             intent in ['appointment_request', 'problem_description'] or
-            confidence > 50  # High confidence in consultation-related intent
+            confidence > self.intent_threshold('appointment')  # High confidence in consultation-related intent
         )
     
+    def intent_threshold(self, purpose):
+        """Confidence cut-off for `purpose`, on the scale of the classifier backend in use."""
+        backend = 'keywords' if IntentClassifier.model is None else 'model'
+        return self.config.INTENT_CONFIDENCE_THRESHOLDS[backend][purpose]
+    
     def count_tokens(self, text):
-        """Simple token counting."""
-        return len(text.split())
+        """Count tokens with the model's tokenizer, memoized per text."""
+        return self.token_ledger.count(text)
     
     def save_user_data(self, user_details):
         """Save user details to CSV."""
@@ -114,15 +222,27 @@ class InsuranceChatbot:
                 writer.writeheader()
             
             writer.writerow(user_details)
+        
+        # The booking is stored before the reply; the notification can wait
+        if self.config.BOOKING_WEBHOOK_URL:
+            self.tasks.submit('booking_notification', self.notify_booking, dict(user_details))
+    
+    def notify_booking(self, appointment_details):
+        """POST a new booking to BOOKING_WEBHOOK_URL; errors are raised so the task is retried."""
+        request = urllib.request.Request(
+            self.config.BOOKING_WEBHOOK_URL,
+            data=json.dumps(appointment_details, default=str).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=10):
+            pass
     
     def save_interaction(self, query, response):
-        """Save interaction details to CSV."""
+        """Queue the interaction to be scored and logged after the reply is sent."""
         if not self.user_details:
             return
         
-        sentiment_label, sentiment_score = self.sentiment_analyzer.analyze_sentiment(query)
-        self.conversation_sentiments.append(sentiment_label)
-        
         interaction_data = {
             'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             'name': self.user_details.get('name', 'Unknown'),
@@ -132,55 +252,183 @@ class InsuranceChatbot:
             'current_intent': self.current_intent,
             'query_tokens': self.count_tokens(query),
             'response_tokens': self.count_tokens(response),
-            'sentiment_label': sentiment_label,
-            'sentiment_score': sentiment_score
+            'prompt_tokens': self.last_prompt_tokens,
+            'session_tokens': self.tokens_count
         }
+        # Keyed by session so one conversation's turns are logged in order
+        self.tasks.submit('log_interaction', self.log_interaction, interaction_data, key=id(self))
+    
+    def log_interaction(self, interaction_data):
+        """
+        Score sentiment, then append the interaction to the transcript log and queue its indexing.
+        Safe to retry: the score is stored on interaction_data and the label is only
+        added to the conversation once the transcript append has succeeded.
+        """
+        if 'sentiment_label' not in interaction_data:
+            with self.tracer.span('sentiment'):
+                sentiment_label, sentiment_score = self.sentiment_analyzer.analyze_sentiment(interaction_data['query'])
+            interaction_data.update(sentiment_label=sentiment_label, sentiment_score=sentiment_score)
+        
+        with self.tracer.span('save_interaction'):
+            record = self.transcripts.append(interaction_data)
+        self.conversation_sentiments.append(interaction_data['sentiment_label'])
+        # Indexed as a separate task so a retry never appends the transcript twice
+        self.tasks.submit('index_interaction', self.transcript_index.add, record)
+    
+    @property
+    def client(self):
+        """Groq client, created on first use so importing the bot does not load the SDK."""
+        if self._client is None:
+            from groq import Groq
+            self._client = Groq(api_key=self.config.GROQ_API_KEY, base_url=self.config.GROQ_BASE_URL)
+        return self._client
+    
+    @property
+    def async_client(self):
+        """Async Groq client, created on first use."""
+        if self._async_client is None:
+            from groq import AsyncGroq
+            self._async_client = AsyncGroq(api_key=self.config.GROQ_API_KEY, base_url=self.config.GROQ_BASE_URL)
+        return self._async_client
+    
+    @cached_property
+    def system_tokens(self):
+        # The system prompt never changes, so count it once (this loads the tokenizer)
+        return sum(self.token_ledger.message_tokens(message['content']) for message in self.messages)
+    
+    def warm_up_steps(self, use_async=False):
+        """
+        Work that would otherwise land on the first request, as (name, step) pairs for WarmUp.
+        Async servers open the async client's connection pool instead of the sync one.
+        """
+        return [
+            ('tokenizer', lambda: self.system_tokens),
+            ('sentiment_model', lambda: self.sentiment_analyzer.analyze_sentiment("Warm-up")),
+            ('llm_connection', self.open_llm_connection_async if use_async else self.open_llm_connection)
+        ]
+    
+    def open_llm_connection(self):
+        """Make one cheap API call so the client's pool holds a live TLS connection."""
+        self.client.models.list(timeout=self.config.LLM_TIMEOUT)
+    
+    async def open_llm_connection_async(self):
+        await self.async_client.models.list(timeout=self.config.LLM_TIMEOUT)
+    
+    def prepare_ai_request(self, query):
+        """
+        Add the query to the conversation and return completion arguments.
+        Returns None when the query is not insurance related.
+        """
+        # Check query relevance
+        with self.tracer.span('relevance_check'):
+            relevant = self.is_query_relevant(query)
+        if not relevant:
+            return None
         
-        file_exists = os.path.exists(self.config.CHATBOT_DATA_PATH)
+        # Add user message to conversation
+        query_tokens = self.count_tokens(query)
+        self.conversation.append(("user", query, query_tokens))
         
-        with open(self.config.CHATBOT_DATA_PATH, mode='a', newline='', encoding='utf-8') as file:
-            writer = csv.DictWriter(file, fieldnames=interaction_data.keys())
-            
-            if not file_exists:
-                writer.writeheader()
-            
-            writer.writerow(interaction_data)
+        # Send the newest turns that fit, using the counts stored with each turn
+        history, self.last_prompt_tokens = self.token_ledger.fit_history(self.conversation, self.system_tokens)
+        max_tokens = self.token_ledger.response_budget(self.tokens_count + query_tokens)
+        self.tracer.annotate(prompt_tokens=self.last_prompt_tokens, max_tokens=max_tokens)
+        
+        return {
+            'messages': self.messages + [{"role": role, "content": content} for role, content, _ in history],
+            'model': "llama-3.2-3b-preview",
+            'temperature': 0.7,
+            'max_tokens': max_tokens,
+        }
+    
+    def record_ai_response(self, response):
+        """Store the assistant reply in the conversation and return it."""
+        # Add AI response to conversation
+        self.conversation.append(("assistant", response, self.count_tokens(response)))
+        
+        return response
     
     def get_ai_response(self, query):
         """Generate AI response with token and relevance management."""
         try:
-            # Check query relevance
-            if not self.is_query_relevant(query):
-                return "I apologize, but I can only assist with insurance-related queries. Could you rephrase your question?"
+            if self.token_ledger.response_budget(self.tokens_count + self.count_tokens(query)) == 0:
+                return self.SESSION_LIMIT_RESPONSE
             
-            # Add user message to conversation
-            self.messages.append({
-                "role": "user", 
-                "content": query
-            })
+            # Serve vetted FAQ answers without calling the LLM
+            faq_entry = self.faq_answers.match(query)
+            if faq_entry is not None:
+                self.prepare_ai_request(query)
+                return self.record_ai_response(faq_entry['answer'])
+            
+            request = self.prepare_ai_request(query)
+            if request is None:
+                return self.IRRELEVANT_QUERY_RESPONSE
             
             # Generate response
-            chat_completion = self.client.chat.completions.create(
-                messages=self.messages,
-                model="llama-3.2-3b-preview",
-                temperature=0.7,
-                max_tokens=self.config.MAX_RESPONSE_TOKENS,
-            )
+            with self.tracer.span('llm_call', model=request['model']):
+                chat_completion = self.single_flight.do(
+                    fingerprint(request),
+                    lambda: self.call_llm(request),
+                    timeout=self.config.LLM_TIMEOUT
+                )
+            
+            return self.record_ai_response(chat_completion.choices[0].message.content)
+        
+        except AdmissionRejected as e:
+            # Shed load to a canned reply instead of an error when the provider quota is spent
+            self.tracer.annotate(shed=e.reason)
+            return random.choice(self.config.BUSY_RESPONSES)
+        
+        except Exception as e:
+            return f"An error occurred: {str(e)}"
+    
+    async def get_ai_response_async(self, query):
+        """Generate AI response without blocking the event loop."""
+        try:
+            if self.token_ledger.response_budget(self.tokens_count + self.count_tokens(query)) == 0:
+                return self.SESSION_LIMIT_RESPONSE
             
-            # Extract and process response
-            response = chat_completion.choices[0].message.content
+            # Serve vetted FAQ answers without calling the LLM
+            faq_entry = self.faq_answers.match(query)
+            if faq_entry is not None:
+                self.prepare_ai_request(query)
+                return self.record_ai_response(faq_entry['answer'])
             
-            # Add AI response to conversation
-            self.messages.append({
-                "role": "assistant", 
-                "content": response
-            })
+            request = self.prepare_ai_request(query)
+            if request is None:
+                return self.IRRELEVANT_QUERY_RESPONSE
             
-            return response
+            with self.tracer.span('llm_call', model=request['model']):
+                chat_completion = await self.single_flight.do_async(
+                    fingerprint(request),
+                    lambda: self.call_llm_async(request),
+                    timeout=self.config.LLM_TIMEOUT
+                )
+            
+            return self.record_ai_response(chat_completion.choices[0].message.content)
+        
+        except AdmissionRejected as e:
+            self.tracer.annotate(shed=e.reason)
+            return random.choice(self.config.BUSY_RESPONSES)
         
         except Exception as e:
             return f"An error occurred: {str(e)}"
     
+    def llm_priority(self):
+        """Appointment requests are admitted ahead of general questions."""
+        if self.current_intent == 'appointment_request':
+            return PRIORITY_BOOKING
+        return PRIORITY_CHAT
+    
+    def call_llm(self, request):
+        """Send a completion request once admission control lets it through."""
+        with self.admission.admit(self.llm_priority(), self.last_prompt_tokens + request['max_tokens']):
+            return self.client.chat.completions.create(timeout=self.config.LLM_TIMEOUT, **request)
+    
+    async def call_llm_async(self, request):
+        async with self.admission.admit_async(self.llm_priority(), self.last_prompt_tokens + request['max_tokens']):
+            return await self.async_client.chat.completions.create(timeout=self.config.LLM_TIMEOUT, **request)
+    
     def schedule_appointment(self):
         """Schedule an appointment with user input."""
         print("ADA: Great! Let's schedule your insurance consultation.")
@@ -199,13 +447,53 @@ class InsuranceChatbot:
         print(f"\nADA: Perfect! Your {appointment_details['insurance_type']} consultation is scheduled for {appointment_details['preferred_date']} at {appointment_details['preferred_time']}.")
         return "Appointment scheduled successfully."
     
+    def start_booking(self):
+        """Begin collecting booking details over chat turns; returns the first question."""
+        self.booking = {}
+        return "Let's schedule your insurance consultation. " + self.next_booking_question()
+    
+    def collect_booking(self, answer):
+        """
+        Take the reply to the pending booking question and ask the next one.
+        Once every detail is valid the booking is saved and confirmed; 'cancel' stops it.
+        """
+        answer = answer.strip()
+        if answer.lower() == 'cancel':
+            self.booking = None
+            return "No problem, I've cancelled the booking. What else can I help you with?"
+        
+        slot = next(slot for slot in self.config.BOOKING_QUESTIONS if slot not in self.booking)
+        if slot == 'email' and answer.lower() in ('skip', 'none', 'no'):
+            answer = ""
+        if slot == 'insurance_type' and answer.isdigit() and 1 <= int(answer) <= len(self.config.INSURANCE_TYPES):
+            answer = self.config.INSURANCE_TYPES[int(answer) - 1]
+        
+        self.booking[slot] = answer
+        booking, errors = BookingValidator.validate(self.booking, self.config.INSURANCE_TYPES)
+        if slot in errors:
+            del self.booking[slot]
+            return f"{errors[slot]} {self.config.BOOKING_QUESTIONS[slot]}"
+        if len(self.booking) < len(self.config.BOOKING_QUESTIONS):
+            return self.next_booking_question()
+        
+        self.save_user_data(booking)
+        self.user_details = booking
+        self.appointment_scheduled = True
+        self.booking = None
+        return f"Perfect! Your {booking['insurance_type']} consultation is scheduled for {booking['preferred_date']} at {booking['preferred_time']}."
+    
+    def next_booking_question(self):
+        slot = next(slot for slot in self.config.BOOKING_QUESTIONS if slot not in self.booking)
+        return self.config.BOOKING_QUESTIONS[slot]
+    
     def run(self):
         """Enhanced chatbot interaction flow with intent-based routing."""
         print("\nADA: Hello! I'm ADA, your friendly insurance consultation assistant.")
         print("     I'm here to help you understand and navigate your insurance needs.")
         print("     Feel free to ask me anything about insurance or schedule a consultation.\n")
+        self.limits_session = True
         
-        while self.tokens_count <= self.config.MAX_SESSION_TOKENS:
+        while not self.token_ledger.session_exhausted(self.tokens_count):
             try:
                 # Get user query
                 query = input("YOU: ").strip()
@@ -232,9 +520,6 @@ class InsuranceChatbot:
                 # Print response
                 print(f"ADA: {response}")
                 
-                # Update token count
-                self.tokens_count += (self.count_tokens(query) + self.count_tokens(response))
-                
             except Exception as e:
                 print(f"An unexpected error occurred: {e}")
                 break
@@ -7,9 +7,13 @@ load_dotenv()
 class Config:
     # API Settings
     GROQ_API_KEY = os.getenv('GROQ_API_KEY', '')
+    # Point at test files/mock_llm.py (e.g. http://localhost:8900) for offline load tests
+    GROQ_BASE_URL = os.getenv('GROQ_BASE_URL', 'https://api.groq.com')
     
     # Paths
-    CHATBOT_DATA_PATH = "chatbot_data.csv"
+    # Separate from appointmentBot's data/transcripts: each log has one writing process
+    TRANSCRIPT_DIR = os.getenv('TRANSCRIPT_DIR', os.path.join("data", "chat_transcripts"))
+    TRANSCRIPT_INDEX_PATH = os.getenv('TRANSCRIPT_INDEX_PATH', os.path.join("data", "chat_transcripts.db"))
     APPOINTMENTS_CSV_PATH = "appointments.csv"
     USER_DATA_PATH = "user_data.csv"
     
@@ -23,9 +27,58 @@ class Config:
         "Business Insurance"
     ]
     
+    # Booking questions asked one per chat turn by the web servers, in order
+    BOOKING_QUESTIONS = {
+        'name': "May I have your full name for the booking?",
+        'email': "What email address should we send the confirmation to? Say 'skip' if you'd rather not share one.",
+        'mobile': "What mobile number can our advisor reach you on? (10 digits)",
+        'insurance_type': "Which insurance type is the consultation about: " + ", ".join(INSURANCE_TYPES) + "?",
+        'preferred_date': "Which date suits you? (YYYY-MM-DD)",
+        'preferred_time': "And what time? (HH:MM, 24-hour format)"
+    }
+    
     # Token Limits
     MAX_SESSION_TOKENS = 2000
     MAX_RESPONSE_TOKENS = 300
+    MAX_PROMPT_TOKENS = 1500
+    
+    # Hugging Face tokenizer matching the Groq model, used for token accounting
+    TOKENIZER_MODEL = os.getenv('TOKENIZER_MODEL', 'meta-llama/Llama-3.2-3B-Instruct')
+    
+    # Interaction Log: time-partitioned segments, compressed on rollover
+    TRANSCRIPT_PARTITION = os.getenv('TRANSCRIPT_PARTITION', 'hour')  # 'hour' or 'day'
+    TRANSCRIPT_RETENTION_DAYS = int(os.getenv('TRANSCRIPT_RETENTION_DAYS', '90'))
+    
+    # Seconds each caller waits for an LLM completion
+    LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '30'))
+    
+    # LLM Admission Control, sized to the provider's per-minute quotas
+    LLM_REQUESTS_PER_MINUTE = int(os.getenv('LLM_REQUESTS_PER_MINUTE', '30'))
+    LLM_TOKENS_PER_MINUTE = int(os.getenv('LLM_TOKENS_PER_MINUTE', '7000'))
+    LLM_MAX_CONCURRENT = 8
+    LLM_MAX_QUEUE = 32  # calls allowed to wait for admission
+    LLM_QUEUE_TIMEOUT = 10  # seconds a call may wait before it is shed
+    
+    # Post-response work (sentiment, transcript logging, notifications) runs off the request path
+    POST_PROCESS_WORKERS = int(os.getenv('POST_PROCESS_WORKERS', '2'))
+    POST_PROCESS_QUEUE = 1000  # tasks allowed to wait before callers run them inline
+    POST_PROCESS_RETRIES = 3
+    # New bookings are POSTed here as JSON when set
+    BOOKING_WEBHOOK_URL = os.getenv('BOOKING_WEBHOOK_URL', '')
+    
+    # Precomputed FAQ answers written by the RAG ingest step (test files/ingest.py), relative to chatbot/
+    FAQ_INDEX_PATH = os.getenv('FAQ_INDEX_PATH', os.path.join("..", "test files", "vectorstores", "faq_index"))
+    # Trained intent model (intentModel.py train); keyword matching is used until one exists
+    INTENT_MODEL_PATH = os.getenv('INTENT_MODEL_PATH', os.path.join("models", "intent_model"))
+    
+    # In-memory conversations for sessionId requests and /chat/batch
+    MAX_CHAT_SESSIONS = int(os.getenv('MAX_CHAT_SESSIONS', '10000'))
+    BATCH_CHAT_WORKERS = int(os.getenv('BATCH_CHAT_WORKERS', '8'))  # sessions answered in parallel per process
+    BATCH_CHAT_MAX_ITEMS = 100
+    
+    # Tracing and Profiling
+    TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0.1'))
+    PROFILE_DIR = os.path.join("logs", "profiles")
     
     # Relevance Keywords
     INSURANCE_KEYWORDS = [
@@ -62,6 +115,26 @@ class Config:
         ]
     }
 
+    # Off-topic messages the intent model learns as 'general' (intentModel.py train)
+    OUT_OF_SCOPE_EXAMPLES = [
+        "what is the weather today", "who won the match last night", "tell me a joke",
+        "write a poem", "what is the capital of Ghana", "how do I cook rice",
+        "recommend a good movie", "what time is it in London", "translate this to French",
+        "who is the president", "play some music", "what's the news",
+        "solve this math problem", "how tall is mount everest", "best restaurants near me",
+        "how do I fix my laptop", "what is the bitcoin price", "help me with my homework",
+        "sing me a song", "what is your favourite colour"
+    ]
+    
+    # Confidence (0-100) a classified intent needs for a query to count as on-topic, and
+    # for any intent to prompt an appointment offer. Keyword scores (share of an intent's
+    # keywords matched) and model probabilities are on different scales; the model
+    # already returns ('general', 0) for out-of-scope text.
+    INTENT_CONFIDENCE_THRESHOLDS = {
+        'keywords': {'relevant': 30, 'appointment': 50},
+        'model': {'relevant': 0, 'appointment': 95}
+    }
+
     # Greeting responses with variations
     GREETING_RESPONSES = [
         "Hello! I'm ADA, your insurance consultation assistant. How can I help you today?",
@@ -71,6 +144,12 @@ class Config:
         "Welcome! I'm your dedicated insurance consultation assistant. How can I support you today?"
     ]
 
+    # Served when admission control sheds an LLM call
+    BUSY_RESPONSES = [
+        "I'm handling a lot of conversations right now and can't answer that in detail. Please try again in a moment.",
+        "Our assistant is very busy at the moment. Please ask again shortly, or let me help you schedule a consultation."
+    ]
+
     # Additional contextual responses
     INTENT_CONTEXT_RESPONSES = {
         'insurance_inquiry': [
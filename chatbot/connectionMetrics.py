@@ -0,0 +1,85 @@
+import threading
+import time
+
+
+class RateCounter:
+    """Event counter over a rolling window of one-second buckets."""
+
+    def __init__(self, window_seconds=60):
+        self.window_seconds = window_seconds
+        self.buckets = [0] * window_seconds
+        self.bucket_seconds = [0] * window_seconds
+
+    def add(self, count=1, now=None):
+        second = int(now if now is not None else time.time())
+        index = second % self.window_seconds
+        if self.bucket_seconds[index] != second:
+            self.bucket_seconds[index] = second
+            self.buckets[index] = 0
+        self.buckets[index] += count
+
+    def rate(self, now=None):
+        """Average events per second over the window."""
+        second = int(now if now is not None else time.time())
+        oldest = second - self.window_seconds
+        total = sum(
+            count for count, bucket_second in zip(self.buckets, self.bucket_seconds)
+            if bucket_second > oldest
+        )
+        return total / self.window_seconds
+
+
+class ConnectionMetrics:
+    """Connection and message-rate counters for persistent chat sockets."""
+
+    def __init__(self, window_seconds=60):
+        self._lock = threading.Lock()
+        self.active_connections = 0
+        self.total_connections = 0
+        self.messages_received = 0
+        self.messages_sent = 0
+        self.messages_dropped = 0
+        self.heartbeat_timeouts = 0
+        self.received_rate = RateCounter(window_seconds)
+        self.sent_rate = RateCounter(window_seconds)
+
+    def connection_opened(self):
+        with self._lock:
+            self.active_connections += 1
+            self.total_connections += 1
+
+    def connection_closed(self):
+        with self._lock:
+            self.active_connections -= 1
+
+    def message_received(self):
+        with self._lock:
+            self.messages_received += 1
+            self.received_rate.add()
+
+    def message_sent(self):
+        with self._lock:
+            self.messages_sent += 1
+            self.sent_rate.add()
+
+    def message_dropped(self):
+        with self._lock:
+            self.messages_dropped += 1
+
+    def heartbeat_timed_out(self):
+        with self._lock:
+            self.heartbeat_timeouts += 1
+
+    def snapshot(self):
+        """Return the current counters as a dict."""
+        with self._lock:
+            return {
+                'active_connections': self.active_connections,
+                'total_connections': self.total_connections,
+                'messages_received': self.messages_received,
+                'messages_sent': self.messages_sent,
+                'messages_dropped': self.messages_dropped,
+                'heartbeat_timeouts': self.heartbeat_timeouts,
+                'received_per_second': self.received_rate.rate(),
+                'sent_per_second': self.sent_rate.rate()
+            }
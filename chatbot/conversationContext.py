@@ -0,0 +1,133 @@
+import marshal
+import time
+from enum import Enum
+
+
+class ConversationState(str, Enum):
+    GREETING = 'greeting'
+    COLLECTING_NAME = 'collecting_name'
+    UNDERSTANDING_NEED = 'understanding_need'
+    INSURANCE_DISCUSSION = 'insurance_discussion'
+    SCHEDULING_APPOINTMENT = 'scheduling_appointment'
+    FAREWELL = 'farewell'
+
+    def __str__(self):
+        # Keep CSV rows, f-strings and JSON showing the plain state value
+        return self.value
+
+
+class ConversationContext:
+    """
+    Per-conversation state kept compact enough to hold many sessions per process.
+    History is a bounded list of (role, content, epoch_seconds, tokens) tuples;
+    a list trimmed at the limit is several hundred bytes smaller than a deque.
+    session_tokens is the running total of every message ever added.
+    state_entered_at and funnel_reached (a bitmask of funnel stages) feed the
+    shared FunnelMetrics, when one is set on the class.
+    """
+
+    __slots__ = (
+        'user_name', 'insurance_type', 'current_state', 'collected_info',
+        'last_message', 'appointment_suggested', 'conversation_history', 'history_limit',
+        'session_tokens', 'state_entered_at', 'funnel_reached'
+    )
+
+    SERIALIZATION_VERSION = 3
+    HISTORY_LIMIT = 20
+    # FunnelMetrics shared by every context in the process, or None
+    funnel = None
+
+    def __init__(self, history_limit=HISTORY_LIMIT):
+        self.user_name = None
+        self.insurance_type = None
+        self.current_state = ConversationState.GREETING
+        self.collected_info = {}
+        self.last_message = None
+        self.appointment_suggested = False
+        self.conversation_history = []
+        self.history_limit = history_limit
+        self.session_tokens = 0
+        self.state_entered_at = time.time()
+        self.funnel_reached = 0
+
+    def update_state(self, new_state):
+        new_state = ConversationState(new_state)
+        if new_state == self.current_state:
+            return
+        now = time.time()
+        if self.funnel is not None:
+            self.funnel.transition(self, self.current_state, new_state, now)
+        self.current_state = new_state
+        self.state_entered_at = now
+
+    def set_user_name(self, name):
+        self.user_name = name
+        self.collected_info['name'] = name
+
+    def set_insurance_type(self, insurance_type):
+        self.insurance_type = insurance_type
+        self.collected_info['insurance_type'] = insurance_type
+
+    def add_to_history(self, message, role='user', tokens=0):
+        history = self.conversation_history
+        history.append((role, message, time.time(), tokens))
+        self.session_tokens += tokens
+        # Drop the oldest turn once the limit is reached
+        if len(history) > self.history_limit:
+            del history[0]
+        if role == 'user':
+            self.last_message = message
+            if not self.funnel_reached and self.funnel is not None:
+                self.funnel.session_started(self, time.time())
+
+    def to_bytes(self):
+        """
+        Serialize to a compact binary snapshot.
+        Uses marshal, so snapshots are only for trusted local stores and
+        must be read by the same Python version that wrote them.
+        """
+        return marshal.dumps((
+            self.SERIALIZATION_VERSION,
+            self.user_name,
+            self.insurance_type,
+            self.current_state.value,
+            self.collected_info,
+            self.last_message,
+            self.appointment_suggested,
+            self.history_limit,
+            self.session_tokens,
+            self.state_entered_at,
+            self.funnel_reached,
+            tuple(self.conversation_history)
+        ))
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Rebuild a context from a snapshot written by to_bytes."""
+        fields = marshal.loads(data)
+        if fields[0] == 1:
+            # Written before token accounting: turns carry no token count and the session total starts at 0
+            history = tuple(turn + (0,) for turn in fields[-1])
+            fields = (2,) + fields[1:-1] + (0, history)
+        if fields[0] == 2:
+            # Written before funnel tracking: the state clock starts now and no stage is marked reached
+            fields = fields[:-1] + (time.time(), 0) + fields[-1:]
+        elif fields[0] != cls.SERIALIZATION_VERSION:
+            raise ValueError(f"Unsupported conversation snapshot version: {fields[0]}")
+
+        (_, user_name, insurance_type, state, collected_info,
+         last_message, appointment_suggested, history_limit, session_tokens,
+         state_entered_at, funnel_reached, history) = fields
+
+        context = cls(history_limit)
+        context.user_name = user_name
+        context.insurance_type = insurance_type
+        context.current_state = ConversationState(state)
+        context.collected_info = collected_info
+        context.last_message = last_message
+        context.appointment_suggested = appointment_suggested
+        context.session_tokens = session_tokens
+        context.state_entered_at = state_entered_at
+        context.funnel_reached = funnel_reached
+        context.conversation_history = list(history)
+        return context
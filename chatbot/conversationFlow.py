@@ -0,0 +1,127 @@
+import csv
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from conversationContext import ConversationState
+
+
+@dataclass(frozen=True)
+class Transition:
+    """What to do when an event arrives in a state."""
+    action: Optional[str]
+    next_state: Optional[ConversationState]
+    template: Optional[str]
+
+
+class ConversationFlow:
+    """
+    Declarative conversation state machine.
+    Rows of (state, event, action, next state, template) are compiled once into
+    a dict keyed by (state, event), so each message costs a few dict lookups.
+    Turns no row answers fall through to the LLM and are counted and logged.
+    """
+
+    ANY_STATE = '*'
+
+    # Whole-message replies only ("yes", "ok sure, let's do it!"); a message that goes on
+    # to ask something ("Ok, what's the deductible?") is left to the intent and the LLM
+    CONFIRM_PATTERN = re.compile(
+        r"^\W*(?:yes|yeah|yep|yup|sure|ok|okay|of\s+course|definitely|absolutely|please\s+do|"
+        r"sounds\s+good|let'?s\s+do\s+it|go\s+ahead)"
+        r"(?:[\s,.!]+(?:yes|sure|ok|okay|please|thanks|thank\s+you|let'?s\s+do\s+it|go\s+ahead))*\W*$",
+        re.IGNORECASE
+    )
+    DECLINE_PATTERN = re.compile(
+        r"^\W*(?:no|nope|nah|not\s+now|not\s+yet|maybe\s+later|no\s+thanks)"
+        r"(?:[\s,.!]+(?:thanks|thank\s+you|not\s+now|maybe\s+later))*\W*$",
+        re.IGNORECASE
+    )
+
+    def __init__(self, transitions, actions, templates, log_path=None):
+        self.table = {}
+        for state, event, action, next_state, template in transitions:
+            if action is not None and action not in actions:
+                raise ValueError(f"Unknown flow action '{action}' for {state}/{event}")
+            if template is not None and template not in templates:
+                raise ValueError(f"Unknown response template '{template}' for {state}/{event}")
+            key = (state if state == self.ANY_STATE else ConversationState[state], event)
+            self.table[key] = Transition(
+                action, ConversationState[next_state] if next_state else None, template
+            )
+
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._turns = 0
+        self._fast_path = Counter()
+        self._fallthrough = Counter()
+
+    def events(self, message, intent, entities, context):
+        """Events raised by a message, most specific first."""
+        events = []
+        if intent == 'farewell':
+            events.append(intent)
+        # A reply to a booking question is read as the answer, not classified
+        if context.collected_info.get('awaiting'):
+            events.append('booking_details')
+        if intent == 'greeting':
+            events.append(intent)
+        if entities.name and not context.user_name:
+            events.append('name')
+        if entities.insurance_type:
+            events.append('insurance_type')
+        if self.CONFIRM_PATTERN.search(message):
+            events.append('confirm')
+        elif self.DECLINE_PATTERN.search(message):
+            events.append('decline')
+        events.append(intent)
+        return events
+
+    def resolve(self, state, events):
+        """Return (event, transition) for the first event with a row, or (None, None)."""
+        for event in events:
+            transition = self.table.get((state, event)) or self.table.get((self.ANY_STATE, event))
+            if transition is not None:
+                return event, transition
+        return None, None
+
+    def record_fast_path(self, state, event):
+        with self._lock:
+            self._turns += 1
+            self._fast_path[f"{state}/{event}"] += 1
+
+    def record_fallthrough(self, state, intent, message):
+        """Count and log a turn that needed the LLM."""
+        with self._lock:
+            self._turns += 1
+            self._fallthrough[f"{state}/{intent}"] += 1
+            if self.log_path:
+                self._log_fallthrough(state, intent, message)
+
+    def _log_fallthrough(self, state, intent, message):
+        directory = os.path.dirname(self.log_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_exists = os.path.exists(self.log_path)
+
+        with open(self.log_path, mode='a', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            if not file_exists:
+                writer.writerow(['timestamp', 'state', 'intent', 'message'])
+            writer.writerow([datetime.now().strftime("%Y-%m-%d %H:%M:%S"), state, intent, message])
+
+    def stats(self):
+        with self._lock:
+            fallthrough = sum(self._fallthrough.values())
+            return {
+                'turns': self._turns,
+                'fast_path': sum(self._fast_path.values()),
+                'llm_fallthrough': fallthrough,
+                'llm_fallthrough_rate': fallthrough / self._turns if self._turns else 0.0,
+                'fast_path_by_transition': dict(self._fast_path),
+                'fallthrough_by_state_intent': dict(self._fallthrough.most_common(20))
+            }
@@ -0,0 +1,127 @@
+import re
+from dataclasses import dataclass, asdict
+from datetime import date, time
+from typing import Optional
+
+
+@dataclass
+class ExtractedEntities:
+    """Appointment slots found in a single message."""
+    name: Optional[str] = None
+    insurance_type: Optional[str] = None
+    email: Optional[str] = None
+    mobile: Optional[str] = None
+    preferred_date: Optional[str] = None  # YYYY-MM-DD
+    preferred_time: Optional[str] = None  # HH:MM, 24-hour
+
+    def as_dict(self):
+        """Return only the slots that were found."""
+        return {key: value for key, value in asdict(self).items() if value is not None}
+
+
+class EntityExtractor:
+    """Pull name, insurance type, email, mobile, date and time out of free text in one scan."""
+
+    # Words that follow "I'm ...", "call me ..." or "hi ..." but are not names
+    NAME_STOPWORDS = {
+        'a', 'an', 'the', 'there', 'all', 'ada', 'looking', 'interested', 'here',
+        'trying', 'going', 'not', 'just', 'also', 'good', 'fine', 'well', 'okay',
+        'ok', 'sure', 'glad', 'happy', 'new', 'calling', 'writing', 'asking',
+        'wondering', 'planning', 'thinking', 'searching', 'in', 'from', 'with',
+        'about', 'for', 'to', 'again', 'everyone', 'team', 'sir', 'madam',
+        'i', 'im', 'my', 'me', 'yes', 'no', 'what', 'how', 'can', 'could', 'would',
+        'do', 'does', 'is', 'are', 'need', 'want', 'please', 'thanks',
+        'at', 'on', 'by', 'of', 'as', 'into', 'via', 'after', 'before', 'between', 'back', 'later',
+        'today', 'tomorrow', 'tonight', 'now', 'soon', 'anytime', 'anyone', 'hi', 'hello', 'hey'
+    }
+
+    def __init__(self, insurance_types):
+        self.insurance_types = {insurance_type.lower(): insurance_type for insurance_type in insurance_types}
+        # Longest first so overlapping names prefer the most specific type
+        types = "|".join(re.escape(t) for t in sorted(insurance_types, key=len, reverse=True))
+
+        self.pattern = re.compile(r"""
+              (?P<intro>\b(?:i\s+am|i'm|im|this\s+is|my\s+name\s+is|name\s+is|call\s+me)\s+(?P<intro_name>[a-z]+))
+            | (?P<greeting>^\s*(?:hi|hello|hey)\b[\s,!.]*(?:this\s+is\s+|it's\s+)?(?!(?:i|im|my)\b)(?P<greeting_name>[a-z]+))
+            | (?P<here>^\s*(?P<here_name>[a-z]+)\s+here\b)
+            | (?P<insurance>\b(?:%s)\b)
+            | (?P<email>[\w.+-]+@[\w-]+(?:\.[\w-]+)+)
+            | (?P<iso_date>\b(?P<iso_year>\d{4})-(?P<iso_month>\d{1,2})-(?P<iso_day>\d{1,2})\b)
+            | (?P<dmy_date>\b(?P<dmy_day>\d{1,2})[/.](?P<dmy_month>\d{1,2})[/.](?P<dmy_year>\d{4})\b)
+            | (?P<clock_time>\b(?P<clock_hour>[01]?\d|2[0-3]):(?P<clock_minute>[0-5]\d)(?:\s*(?P<clock_meridiem>[ap])\.?m\b\.?)?)
+            | (?P<meridiem_time>\b(?P<meridiem_hour>1[0-2]|0?[1-9])\s*(?P<meridiem>[ap])\.?m\b\.?)
+            | (?P<mobile>(?<![\d+])\d{3}[\s-]?\d{3}[\s-]?\d{4}(?!\d))
+        """ % types, re.IGNORECASE | re.VERBOSE)
+
+    def extract(self, message):
+        """Scan the message once and return every slot found, first occurrence wins."""
+        entities = ExtractedEntities()
+        # "I'm John" beats a name guessed from "Hi John" or "John here" anywhere in the message
+        fallback_name = None
+
+        for match in self.pattern.finditer(message):
+            kind = match.lastgroup
+
+            if kind in ('intro', 'greeting', 'here'):
+                name = match.group(f'{kind}_name')
+                if name.lower() in self.NAME_STOPWORDS:
+                    continue
+                if kind == 'intro':
+                    if entities.name is None:
+                        entities.name = name.capitalize()
+                elif fallback_name is None:
+                    fallback_name = name.capitalize()
+
+            elif kind == 'insurance':
+                if entities.insurance_type is None:
+                    entities.insurance_type = self.insurance_types[" ".join(match.group(kind).lower().split())]
+
+            elif kind == 'email':
+                if entities.email is None:
+                    entities.email = match.group(kind)
+
+            elif kind == 'mobile':
+                if entities.mobile is None:
+                    entities.mobile = re.sub(r'\D', '', match.group(kind))
+
+            elif kind in ('iso_date', 'dmy_date'):
+                prefix = kind.split('_')[0]
+                if entities.preferred_date is None:
+                    entities.preferred_date = self._format_date(
+                        match.group(f'{prefix}_year'), match.group(f'{prefix}_month'), match.group(f'{prefix}_day')
+                    )
+
+            elif kind == 'clock_time':
+                if entities.preferred_time is None:
+                    entities.preferred_time = self._format_time(
+                        match.group('clock_hour'), match.group('clock_minute'), match.group('clock_meridiem')
+                    )
+
+            elif kind == 'meridiem_time':
+                if entities.preferred_time is None:
+                    entities.preferred_time = self._format_time(
+                        match.group('meridiem_hour'), '0', match.group('meridiem')
+                    )
+
+        if entities.name is None:
+            entities.name = fallback_name
+        return entities
+
+    @staticmethod
+    def _format_date(year, month, day):
+        try:
+            return date(int(year), int(month), int(day)).isoformat()
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _format_time(hour, minute, meridiem=None):
+        hour = int(hour)
+        if meridiem:
+            if hour > 12:
+                return None
+            hour = hour % 12 + (12 if meridiem.lower() == 'p' else 0)
+        try:
+            return time(hour, int(minute)).strftime('%H:%M')
+        except ValueError:
+            return None
@@ -0,0 +1,32 @@
+import json
+import os
+import re
+
+
+class FaqAnswers:
+    """
+    Vetted FAQ answers precomputed by the RAG ingest step.
+    This bot has no embedding model, so it serves exact matches on the
+    normalized question text only.
+    """
+
+    def __init__(self, index_path):
+        self.answers = {}
+        answers_path = os.path.join(index_path, "answers.json")
+        if not os.path.exists(answers_path):
+            print(f"Warning: no FAQ index at {answers_path}. Run the ingest step or set FAQ_INDEX_PATH; "
+                  "every question will go to the LLM.")
+            return
+        with open(answers_path, encoding='utf-8') as file:
+            for entry in json.load(file):
+                self.answers[self.normalize(entry['question'])] = entry
+
+    @staticmethod
+    def normalize(text):
+        return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+    def match(self, query):
+        """Return the stored FAQ entry for the query, or None."""
+        if not self.answers:
+            return None
+        return self.answers.get(self.normalize(query))
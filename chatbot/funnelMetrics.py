@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import Counter
+
+from conversationContext import ConversationState
+
+# Stages a booking conversation passes through, in order
+FUNNEL_STAGES = (
+    ConversationState.GREETING,
+    ConversationState.UNDERSTANDING_NEED,
+    ConversationState.INSURANCE_DISCUSSION,
+    ConversationState.SCHEDULING_APPOINTMENT
+)
+STAGE_BITS = {state: 1 << index for index, state in enumerate(FUNNEL_STAGES)}
+
+# Upper bounds (seconds) of the time-in-state histogram buckets; the last bucket is open
+DWELL_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+
+# Rolling windows reported by stats(), in seconds
+WINDOWS = {'5m': 300, '1h': 3600, '24h': 86400}
+
+
+class WindowedCounter:
+    """
+    Keyed counts over a rolling window, as a ring of fixed-width buckets.
+    Memory is bounded by the bucket count times the number of distinct keys.
+    """
+
+    def __init__(self, window_seconds=86400, bucket_seconds=60):
+        self.bucket_seconds = bucket_seconds
+        self.size = window_seconds // bucket_seconds
+        self.buckets = [Counter() for _ in range(self.size)]
+        self.bucket_starts = [0] * self.size
+
+    def add(self, key, count=1, now=None):
+        start = int(now if now is not None else time.time()) // self.bucket_seconds
+        index = start % self.size
+        if self.bucket_starts[index] != start:
+            self.bucket_starts[index] = start
+            self.buckets[index].clear()
+        self.buckets[index][key] += count
+
+    def totals(self, seconds, now=None):
+        """Counts over the last `seconds`, rounded to whole buckets."""
+        newest = int(now if now is not None else time.time()) // self.bucket_seconds
+        oldest = newest - min(-(-seconds // self.bucket_seconds), self.size)
+        totals = Counter()
+        for bucket, start in zip(self.buckets, self.bucket_starts):
+            if oldest < start <= newest:
+                totals.update(bucket)
+        return totals
+
+
+class FunnelMetrics:
+    """
+    Streaming conversation funnel counters, fed by ConversationContext.
+    Each context carries the time it entered its current state and a bitmask of
+    the funnel stages it has reached, so a state change costs a few counter
+    increments: no log is scanned and memory does not grow with sessions.
+    Windowed conversion rates count events by when they happened, not by the
+    cohort a session started in, so a window can briefly show a step above 100%.
+    """
+
+    def __init__(self, window_seconds=max(WINDOWS.values()), bucket_seconds=60):
+        self._lock = threading.Lock()
+        self._totals = Counter()
+        self._windowed = WindowedCounter(window_seconds, bucket_seconds)
+
+    def _record(self, keys, now):
+        with self._lock:
+            for key in keys:
+                self._totals[key] += 1
+                self._windowed.add(key, now=now)
+
+    def session_started(self, context, now):
+        """Count a conversation's first message as a session entering the funnel."""
+        context.funnel_reached |= STAGE_BITS[ConversationState.GREETING]
+        self._record([('started',), ('reached', ConversationState.GREETING.value)], now)
+
+    def transition(self, context, old_state, new_state, now):
+        """Record one state change; the caller updates the context's state afterwards."""
+        dwell = now - context.state_entered_at
+        bucket = next((index for index, bound in enumerate(DWELL_BUCKETS) if dwell <= bound), len(DWELL_BUCKETS))
+        keys = [('transition', old_state.value, new_state.value), ('dwell', old_state.value, bucket)]
+        if not context.funnel_reached:
+            keys.append(('started',))
+        # Only the first arrival at a stage counts, and skipping a stage
+        # (e.g. naming the insurance type in the first message) passes through it
+        stages = FUNNEL_STAGES[:FUNNEL_STAGES.index(new_state) + 1] if new_state in STAGE_BITS else FUNNEL_STAGES[:1]
+        for state in stages:
+            if not context.funnel_reached & STAGE_BITS[state]:
+                context.funnel_reached |= STAGE_BITS[state]
+                keys.append(('reached', state.value))
+        self._record(keys, now)
+
+    @staticmethod
+    def _summary(counts):
+        started = counts[('started',)]
+        reached = [counts[('reached', state.value)] for state in FUNNEL_STAGES]
+        funnel = []
+        for index, state in enumerate(FUNNEL_STAGES):
+            previous = reached[index - 1] if index else started
+            funnel.append({
+                'state': state.value,
+                'reached': reached[index],
+                'conversion': reached[index] / started if started else 0.0,
+                'step_conversion': reached[index] / previous if previous else 0.0,
+                'dropped_after': max(reached[index] - reached[index + 1], 0) if index + 1 < len(reached) else None
+            })
+
+        transitions = {}
+        dwell = {}
+        labels = [f"<={bound}s" for bound in DWELL_BUCKETS] + [f">{DWELL_BUCKETS[-1]}s"]
+        for key, count in counts.items():
+            if key[0] == 'transition':
+                transitions[f"{key[1]}->{key[2]}"] = count
+            elif key[0] == 'dwell':
+                dwell.setdefault(key[1], dict.fromkeys(labels, 0))[labels[key[2]]] = count
+        return {'sessions_started': started, 'funnel': funnel, 'transitions': transitions, 'time_in_state': dwell}
+
+    def stats(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            totals = Counter(self._totals)
+            windows = {name: self._windowed.totals(seconds, now) for name, seconds in WINDOWS.items()}
+        return {
+            'all_time': self._summary(totals),
+            'windows': {name: self._summary(counts) for name, counts in windows.items()}
+        }
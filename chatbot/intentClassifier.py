@@ -1,10 +1,26 @@
+import os
+
+
 class IntentClassifier:
+    # Trained intentModel.HashedIntentModel; keyword matching is used while this is None
+    model = None
+
+    @classmethod
+    def load_model(cls, path):
+        """Use the trained model at `path` if one exists; NumPy is only imported when it does."""
+        if os.path.exists(f"{path}.npy"):
+            from intentModel import HashedIntentModel
+            cls.model = HashedIntentModel.load(path)
+        return cls.model
+
     @staticmethod
     def classify_intent(query, intents):
         """
-        Classify the user's intent based on keyword matching.
+        Classify the user's intent with the trained model, or by keyword matching.
         Returns the most likely intent and confidence score.
         """
+        if IntentClassifier.model is not None:
+            return IntentClassifier.model.classify_intent(query, intents)
         query_lower = query.lower()
         
         # Check for multi-word intents first
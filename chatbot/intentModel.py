@@ -0,0 +1,313 @@
+import argparse
+import csv
+import json
+import math
+import os
+import re
+import time
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def bucket(gram, dimensions):
+    return zlib.crc32(gram.encode('utf-8')) % dimensions
+
+
+# Chat vocabulary is small, so most words and word pairs are hashed once per process
+@lru_cache(maxsize=65536)
+def word_buckets(word, dimensions, char_ngrams):
+    """Buckets of a word and its character trigrams."""
+    buckets = [bucket(word, dimensions)]
+    if char_ngrams:
+        padded = f"<{word}>"
+        buckets.extend(bucket(padded[index:index + 3], dimensions) for index in range(len(padded) - 2))
+    return tuple(buckets)
+
+
+@lru_cache(maxsize=65536)
+def bigram_bucket(first, second, dimensions):
+    return bucket(f"{first} {second}", dimensions)
+
+
+def hashed_features(text, dimensions, char_ngrams=True):
+    """
+    Unique buckets of a text's word unigrams, word bigrams and character trigrams.
+    Term frequency is binary: chat messages rarely repeat a term, and skipping
+    the counts keeps a prediction to a few NumPy calls.
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    buckets = [bigram_bucket(first, second, dimensions) for first, second in zip(words, words[1:])]
+    for word in words:
+        buckets.extend(word_buckets(word, dimensions, char_ngrams))
+    unique = dict.fromkeys(buckets)
+    return np.fromiter(unique, dtype=np.int64, count=len(unique))
+
+
+def adam_step(parameter, gradient, first, second, rows, learning_rate, step):
+    """In-place Adam update of parameter[rows]."""
+    first[rows] = 0.9 * first[rows] + 0.1 * gradient
+    second[rows] = 0.999 * second[rows] + 0.001 * gradient * gradient
+    correction = math.sqrt(1 - 0.999 ** step) / (1 - 0.9 ** step)
+    parameter[rows] -= learning_rate * correction * first[rows] / (np.sqrt(second[rows]) + 1e-8)
+
+
+class HashedIntentModel:
+    """
+    Linear intent classifier over hashed n-gram TF-IDF features.
+    Word unigrams, word bigrams and character trigrams are hashed (crc32) into
+    `dimensions` buckets, weighted by idf and L2-normalized; a softmax layer
+    maps them to intents. Everything lives in one float32 array,
+    idf in column 0 and class weights after it, with the biases in the last
+    row, saved as `<path>.npy` (memory-mapped on load) next to `<path>.json`.
+    classify_intent keeps IntentClassifier's (intent, confidence 0-100) contract.
+
+    The softmax only ranks the intents it was trained on, so off-topic text is
+    learned as its own 'general' class (see out_of_scope_examples). A 'general'
+    prediction, or any intent below MIN_CONFIDENCE, is returned as ('general', 0)
+    like an unmatched message under keyword matching.
+    """
+
+    MIN_CONFIDENCE = 40
+    OUT_OF_SCOPE = ('general', 0)
+
+    def __init__(self, labels, weights, dimensions, char_ngrams=True):
+        self.labels = list(labels)
+        self.weights = weights
+        self.dimensions = dimensions
+        self.char_ngrams = char_ngrams
+        # Plain ndarray views of a memory map skip np.memmap's per-operation overhead
+        self.idf = np.asarray(weights[:dimensions, 0])
+        self.class_weights = np.asarray(weights[:dimensions, 1:])
+        self.bias = np.array(weights[dimensions, 1:])
+
+    def _vector(self, text):
+        indices = hashed_features(text, self.dimensions, self.char_ngrams)
+        values = self.idf[indices]
+        norm = np.sqrt(values @ values)
+        return indices, values / norm if norm else values
+
+    def _logits(self, text):
+        indices = hashed_features(text, self.dimensions, self.char_ngrams)
+        values = self.idf[indices]
+        # Normalizing the few logits is cheaper than normalizing the feature vector
+        norm = math.sqrt(values @ values) or 1.0
+        return (values @ self.class_weights[indices]) / norm + self.bias
+
+    def predict_proba(self, text):
+        logits = self._logits(text)
+        exp = np.exp(logits - logits.max())
+        return exp / exp.sum()
+
+    def classify_intent(self, query, intents=None):
+        """Most likely intent and its probability as a 0-100 confidence (`intents` is ignored)."""
+        # A handful of classes: plain Python is faster than more NumPy calls
+        logits = self._logits(query).tolist()
+        best = max(range(len(logits)), key=logits.__getitem__)
+        return self.scoped(self.labels[best], 100 / sum(math.exp(logit - logits[best]) for logit in logits))
+
+    def scoped(self, intent, confidence):
+        """(intent, confidence), or ('general', 0) when the message is out of scope or the intent uncertain."""
+        if intent == self.OUT_OF_SCOPE[0] or confidence < self.MIN_CONFIDENCE:
+            return self.OUT_OF_SCOPE
+        return intent, confidence
+
+    def predict_batch(self, texts):
+        """[(intent, confidence)] for many texts with one gather and one reduce over all their features."""
+        if not texts:
+            return []
+        rows = [self._vector(text) for text in texts]
+        lengths = np.array([len(indices) for indices, _ in rows])
+        indices = np.concatenate([indices for indices, _ in rows])
+        values = np.concatenate([values for _, values in rows])
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        logits = np.tile(self.bias, (len(texts), 1))
+        # One segment sum per text; texts without features keep just the bias
+        present = lengths > 0
+        if present.any():
+            logits[present] += np.add.reduceat(self.class_weights[indices] * values[:, None], starts[present])
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probabilities = exp / exp.sum(axis=1, keepdims=True)
+        best = probabilities.argmax(axis=1)
+        return [self.scoped(self.labels[label], float(probabilities[row, label]) * 100) for row, label in enumerate(best)]
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.save(f"{path}.npy", np.ascontiguousarray(self.weights, dtype=np.float32))
+        with open(f"{path}.json", 'w', encoding='utf-8') as file:
+            json.dump({'labels': self.labels, 'dimensions': self.dimensions, 'char_ngrams': self.char_ngrams}, file)
+
+    @classmethod
+    def load(cls, path):
+        """Load a trained model, or return None if it has not been trained yet."""
+        if not os.path.exists(f"{path}.json") or not os.path.exists(f"{path}.npy"):
+            return None
+        with open(f"{path}.json", encoding='utf-8') as file:
+            meta = json.load(file)
+        weights = np.load(f"{path}.npy", mmap_mode='r')
+        return cls(meta['labels'], weights, meta['dimensions'], meta['char_ngrams'])
+
+    @classmethod
+    def train(cls, texts, labels, dimensions=2 ** 16, char_ngrams=True, epochs=30, learning_rate=0.05,
+              l2=1e-5, batch_size=256, seed=0):
+        """Fit idf and a softmax layer with mini-batch Adam; returns the model."""
+        names = sorted(set(labels))
+        targets = np.array([names.index(label) for label in labels])
+
+        rows = [hashed_features(text, dimensions, char_ngrams) for text in texts]
+        document_frequency = np.zeros(dimensions, dtype=np.float32)
+        for indices in rows:
+            document_frequency[indices] += 1
+        idf = np.log((1 + len(rows)) / (1 + document_frequency)) + 1
+
+        vectors = []
+        for indices in rows:
+            values = idf[indices]
+            norm = math.sqrt(float(values @ values))
+            vectors.append((indices, values / norm if norm else values))
+
+        rng = np.random.default_rng(seed)
+        weights = np.zeros((dimensions, len(names)), dtype=np.float32)
+        bias = np.zeros(len(names), dtype=np.float32)
+        moments = [np.zeros_like(weights), np.zeros_like(weights), np.zeros_like(bias), np.zeros_like(bias)]
+        step = 0
+        for _ in range(epochs):
+            order = rng.permutation(len(vectors))
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                # Sparse batch as (row, bucket, value) triples
+                batch_rows = np.concatenate([np.full(len(vectors[row][0]), position) for position, row in enumerate(batch)])
+                buckets = np.concatenate([vectors[row][0] for row in batch])
+                values = np.concatenate([vectors[row][1] for row in batch])
+
+                logits = np.zeros((len(batch), len(names)), dtype=np.float32)
+                np.add.at(logits, batch_rows, weights[buckets] * values[:, None])
+                logits += bias
+                exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+                error = exp / exp.sum(axis=1, keepdims=True)
+                error[np.arange(len(batch)), targets[batch]] -= 1
+                error /= len(batch)
+
+                touched, inverse = np.unique(buckets, return_inverse=True)
+                gradient = np.zeros((len(touched), len(names)), dtype=np.float32)
+                np.add.at(gradient, inverse, error[batch_rows] * values[:, None])
+                gradient += l2 * weights[touched]
+
+                # Only the buckets present in the batch are updated
+                step += 1
+                adam_step(weights, gradient, moments[0], moments[1], touched, learning_rate, step)
+                adam_step(bias, error.sum(axis=0), moments[2], moments[3], slice(None), learning_rate, step)
+
+        packed = np.zeros((dimensions + 1, len(names) + 1), dtype=np.float32)
+        packed[:dimensions, 0] = idf
+        packed[:dimensions, 1:] = weights
+        packed[dimensions, 1:] = bias
+        return cls(names, packed, dimensions, char_ngrams)
+
+
+def read_examples(path, text_column, label_column):
+    """
+    (text, label) pairs from a CSV. Columns are header names, or 0-based
+    positions for header-less files such as chatbot_data.csv; rows without
+    a label are skipped.
+    """
+    positional = text_column.isdigit() and label_column.isdigit()
+    with open(path, newline='', encoding='utf-8') as file:
+        reader = csv.reader(file) if positional else csv.DictReader(file)
+        for row in reader:
+            if positional:
+                text_key, label_key = int(text_column), int(label_column)
+                if len(row) <= max(text_key, label_key):
+                    continue
+            else:
+                text_key, label_key = text_column, label_column
+            text, label = (row[text_key] or '').strip(), (row[label_key] or '').strip()
+            if text and label:
+                yield text, label
+
+
+def keyword_examples(intents):
+    """Every keyword phrase of Config.INTENTS as a one-line example of its intent."""
+    return [(keyword, intent) for intent, keywords in intents.items() for keyword in keywords]
+
+
+def out_of_scope_examples(texts):
+    """Config.OUT_OF_SCOPE_EXAMPLES as examples of the 'general' class, so off-topic text has a class to land in."""
+    return [(text, HashedIntentModel.OUT_OF_SCOPE[0]) for text in texts]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train, apply or time the hashed TF-IDF intent model.")
+    parser.add_argument('command', choices=['train', 'predict', 'benchmark'])
+    parser.add_argument('--data', help="Labelled CSV for train, or texts to label for predict")
+    parser.add_argument('--text-column', default='query', help="Header name, or 0-based position")
+    parser.add_argument('--label-column', default='intent', help="Header name, or 0-based position")
+    parser.add_argument('--model', default=os.path.join("models", "intent_model"), help="Model path without extension")
+    parser.add_argument('--output', help="predict: CSV to write (default: stdout)")
+    parser.add_argument('--dimensions', type=int, default=2 ** 16)
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--no-keywords', action='store_true',
+                        help="train: skip the Config.INTENTS keyword and Config.OUT_OF_SCOPE_EXAMPLES seeds")
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        examples = list(read_examples(args.data, args.text_column, args.label_column)) if args.data else []
+        if not args.no_keywords:
+            from config import Config
+            examples += keyword_examples(Config.INTENTS) + out_of_scope_examples(Config.OUT_OF_SCOPE_EXAMPLES)
+        texts, labels = zip(*examples)
+        started = time.perf_counter()
+        model = HashedIntentModel.train(list(texts), list(labels), args.dimensions, epochs=args.epochs)
+        model.save(args.model)
+        # predict_batch reports uncertain predictions as 'general', so they count as misses here
+        correct = sum(predicted == label for (predicted, _), label in zip(model.predict_batch(list(texts)), labels))
+        print(f"Trained on {len(texts)} examples, {len(model.labels)} intents, in {time.perf_counter() - started:.1f} s; "
+              f"training accuracy {correct / len(texts):.1%}; saved to {args.model}.npy")
+        return
+
+    model = HashedIntentModel.load(args.model)
+    if model is None:
+        raise SystemExit(f"No model at {args.model}; run the train command first")
+
+    if args.command == 'predict':
+        with open(args.data, newline='', encoding='utf-8') as file:
+            positional = args.text_column.isdigit()
+            reader = csv.reader(file) if positional else csv.DictReader(file)
+            texts = [row[int(args.text_column) if positional else args.text_column] for row in reader]
+        started = time.perf_counter()
+        predictions = model.predict_batch(texts)
+        seconds = time.perf_counter() - started
+        if args.output:
+            with open(args.output, 'w', newline='', encoding='utf-8') as file:
+                writer = csv.writer(file)
+                writer.writerow(['text', 'intent', 'confidence'])
+                for text, (intent, confidence) in zip(texts, predictions):
+                    writer.writerow([text, intent, f"{confidence:.1f}"])
+        else:
+            for text, (intent, confidence) in zip(texts, predictions):
+                print(f"{intent:<22} {confidence:5.1f}  {text[:80]}")
+        print(f"Labelled {len(texts)} texts in {seconds * 1000:.1f} ms")
+        return
+
+    samples = ["hi there", "I want to book an appointment for next week", "what does life insurance cover",
+               "my car was damaged, how do I file a claim", "thanks, goodbye"]
+    model.classify_intent(samples[0])
+    runs = 20000
+    started = time.perf_counter()
+    for index in range(runs):
+        model.classify_intent(samples[index % len(samples)])
+    single_us = (time.perf_counter() - started) / runs * 1e6
+    batch = samples * 2000
+    started = time.perf_counter()
+    model.predict_batch(batch)
+    batch_us = (time.perf_counter() - started) / len(batch) * 1e6
+    print(f"classify_intent: {single_us:.1f} us/message; predict_batch: {batch_us:.1f} us/message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from reminderScheduler import ReminderScheduler
+
+
+def write_bookings(path, count, rng, start):
+    """Append `count` bookings spread over the next 90 days to a user_data.csv-style file."""
+    with open(path, 'a', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        if file.tell() == 0:
+            writer.writerow(['name', 'email', 'mobile', 'insurance_type',
+                             'preferred_date', 'preferred_time', 'appointment_needed'])
+        for index in range(count):
+            when = start + timedelta(minutes=rng.randrange(2 * 60, 90 * 24 * 60))
+            writer.writerow([f"User {index}", 'Not Provided', f"98{index:08d}", 'Life Insurance',
+                             when.strftime("%Y-%m-%d"), when.strftime("%H:%M"), True])
+
+
+def row_offsets(path):
+    """Booking ids (row byte offsets) of every data row in the CSV."""
+    offsets = []
+    with open(path, 'rb') as file:
+        offset = len(file.readline())
+        for line in file:
+            offsets.append(offset)
+            offset += len(line)
+    return offsets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure reminder scheduling, cancellation and restart cost.")
+    parser.add_argument('--bookings', type=int, default=350_000, help="each booking schedules one event per "
+                                                                      "lead time plus a no-show check")
+    parser.add_argument('--appended', type=int, default=1_000, help="bookings added before the restart")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    ignore = lambda *_: None
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "user_data.csv")
+        snapshot_path = os.path.join(directory, "reminders.snapshot")
+        write_bookings(csv_path, args.bookings, rng, datetime.now())
+
+        start = time.perf_counter()
+        scheduler = ReminderScheduler(csv_path, snapshot_path, ignore, ignore)
+        scheduler.poll()
+        load_seconds = time.perf_counter() - start
+        pending = scheduler.stats()['pending']
+
+        # Inserts and cancellations against the full heap
+        operations = 100_000
+        now = time.time()
+        start = time.perf_counter()
+        for index in range(operations):
+            scheduler.schedule(10 ** 12 + index, now + rng.uniform(3 * 3600, 90 * 86400), now)
+        insert_us = (time.perf_counter() - start) / operations * 1e6
+        # Cancels are validated and appended to the marks file, then applied by the next poll
+        cancelled = row_offsets(csv_path)[:operations]
+        start = time.perf_counter()
+        for booking_id in cancelled:
+            scheduler.cancel(booking_id)
+        cancel_us = (time.perf_counter() - start) / len(cancelled) * 1e6
+        start = time.perf_counter()
+        scheduler.poll()
+        apply_us = (time.perf_counter() - start) / len(cancelled) * 1e6
+
+        start = time.perf_counter()
+        snapshot_bytes = scheduler.save_snapshot()
+        save_seconds = time.perf_counter() - start
+
+        # Restart: load the snapshot and read only the rows appended since
+        write_bookings(csv_path, args.appended, rng, datetime.now())
+        start = time.perf_counter()
+        restarted = ReminderScheduler(csv_path, snapshot_path, ignore, ignore)
+        read = restarted.poll()
+        restart_seconds = time.perf_counter() - start
+
+        # Steady-state memory is the heap as loaded from the snapshot
+        tracemalloc.start()
+        loaded = ReminderScheduler(csv_path, snapshot_path, ignore, ignore)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        # A day's worth of events, popped in one go
+        before = loaded.stats()['pending']
+        start = time.perf_counter()
+        loaded.pop_due(now + 86400)
+        popped = before - loaded.stats()['pending']
+        pop_us = (time.perf_counter() - start) / max(popped, 1) * 1e6
+
+    print(f"Bookings: {args.bookings:,} -> {pending:,} scheduled events (seed {args.seed})")
+    print(f"Initial CSV load: {load_seconds:.2f} s, {memory / before:,.0f} bytes/event in memory")
+    print(f"Insert: {insert_us:.1f} us/booking, cancel: {cancel_us:.2f} us/booking "
+          f"(+{apply_us:.2f} us to apply in the scheduler)")
+    print(f"Snapshot: {snapshot_bytes / 1e6:,.1f} MB written in {save_seconds:.2f} s")
+    print(f"Restart with {read:,} new rows: {restart_seconds:.2f} s")
+    print(f"Pop due: {pop_us:.2f} us/event over {popped:,} events")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+import atexit
+import csv
+import heapq
+import marshal
+import os
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: no lock, so run a single server process there
+    fcntl = None
+
+# Kind of a heap entry: a reminder stores its lead time in minutes, a no-show check stores -1
+NO_SHOW = -1
+SNAPSHOT_VERSION = 2
+
+
+@lru_cache(maxsize=65536)
+def appointment_time(preferred_date, preferred_time):
+    """Epoch seconds of a booking's YYYY-MM-DD date and HH:MM time (server local time), or None."""
+    # Bookings share slots, so most rows hit the cache
+    if len(preferred_date) != 10 or len(preferred_time) != 5:
+        return None
+    try:
+        return datetime.fromisoformat(f"{preferred_date}T{preferred_time}").timestamp()
+    except ValueError:
+        return None
+
+
+class ReminderScheduler:
+    """
+    Fires reminder and no-show hooks for the bookings in user_data.csv.
+    Each booking becomes min-heap entries (fire_at, booking_id, kind), one per
+    reminder lead time plus a no-show check `no_show_grace_minutes` after the
+    appointment. The booking id is the byte offset of its CSV row, so a booking
+    is re-read from the file when a hook fires instead of being held in memory.
+    Cancelling is O(1): the id is marked and its entries are skipped when popped,
+    with the heap rebuilt once marked entries could make up half of it.
+    The CSV is read incrementally (only bytes appended since the last read), and
+    the heap is snapshotted with that offset, so a restart reads only new rows.
+    Entries more than `max_lateness_minutes` overdue (e.g. after downtime) are
+    dropped rather than fired, and a reminder never fires after its appointment.
+    Every server process may call start(), but only the one holding an exclusive
+    lock on `<snapshot>.lock` runs the heap and writes the snapshot; the others
+    wait to take over if it exits. Cancels and check-ins from any process are
+    appended to `<snapshot>.marks`, which the running scheduler reads like the CSV.
+    """
+
+    def __init__(self, csv_path, snapshot_path, on_reminder, on_no_show, lead_minutes=(1440, 60),
+                 no_show_grace_minutes=30, max_lateness_minutes=360, poll_seconds=30, snapshot_seconds=300):
+        self.csv_path = csv_path
+        self.snapshot_path = snapshot_path
+        self.lock_path = f"{snapshot_path}.lock"
+        self.marks_path = f"{snapshot_path}.marks"
+        self.on_reminder = on_reminder
+        self.on_no_show = on_no_show
+        self.lead_minutes = tuple(lead_minutes)
+        self.no_show_grace = no_show_grace_minutes * 60
+        self.max_lateness = max_lateness_minutes * 60
+        self.poll_seconds = poll_seconds
+        self.snapshot_seconds = snapshot_seconds
+        self._heap = []
+        self._cancelled = set()  # booking ids whose entries are all skipped
+        self._checked_in = set()  # booking ids whose no-show check is skipped
+        self._header = None
+        self._offset = 0
+        self._marks_offset = 0
+        self._leader = False
+        self._lock_file = None
+        self._wakeup = threading.Condition()
+        self._poll_lock = threading.Lock()  # one CSV reader at a time
+        self._stopped = False
+        self._dirty = False
+        self._last_snapshot = time.monotonic()
+        self._thread = None
+        self._counts = {'bookings_loaded': 0, 'unscheduled': 0, 'reminders_fired': 0, 'no_shows_fired': 0,
+                        'expired': 0, 'cancelled': 0, 'hook_errors': 0}
+        self._load_snapshot()
+
+    def _load_snapshot(self):
+        try:
+            with open(self.snapshot_path, 'rb') as file:
+                # One read: marshal.load on a file object reads in small chunks
+                state = marshal.loads(file.read())
+        except FileNotFoundError:
+            return
+        except (EOFError, ValueError, TypeError) as e:
+            print(f"Warning: could not read reminder snapshot {self.snapshot_path} ({e}). Rebuilding from the CSV.")
+            return
+        # A CSV that shrank or was replaced invalidates the stored offset
+        if (state.get('version') != SNAPSHOT_VERSION or not os.path.exists(self.csv_path)
+                or os.path.getsize(self.csv_path) < state['offset']):
+            return
+        self._heap = list(state['heap'])
+        heapq.heapify(self._heap)
+        self._cancelled = set(state['cancelled'])
+        self._checked_in = set(state['checked_in'])
+        self._header = state['header']
+        self._offset = state['offset']
+        self._marks_offset = state['marks_offset']
+
+    def save_snapshot(self):
+        """Write the heap and CSV offset atomically; returns the snapshot size in bytes."""
+        with self._wakeup:
+            state = {
+                'version': SNAPSHOT_VERSION,
+                'offset': self._offset,
+                'marks_offset': self._marks_offset,
+                'header': self._header,
+                'heap': list(self._heap),
+                'cancelled': list(self._cancelled),
+                'checked_in': list(self._checked_in)
+            }
+            self._dirty = False
+            self._last_snapshot = time.monotonic()
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = marshal.dumps(state)
+        temporary_path = f"{self.snapshot_path}.tmp"
+        with open(temporary_path, 'wb') as file:
+            file.write(data)
+        os.replace(temporary_path, self.snapshot_path)
+        return len(data)
+
+    def schedule(self, booking_id, appointment_at, now=None):
+        """Queue the reminders and no-show check for one booking; returns the number of entries added."""
+        return self._push(self._entries(booking_id, appointment_at, time.time() if now is None else now))
+
+    def _entries(self, booking_id, appointment_at, now):
+        entries = [(appointment_at - minutes * 60, booking_id, minutes) for minutes in self.lead_minutes]
+        entries.append((appointment_at + self.no_show_grace, booking_id, NO_SHOW))
+        # Reminders for an appointment that has already started are pointless
+        return [entry for entry in entries
+                if now - entry[0] <= self.max_lateness and (entry[2] == NO_SHOW or appointment_at > now)]
+
+    def _push(self, entries):
+        with self._wakeup:
+            earliest = self._heap[0][0] if self._heap else None
+            if len(entries) > len(self._heap):
+                # Bulk loads (first start, large imports): heapify is O(n) overall
+                self._heap.extend(entries)
+                heapq.heapify(self._heap)
+            else:
+                for entry in entries:
+                    heapq.heappush(self._heap, entry)
+            self._dirty = self._dirty or bool(entries)
+            if entries and (earliest is None or self._heap[0][0] < earliest):
+                self._wakeup.notify()
+        return len(entries)
+
+    def cancel(self, booking_id):
+        """Drop every pending reminder for a booking; returns False if the id is not a booking."""
+        return self._mark('cancel', booking_id)
+
+    def check_in(self, booking_id):
+        """The customer arrived: skip the booking's no-show check. Returns False if the id is not a booking."""
+        return self._mark('check_in', booking_id)
+
+    def is_booking(self, booking_id):
+        """True if booking_id is the offset of a complete data row in the CSV (not the header or mid-row)."""
+        if booking_id <= 0:
+            return False
+        try:
+            with open(self.csv_path, 'rb') as file:
+                file.seek(booking_id - 1)
+                return file.read(1) == b'\n' and file.readline().endswith(b'\n')
+        except FileNotFoundError:
+            return False
+
+    def _mark(self, action, booking_id):
+        if not self.is_booking(booking_id):
+            return False
+        # Written to the shared marks file so whichever process runs the scheduler applies it
+        directory = os.path.dirname(self.marks_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.marks_path, 'ab') as file:
+            file.write(f"{action} {booking_id}\n".encode('ascii'))
+        self.wake()
+        return True
+
+    def _apply_mark(self, action, booking_id):
+        with self._wakeup:
+            if action == 'cancel':
+                self._cancelled.add(booking_id)
+                self._counts['cancelled'] += 1
+            else:
+                self._checked_in.add(booking_id)
+            self._dirty = True
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        # Caller holds the lock. Marks outlive their entries until the next rebuild.
+        if len(self._cancelled) + len(self._checked_in) <= max(len(self._heap) // 2, 1000):
+            return
+        self._heap = [entry for entry in self._heap if not self._skipped(entry)]
+        heapq.heapify(self._heap)
+        self._cancelled.clear()
+        self._checked_in.clear()
+
+    def _skipped(self, entry):
+        _, booking_id, kind = entry
+        return booking_id in self._cancelled or (kind == NO_SHOW and booking_id in self._checked_in)
+
+    def poll(self, now=None):
+        """Schedule bookings appended to the CSV since the last poll; returns how many were read."""
+        now = time.time() if now is None else now
+        with self._poll_lock:
+            try:
+                file = open(self.csv_path, 'rb')
+            except FileNotFoundError:
+                return 0
+            read = 0
+            with file:
+                if os.fstat(file.fileno()).st_size < self._offset:
+                    # The file was truncated or replaced; start over
+                    with self._wakeup:
+                        self._heap, self._header, self._offset = [], None, 0
+                        self._cancelled.clear()
+                        self._checked_in.clear()
+                file.seek(self._offset)
+                offset = self._offset
+                entries = []
+                for line in file:
+                    # A line without its newline is still being written; read it next time
+                    if not line.endswith(b'\n'):
+                        break
+                    row = next(csv.reader([line.decode('utf-8')]), [])
+                    if self._header is None:
+                        self._header = row
+                    elif row:
+                        entries.extend(self._row_entries(offset, row, now))
+                        read += 1
+                    offset += len(line)
+                self._push(entries)
+                with self._wakeup:
+                    self._offset = offset
+                    self._dirty = self._dirty or read > 0
+            # After the CSV, so every marked booking's entries are already queued
+            self._poll_marks()
+        return read
+
+    def _poll_marks(self):
+        try:
+            file = open(self.marks_path, 'rb')
+        except FileNotFoundError:
+            return
+        with file:
+            if os.fstat(file.fileno()).st_size < self._marks_offset:
+                self._marks_offset = 0
+            file.seek(self._marks_offset)
+            offset = self._marks_offset
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                action, booking_id = line.decode('ascii').split()
+                self._apply_mark(action, int(booking_id))
+                offset += len(line)
+        with self._wakeup:
+            self._dirty = self._dirty or offset != self._marks_offset
+            self._marks_offset = offset
+
+    def _row_entries(self, booking_id, row, now):
+        booking = dict(zip(self._header, row))
+        appointment_at = appointment_time(booking.get('preferred_date', ''), booking.get('preferred_time', ''))
+        if booking.get('appointment_needed') == 'False' or appointment_at is None:
+            self._counts['unscheduled'] += 1
+            return []
+        self._counts['bookings_loaded'] += 1
+        return self._entries(booking_id, appointment_at, now)
+
+    def booking(self, booking_id):
+        """Re-read one booking from the CSV by its id (row offset)."""
+        with open(self.csv_path, 'rb') as file:
+            file.seek(booking_id)
+            row = next(csv.reader([file.readline().decode('utf-8')]), [])
+        return dict(zip(self._header or [], row), booking_id=booking_id)
+
+    def pop_due(self, now=None):
+        """Remove and return the entries due by `now`, skipping cancelled and stale ones."""
+        now = time.time() if now is None else now
+        due = []
+        with self._wakeup:
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                self._dirty = True
+                if self._skipped(entry):
+                    continue
+                fire_at, _, kind = entry
+                appointment_at = fire_at - self.no_show_grace if kind == NO_SHOW else fire_at + kind * 60
+                if now - fire_at > self.max_lateness or (kind != NO_SHOW and appointment_at <= now):
+                    self._counts['expired'] += 1
+                    continue
+                due.append(entry)
+        return due
+
+    def fire_due(self, now=None):
+        """Call the hooks for every due entry; hook errors are counted, not raised."""
+        for _, booking_id, kind in self.pop_due(now):
+            try:
+                booking = self.booking(booking_id)
+                if kind == NO_SHOW:
+                    self.on_no_show(booking)
+                    self._counts['no_shows_fired'] += 1
+                else:
+                    self.on_reminder(booking, kind)
+                    self._counts['reminders_fired'] += 1
+            except Exception as e:
+                self._counts['hook_errors'] += 1
+                print(f"Warning: reminder hook for booking {booking_id} failed ({e}).")
+
+    def _run(self):
+        while not self._stopped:
+            try:
+                self.poll()
+                self.fire_due()
+                if self._dirty and time.monotonic() - self._last_snapshot >= self.snapshot_seconds:
+                    self.save_snapshot()
+            except Exception as e:
+                print(f"Warning: reminder scheduler iteration failed ({e}).")
+            with self._wakeup:
+                timeout = self.poll_seconds
+                if self._heap:
+                    timeout = min(timeout, max(self._heap[0][0] - time.time(), 0))
+                if not self._stopped:
+                    self._wakeup.wait(timeout)
+
+    def _acquire_lock(self):
+        """Wait until this process holds the scheduler lock; False if stopped first."""
+        if fcntl is None:
+            return True
+        directory = os.path.dirname(self.lock_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(self.lock_path, 'a')
+        while not self._stopped:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except OSError:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_seconds)
+        return False
+
+    def _lead(self):
+        if not self._acquire_lock():
+            return
+        # Reload: a previous holder may have saved newer state since __init__. The OS
+        # releases the lock when the holding process exits, however it exits.
+        self._load_snapshot()
+        self._leader = True
+        self._run()
+
+    def start(self):
+        """Run polling and firing on a background thread once this process holds the scheduler lock."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._lead, name='reminder-scheduler', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+        return self._thread
+
+    def wake(self):
+        """Ask the scheduler thread to poll the CSV now, e.g. right after a booking is saved."""
+        with self._wakeup:
+            self._wakeup.notify()
+
+    def stop(self, timeout=5):
+        """Stop the thread and write a final snapshot."""
+        with self._wakeup:
+            self._stopped = True
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        # Only the lock holder owns the snapshot
+        if self._leader and self._dirty:
+            self.save_snapshot()
+
+    def stats(self):
+        with self._wakeup:
+            return {
+                **self._counts,
+                'leader': self._leader,
+                'pending': len(self._heap),
+                'marked': len(self._cancelled) + len(self._checked_in),
+                'next_fire_at': datetime.fromtimestamp(self._heap[0][0]).isoformat() if self._heap else None,
+                'csv_offset': self._offset
+            }
@@ -0,0 +1,155 @@
+import contextvars
+import cProfile
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+
+class Tracer:
+    """Lightweight nested timing spans with per-request sampling."""
+
+    def __init__(self, sample_rate=1.0, max_traces=200):
+        self.sample_rate = sample_rate
+        self.traces = deque(maxlen=max_traces)
+        # Context variables keep spans separate per thread and per asyncio task
+        self._stack = contextvars.ContextVar(f'tracer_stack_{id(self)}', default=None)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Time a block of code as a span.
+        The outermost span in a thread or task is the root and decides whether
+        the whole trace is sampled; unsampled traces cost almost nothing.
+        """
+        stack = self._stack.get()
+
+        if stack is False:
+            # Inside an unsampled trace
+            yield None
+            return
+
+        is_root = stack is None
+        if is_root:
+            if random.random() >= self.sample_rate:
+                token = self._stack.set(False)
+                try:
+                    yield None
+                finally:
+                    self._stack.reset(token)
+                return
+            stack = []
+            token = self._stack.set(stack)
+
+        record = {
+            'name': name,
+            'start_us': time.perf_counter_ns() // 1000,
+            'duration_us': None,
+            'attributes': attributes,
+            'children': []
+        }
+        if stack:
+            stack[-1]['children'].append(record)
+        stack.append(record)
+
+        try:
+            yield record
+        finally:
+            record['duration_us'] = time.perf_counter_ns() // 1000 - record['start_us']
+            stack.pop()
+            if is_root:
+                self._stack.reset(token)
+                self.traces.append({
+                    'trace_id': uuid.uuid4().hex,
+                    'timestamp': time.time(),
+                    'thread_id': threading.get_ident(),
+                    'root': record
+                })
+
+    def annotate(self, **attributes):
+        """Attach attributes to the innermost active span, if any."""
+        stack = self._stack.get()
+        if stack:
+            stack[-1]['attributes'].update(attributes)
+
+    def export_json(self, limit=None):
+        """Return recorded traces as JSON-serializable dicts, newest last."""
+        traces = list(self.traces)
+        return traces[-limit:] if limit else traces
+
+    def export_chrome_trace(self, limit=None):
+        """Return recorded traces in Chrome trace event format."""
+        events = []
+        pid = os.getpid()
+
+        def add_events(record, tid, trace_id):
+            events.append({
+                'name': record['name'],
+                'cat': 'chatbot',
+                'ph': 'X',
+                'ts': record['start_us'],
+                'dur': record['duration_us'],
+                'pid': pid,
+                'tid': tid,
+                'args': dict(record['attributes'], trace_id=trace_id)
+            })
+            for child in record['children']:
+                add_events(child, tid, trace_id)
+
+        for trace in self.export_json(limit):
+            add_events(trace['root'], trace['thread_id'], trace['trace_id'])
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+class RequestProfiler:
+    """Capture cProfile dumps for the next N requests on demand."""
+
+    def __init__(self, output_dir='profiles', max_dumps=50):
+        self.output_dir = output_dir
+        self.dumps = deque(maxlen=max_dumps)
+        self._remaining = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def arm(self, count):
+        """Profile the next `count` requests."""
+        with self._lock:
+            self._remaining = max(0, int(count))
+
+    def status(self):
+        """Report how many captures are pending and where dumps were written."""
+        with self._lock:
+            return {'remaining': self._remaining, 'dumps': list(self.dumps)}
+
+    def _claim(self):
+        with self._lock:
+            if self._remaining <= 0:
+                return None
+            self._remaining -= 1
+            self._sequence += 1
+            return self._sequence
+
+    @contextmanager
+    def profile(self, label='request'):
+        """Profile the enclosed block if a capture is pending."""
+        sequence = self._claim()
+        if sequence is None:
+            yield
+            return
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            os.makedirs(self.output_dir, exist_ok=True)
+            filename = f"{label}-{time.strftime('%Y%m%d-%H%M%S')}-{sequence}.pstats"
+            path = os.path.join(self.output_dir, filename)
+            profiler.dump_stats(path)
+            with self._lock:
+                self.dumps.append(path)
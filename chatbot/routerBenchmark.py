@@ -0,0 +1,249 @@
+"""
+Throughput of sessionRouter.py as bot nodes are added, with every node, the
+router and the load generators running as local processes.
+
+    python routerBenchmark.py --max-nodes 4 --duration 10
+
+By default each node is a stub that keeps per-session turn counts in memory and
+spends --work-ms of CPU plus --llm-ms of waiting on every message, so the run
+shows how GIL-bound per-node work scales out behind the router. Each reply
+carries the session's turn number, so a session that lands on a different
+node (losing its conversation) is counted. --backend app starts real app.py
+nodes instead; point GROQ_BASE_URL at test files/mock_llm.py first.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from sessionRouter import HashRing, ring_hash
+
+HOST = '127.0.0.1'
+
+
+def serve_stub(port, work_ms, llm_ms):
+    """A bot node stand-in: per-session state in memory, CPU work and an LLM-sized wait per message."""
+    from flask import Flask, jsonify, request
+
+    app = Flask(__name__)
+    turns = {}
+    lock = threading.Lock()
+
+    def answer(session_id):
+        deadline = time.perf_counter() + work_ms / 1000
+        while time.perf_counter() < deadline:
+            pass
+        time.sleep(llm_ms / 1000)
+        with lock:
+            turns[session_id] = turns.get(session_id, 0) + 1
+            return {'sessionId': session_id, 'response': 'ok', 'turn': turns[session_id], 'node': port}
+
+    @app.route('/ready')
+    def ready():
+        return jsonify({'ready': True})
+
+    @app.route('/chat', methods=['POST'])
+    def chat():
+        return jsonify(answer(request.json.get('sessionId')))
+
+    @app.route('/chat/batch', methods=['POST'])
+    def chat_batch():
+        results = [answer(item['sessionId']) for item in request.json['messages']]
+        return jsonify({'results': results, 'errors': 0})
+
+    app.run(host=HOST, port=port, threaded=True)
+
+
+def start_node(backend, port, args):
+    if backend == 'app':
+        command = [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--host', HOST, '--port', str(port),
+                   '--with-threads']
+    else:
+        command = [sys.executable, __file__, '--serve-stub', str(port),
+                   '--work-ms', str(args.work_ms), '--llm-ms', str(args.llm_ms)]
+    return subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def request_json(port, method, path, payload=None, timeout=60):
+    connection = http.client.HTTPConnection(HOST, port, timeout=timeout)
+    try:
+        body = json.dumps(payload) if payload is not None else None
+        connection.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b'null')
+    finally:
+        connection.close()
+
+
+def wait_until(condition, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if condition():
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def client_worker(port, sessions, duration, threads, result_queue):
+    """One load-generator process: `threads` keep-alive clients, each owning a slice of the sessions."""
+    latencies = []
+    counts = {'requests': 0, 'errors': 0, 'moved': 0}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def run(own_sessions):
+        connection = http.client.HTTPConnection(HOST, port, timeout=60)
+        expected = dict.fromkeys(own_sessions, 0)
+        rng = random.Random(own_sessions[0])
+        local_latencies, local = [], {'requests': 0, 'errors': 0, 'moved': 0}
+        while time.monotonic() < stop_at:
+            session_id = rng.choice(own_sessions)
+            body = json.dumps({'sessionId': session_id, 'message': 'What does life insurance cover?'})
+            start = time.perf_counter()
+            try:
+                connection.request('POST', '/chat', body=body, headers={'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                data = json.loads(response.read())
+            except (OSError, http.client.HTTPException, ValueError):
+                connection.close()
+                local['errors'] += 1
+                continue
+            local_latencies.append(time.perf_counter() - start)
+            local['requests'] += 1
+            if response.status != 200:
+                local['errors'] += 1
+                continue
+            expected[session_id] += 1
+            # Stub nodes number each session's turns; a reset means the session changed node
+            if 'turn' in data and data['turn'] != expected[session_id]:
+                local['moved'] += 1
+                expected[session_id] = data['turn']
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            for key, value in local.items():
+                counts[key] += value
+
+    slices = [sessions[index::threads] for index in range(threads)]
+    workers = [threading.Thread(target=run, args=(own,)) for own in slices if own]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    result_queue.put((counts, latencies))
+
+
+def run_load(port, sessions, duration, processes, threads):
+    result_queue = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=client_worker,
+                                       args=(port, sessions[index::processes], duration, threads, result_queue))
+               for index in range(processes)]
+    for worker in workers:
+        worker.start()
+    counts = {'requests': 0, 'errors': 0, 'moved': 0}
+    latencies = []
+    for _ in workers:
+        worker_counts, worker_latencies = result_queue.get()
+        latencies.extend(worker_latencies)
+        for key, value in worker_counts.items():
+            counts[key] += value
+    for worker in workers:
+        worker.join()
+    latencies.sort()
+    percentile = lambda share: latencies[min(int(len(latencies) * share), len(latencies) - 1)] * 1000 if latencies else 0
+    return {**counts, 'rps': counts['requests'] / duration, 'p50_ms': percentile(0.5), 'p95_ms': percentile(0.95)}
+
+
+def print_row(label, result):
+    print(f"{label:>6} {result['rps']:>9,.0f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+          f"{result['errors']:>7} {result['moved']:>6}")
+
+
+def movement(max_nodes, keys=100_000, replicas=160):
+    """Share of session ids that change node as nodes are added: consistent hashing vs. hash mod N."""
+    session_ids = [f"session-{index}" for index in range(keys)]
+    rows = []
+    hashes = [ring_hash(session_id) for session_id in session_ids]
+    ring = HashRing(["node-1"], replicas)
+    before = [ring.node_for(session_id) for session_id in session_ids]
+    for nodes in range(2, max_nodes + 1):
+        ring.add(f"node-{nodes}")
+        after = [ring.node_for(session_id) for session_id in session_ids]
+        modulo_moved = sum(value % (nodes - 1) != value % nodes for value in hashes)
+        rows.append((nodes, sum(a != b for a, b in zip(before, after)) / keys, modulo_moved / keys,
+                     max(ring.shares().values()) * nodes))
+        before = after
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure routed chat throughput as bot nodes are added.")
+    parser.add_argument('--max-nodes', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10, help="seconds of load per node count")
+    parser.add_argument('--sessions', type=int, default=2000, help="distinct session ids per step")
+    parser.add_argument('--clients', type=int, default=4, help="load-generator processes")
+    parser.add_argument('--threads', type=int, default=16, help="concurrent clients per process")
+    parser.add_argument('--backend', choices=('stub', 'app'), default='stub')
+    parser.add_argument('--work-ms', type=float, default=5, help="stub CPU time per message")
+    parser.add_argument('--llm-ms', type=float, default=20, help="stub wait per message")
+    parser.add_argument('--base-port', type=int, default=5100)
+    parser.add_argument('--serve-stub', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_stub:
+        serve_stub(args.serve_stub, args.work_ms, args.llm_ms)
+        return
+
+    router_port = args.base_port
+    node_ports = [args.base_port + index for index in range(1, args.max_nodes + 1)]
+    urls = [f"http://{HOST}:{port}" for port in node_ports]
+    processes = [start_node(args.backend, port, args) for port in node_ports]
+    try:
+        for port in node_ports:
+            if not wait_until(lambda: request_json(port, 'GET', '/ready', timeout=2)[0] == 200, timeout=120):
+                raise RuntimeError(f"Node on port {port} did not become ready")
+        router = subprocess.Popen(
+            [sys.executable, 'sessionRouter.py', '--node', urls[0], '--port', str(router_port),
+             '--health-interval', '0.5'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        processes.append(router)
+        if not wait_until(lambda: request_json(router_port, 'GET', '/ready', timeout=2)[0] == 200):
+            raise RuntimeError("Router did not become ready")
+
+        print(f"Backend: {args.backend}, {args.clients}x{args.threads} clients, {args.duration:.0f} s per step")
+        print(f"{'nodes':>6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7} {'moved':>6}")
+        # One node without the router, to show the routing hop's own cost
+        print_row('direct', run_load(node_ports[0], [f"direct-{index}" for index in range(args.sessions)],
+                                     args.duration, args.clients, args.threads))
+        for count in range(1, args.max_nodes + 1):
+            if count > 1:
+                request_json(router_port, 'POST', '/router/nodes', {'node': urls[count - 1]})
+            healthy = lambda: sum(node['healthy'] for node in
+                                  request_json(router_port, 'GET', '/router/status')[1]['nodes']) == count
+            wait_until(healthy)
+            sessions = [f"bench-{count}-{index}" for index in range(args.sessions)]
+            print_row(count, run_load(router_port, sessions, args.duration, args.clients, args.threads))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    print("\nSessions moved when a node is added (100,000 ids):")
+    print(f"{'nodes':>5} {'ring':>7} {'mod N':>7} {'max load':>9}")
+    for nodes, ring_moved, modulo_moved, max_load in movement(args.max_nodes):
+        print(f"{nodes:>5} {ring_moved:>7.1%} {modulo_moved:>7.1%} {max_load:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,3 @@
-from textblob import TextBlob
-
 class SentimentAnalyzer:
     @staticmethod
     def analyze_sentiment(text):
@@ -7,6 +5,8 @@ class SentimentAnalyzer:
         Analyze the sentiment of the given text.
         Returns a tuple of (sentiment_label, sentiment_score).
         """
+        # Imported on first use: textblob and its corpora are slow to load
+        from textblob import TextBlob
         analysis = TextBlob(text)
         
         # Get the polarity score (-1 to 1)
@@ -0,0 +1,97 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from conversationContext import ConversationContext, ConversationState
+from sessionStore import SessionStore
+
+
+class LegacyConversationContext:
+    """The previous dict-based context, kept here only for comparison."""
+
+    def __init__(self):
+        self.user_name = None
+        self.insurance_type = None
+        self.current_state = 'greeting'
+        self.collected_info = {}
+        self.last_message = None
+        self.appointment_suggested = False
+        self.conversation_history = []
+
+    def add_to_history(self, message, role='user'):
+        self.conversation_history.append({
+            'role': role,
+            'content': message,
+            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        })
+        self.last_message = message
+
+
+def fill(context, index, turns):
+    """Give a context a typical mid-conversation shape with per-session strings."""
+    context.user_name = f"User{index}"
+    context.insurance_type = "Life Insurance"
+    context.collected_info = {'name': context.user_name, 'insurance_type': context.insurance_type,
+                              'mobile': f"98{index:08d}"}
+    for turn in range(turns):
+        context.add_to_history(f"Question {turn} from session {index} about life insurance cover", 'user')
+        context.add_to_history(f"Answer {turn} for session {index}: life insurance pays a benefit to your family.",
+                               'assistant')
+    return context
+
+
+def measure_memory(factory, sessions, turns):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    contexts = [fill(factory(), index, turns) for index in range(sessions)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return contexts, (after - before) / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-session memory and snapshot size.")
+    parser.add_argument('--sessions', type=int, default=100_000)
+    parser.add_argument('--turns', type=int, default=3, help="user/assistant exchanges per session")
+    parser.add_argument('--store-sessions', type=int, default=10_000, help="sessions written to SQLite")
+    args = parser.parse_args()
+    args.store_sessions = min(args.store_sessions, args.sessions)
+
+    _, legacy_bytes = measure_memory(LegacyConversationContext, args.sessions, args.turns)
+    contexts, compact_bytes = measure_memory(ConversationContext, args.sessions, args.turns)
+    contexts[0].update_state(ConversationState.INSURANCE_DISCUSSION)
+
+    start = time.perf_counter()
+    snapshots = [context.to_bytes() for context in contexts]
+    serialize_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for snapshot in snapshots:
+        ConversationContext.from_bytes(snapshot)
+    deserialize_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.db")
+        store = SessionStore(path)
+        start = time.perf_counter()
+        for index in range(args.store_sessions):
+            store.save(f"session-{index}", contexts[index])
+        store_seconds = time.perf_counter() - start
+        store_size = sum(
+            os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+        )
+
+    print(f"Sessions: {args.sessions:,} with {args.turns * 2} history turns each")
+    print(f"In-memory bytes/session: legacy {legacy_bytes:,.0f}, compact {compact_bytes:,.0f}")
+    print(f"Snapshot bytes/session: {sum(map(len, snapshots)) / len(snapshots):,.0f}")
+    print(f"Serialize: {serialize_seconds / args.sessions * 1e6:.1f} us/session, "
+          f"deserialize: {deserialize_seconds / args.sessions * 1e6:.1f} us/session")
+    print(f"SQLite: {args.store_sessions / store_seconds:,.0f} saves/s, "
+          f"{store_size / args.store_sessions:,.0f} bytes/session on disk")
+
+
+if __name__ == "__main__":
+    main()
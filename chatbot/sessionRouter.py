@@ -0,0 +1,355 @@
+"""
+Front process that keeps every chat session on the same bot node.
+
+    python sessionRouter.py --node http://localhost:5101 --node http://localhost:5102 --port 5005
+
+Conversations live in the memory of the node that answered them (ChatSessions,
+InsuranceChatbot.messages), so /chat and /chat/batch requests are routed by
+sessionId on a consistent-hash ring with virtual nodes. Adding or removing a
+node only moves the sessions on the ring arcs it gains or loses (about 1/N of
+them); those sessions start a fresh conversation on their new node. Nodes are
+health-checked through /ready and leave the ring while they fail.
+"""
+import argparse
+import bisect
+import hashlib
+import http.client
+import json
+import select
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from flask import Flask, Response, jsonify, request
+
+from chatSessions import parse_batch
+
+
+def ring_hash(key):
+    """Position of a key on the ring: the first 8 bytes of its MD5, spread evenly for any key shape."""
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """
+    Consistent-hash ring. Each node is placed at `replicas` pseudo-random
+    points (virtual nodes), which evens out the share each node owns; a key
+    belongs to the first point at or after its hash.
+    """
+
+    def __init__(self, nodes=(), replicas=160):
+        self.replicas = replicas
+        self._nodes = set()
+        self._points = []
+        self._owners = []
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self):
+        return sorted(self._nodes)
+
+    def _rebuild(self):
+        # Membership changes are rare; lookups only bisect the sorted points
+        ring = sorted((ring_hash(f"{node}#{replica}"), node) for node in self._nodes for replica in range(self.replicas))
+        self._points = [point for point, _ in ring]
+        self._owners = [node for _, node in ring]
+
+    def add(self, node):
+        if node not in self._nodes:
+            self._nodes.add(node)
+            self._rebuild()
+
+    def remove(self, node):
+        if node in self._nodes:
+            self._nodes.discard(node)
+            self._rebuild()
+
+    def node_for(self, key):
+        """Node that owns a key, or None while the ring is empty."""
+        if not self._points:
+            return None
+        index = bisect.bisect_left(self._points, ring_hash(key))
+        return self._owners[index % len(self._owners)]
+
+    def shares(self):
+        """Fraction of the hash space each node owns."""
+        if not self._points:
+            return {}
+        shares = dict.fromkeys(self._nodes, 0)
+        previous = self._points[-1] - 2 ** 64
+        for point, node in zip(self._points, self._owners):
+            shares[node] += point - previous
+            previous = point
+        return {node: share / 2 ** 64 for node, share in shares.items()}
+
+
+class NodeUnreachable(OSError):
+    """A connection to the node could not be opened, so the request was certainly not sent."""
+
+
+class NodeConnections:
+    """
+    Keep-alive HTTP connections to the nodes, one per forwarding thread and node.
+    Requests are never re-sent: a chat message that reached a node may have been
+    applied to its conversation even if the reply was lost.
+    """
+
+    def __init__(self, timeout=60):
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self, node):
+        connections = self._local.__dict__.setdefault('connections', {})
+        connection = connections.get(node)
+        if connection is None:
+            parts = urlsplit(node)
+            connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+            connection = connections[node] = connection_class(parts.netloc, timeout=self.timeout)
+        elif connection.sock is not None and select.select([connection.sock], [], [], 0)[0]:
+            # An idle keep-alive socket only turns readable once the node has closed it; reconnect before sending
+            connection.close()
+        return connection
+
+    def _discard(self, node, connection):
+        connection.close()
+        self._local.connections.pop(node, None)
+
+    def request(self, node, method, path, body=None, timeout=None):
+        """
+        (status, body bytes, content type) of one request.
+        Raises NodeUnreachable if no connection could be opened; any other error
+        means the node may have received the request.
+        """
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        connection = self._connection(node)
+        connection.timeout = timeout or self.timeout
+        try:
+            if connection.sock is None:
+                connection.connect()
+        except OSError as e:
+            self._discard(node, connection)
+            raise NodeUnreachable(f"Cannot connect to {node} ({e})") from e
+        connection.sock.settimeout(connection.timeout)
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            return response.status, response.read(), response.getheader('Content-Type', 'application/json')
+        except Exception:
+            self._discard(node, connection)
+            raise
+
+
+class SessionRouter:
+    """
+    Routes session ids to healthy nodes. A node joins the ring once its /ready
+    answers 200 and leaves after `unhealthy_after` failed checks in a row, or
+    at once when forwarding to it fails to connect.
+    """
+
+    def __init__(self, nodes, replicas=160, health_interval=2.0, unhealthy_after=2, timeout=60):
+        self.nodes = list(dict.fromkeys(nodes))
+        self.ring = HashRing(replicas=replicas)
+        self.health_interval = health_interval
+        self.unhealthy_after = unhealthy_after
+        self.connections = NodeConnections(timeout)
+        self._lock = threading.Lock()
+        self._failures = {node: 0 for node in self.nodes}
+        self._forwarded = {node: 0 for node in self.nodes}
+        self._counts = {'forward_errors': 0, 'rerouted': 0, 'ring_changes': 0, 'unroutable': 0}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def node_for(self, session_id):
+        with self._lock:
+            return self.ring.node_for(session_id or '')
+
+    def add_node(self, node):
+        with self._lock:
+            if node not in self.nodes:
+                self.nodes.append(node)
+                self._failures[node] = 0
+                self._forwarded[node] = 0
+        self.check(node)
+
+    def remove_node(self, node):
+        with self._lock:
+            if node in self.nodes:
+                self.nodes.remove(node)
+            self._set_healthy(node, False)
+
+    def _set_healthy(self, node, healthy):
+        # Caller holds the lock
+        if healthy and node in self.nodes and node not in self.ring.nodes:
+            self.ring.add(node)
+            self._counts['ring_changes'] += 1
+        elif not healthy and node in self.ring.nodes:
+            self.ring.remove(node)
+            self._counts['ring_changes'] += 1
+
+    def check(self, node):
+        """Probe one node's /ready and update its ring membership."""
+        try:
+            status, _, _ = self.connections.request(node, 'GET', '/ready', timeout=max(self.health_interval, 1))
+            healthy = status == 200
+        except Exception:
+            healthy = False
+        with self._lock:
+            self._failures[node] = 0 if healthy else self._failures.get(node, 0) + 1
+            if healthy or self._failures[node] >= self.unhealthy_after:
+                self._set_healthy(node, healthy)
+        return healthy
+
+    def _run(self):
+        while not self._stopped.is_set():
+            for node in list(self.nodes):
+                self.check(node)
+            self._stopped.wait(self.health_interval)
+
+    def start(self):
+        """Check every node now, then keep checking on a background thread."""
+        for node in self.nodes:
+            self.check(node)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='router-health', daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stopped.set()
+
+    def forward(self, session_id, path, body):
+        """
+        Send a request to the session's node; (status, body, content type).
+        A node that cannot be connected to is taken off the ring and the
+        request goes to the session's new owner, since it was never sent.
+        Once the request may have reached a node it is not sent again, so a
+        message is never applied twice: a dropped connection takes the node
+        off the ring and answers 502, and a timeout only answers 504 (a slow
+        LLM call does not make the node unhealthy).
+        """
+        for _ in range(2):
+            node = self.node_for(session_id)
+            if node is None:
+                break
+            try:
+                response = self.connections.request(node, 'POST', path, body)
+                with self._lock:
+                    self._forwarded[node] += 1
+                return response
+            except NodeUnreachable:
+                with self._lock:
+                    self._counts['forward_errors'] += 1
+                    self._failures[node] = self.unhealthy_after
+                    self._set_healthy(node, False)
+                    self._counts['rerouted'] += 1
+            except (ConnectionError, http.client.HTTPException) as e:
+                with self._lock:
+                    self._counts['forward_errors'] += 1
+                    self._failures[node] = self.unhealthy_after
+                    self._set_healthy(node, False)
+                return 502, json.dumps({'error': f"Bot node {node} dropped the request ({e}); "
+                                                 f"it may have been applied"}).encode('utf-8'), 'application/json'
+            except OSError as e:
+                with self._lock:
+                    self._counts['forward_errors'] += 1
+                return 504, json.dumps({'error': f"Bot node {node} did not answer ({e})"}).encode('utf-8'), \
+                    'application/json'
+        with self._lock:
+            self._counts['unroutable'] += 1
+        return 503, json.dumps({'error': 'No healthy bot node'}).encode('utf-8'), 'application/json'
+
+    def stats(self):
+        with self._lock:
+            healthy = set(self.ring.nodes)
+            shares = self.ring.shares()
+            return {
+                **self._counts,
+                'nodes': [{
+                    'node': node,
+                    'healthy': node in healthy,
+                    'share': round(shares.get(node, 0.0), 4),
+                    'forwarded': self._forwarded.get(node, 0)
+                } for node in self.nodes]
+            }
+
+
+def create_app(router, max_batch_items=100, batch_workers=16):
+    app = Flask(__name__)
+    pool = ThreadPoolExecutor(batch_workers, thread_name_prefix='router-batch')
+
+    @app.route('/chat', methods=['POST'])
+    def chat():
+        body = request.get_data()
+        data = request.get_json(silent=True) or {}
+        status, content, content_type = router.forward(data.get('sessionId'), '/chat', body)
+        return Response(content, status=status, content_type=content_type)
+
+    @app.route('/chat/batch', methods=['POST'])
+    def chat_batch():
+        """Split a batch by owning node, forward the parts concurrently and merge the results in order."""
+        groups, results, error = parse_batch(request.get_json(silent=True), max_batch_items)
+        if error:
+            return jsonify({'error': error}), 400
+
+        parts = {}
+        for session_id, items in groups.items():
+            parts.setdefault(router.node_for(session_id), []).extend(
+                (index, {'sessionId': session_id, 'message': message}) for index, message in items)
+
+        def send(items):
+            items.sort(key=lambda item: item[0])
+            body = json.dumps({'messages': [item for _, item in items]}).encode('utf-8')
+            # Every item in a part has the same owner, so the first session id routes the part
+            status, content, _ = router.forward(items[0][1]['sessionId'], '/chat/batch', body)
+            if status == 200:
+                return zip([index for index, _ in items], json.loads(content)['results'])
+            return [(index, {'sessionId': item['sessionId'], 'error': f"Bot node answered {status}"})
+                    for index, item in items]
+
+        for answered in pool.map(send, parts.values()):
+            for index, result in answered:
+                results[index] = result
+        return jsonify({'results': results, 'errors': sum('error' in result for result in results)})
+
+    @app.route('/router/status', methods=['GET'])
+    def status():
+        return jsonify(router.stats())
+
+    @app.route('/router/nodes', methods=['POST', 'DELETE'])
+    def nodes():
+        node = (request.get_json(silent=True) or {}).get('node')
+        if not node:
+            return jsonify({'error': 'No node provided'}), 400
+        if request.method == 'POST':
+            router.add_node(node)
+        else:
+            router.remove_node(node)
+        return jsonify(router.stats())
+
+    @app.route('/ready', methods=['GET'])
+    def ready():
+        """Ready while at least one node is on the ring."""
+        healthy = any(node['healthy'] for node in router.stats()['nodes'])
+        return jsonify({'ready': healthy}), 200 if healthy else 503
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Route chat sessions to bot nodes by consistent hashing.")
+    parser.add_argument('--node', action='append', default=[], help="Bot node base URL; repeat for each node")
+    parser.add_argument('--port', type=int, default=5005)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--replicas', type=int, default=160, help="virtual nodes per node")
+    parser.add_argument('--health-interval', type=float, default=2.0, help="seconds between /ready checks")
+    parser.add_argument('--max-batch', type=int, default=100)
+    args = parser.parse_args()
+
+    router = SessionRouter(args.node, args.replicas, args.health_interval)
+    router.start()
+    create_app(router, args.max_batch).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import threading
+import time
+
+from conversationContext import ConversationContext
+
+
+class SessionStore:
+    """
+    SQLite store of conversation snapshots, so any worker process can
+    pick up a session another one started.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+        connection.commit()
+
+    def _connection(self):
+        # SQLite connections are not shared between threads
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def save(self, session_id, context):
+        self.save_bytes(session_id, context.to_bytes())
+
+    def save_bytes(self, session_id, data):
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+            (session_id, data, time.time())
+        )
+        connection.commit()
+
+    def load(self, session_id):
+        """Return the stored ConversationContext, or None for an unknown or unreadable session."""
+        data = self.load_bytes(session_id)
+        if data is None:
+            return None
+        try:
+            return ConversationContext.from_bytes(data)
+        except (ValueError, EOFError, TypeError) as e:
+            # A snapshot this build cannot read starts the conversation over instead of failing every request
+            print(f"Warning: discarding unreadable session {session_id}: {e}")
+            return None
+
+    def load_bytes(self, session_id):
+        row = self._connection().execute(
+            "SELECT data FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def delete(self, session_id):
+        connection = self._connection()
+        connection.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        connection.commit()
+
+    def purge(self, max_age_seconds):
+        """Delete sessions idle for longer than max_age_seconds; returns how many were removed."""
+        connection = self._connection()
+        cursor = connection.execute(
+            "DELETE FROM sessions WHERE updated_at < ?", (time.time() - max_age_seconds,)
+        )
+        connection.commit()
+        return cursor.rowcount
@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import json
+import threading
+
+
+def fingerprint(request):
+    """
+    Stable key for a completion request.
+    Message text is whitespace-normalized so trivially different prompts coalesce.
+    """
+    normalized = {
+        'messages': [
+            (message['role'], " ".join(message['content'].split()).lower())
+            for message in request['messages']
+        ],
+        'model': request.get('model'),
+        'temperature': request.get('temperature'),
+        'max_tokens': request.get('max_tokens')
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one upstream call."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = {}
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+        self.timeouts = 0
+
+    def do(self, key, fn, timeout=None):
+        """
+        Run fn() once for all concurrent callers with the same key.
+        Waiting callers give up after their own timeout with TimeoutError.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.upstream_calls += 1
+            else:
+                self.coalesced_calls += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            return call.result
+
+        if not call.done.wait(timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError("Timed out waiting for a shared upstream call")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    async def do_async(self, key, coro_fn, timeout=None):
+        """
+        Await coro_fn() once for all concurrent callers with the same key.
+        The upstream call runs as its own task, so one caller timing out
+        does not cancel it for the others.
+        """
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is None:
+                task = asyncio.ensure_future(coro_fn())
+                self._tasks[key] = task
+                task.add_done_callback(lambda _: self._forget(key, task))
+                self.upstream_calls += 1
+            else:
+                self.coalesced_calls += 1
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError("Timed out waiting for a shared upstream call")
+
+    def _forget(self, key, task):
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+        # Mark the error as retrieved even if every caller already timed out
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        """Return counters, including how many upstream calls were saved."""
+        with self._lock:
+            return {
+                'upstream_calls': self.upstream_calls,
+                'upstream_calls_saved': self.coalesced_calls,
+                'timeouts': self.timeouts,
+                'in_flight': len(self._calls) + len(self._tasks)
+            }
@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+RESULT_MARKER = "STARTUP_RESULT "
+IMPORT_MARKER = "STARTUP_IMPORT"
+
+# Runs in a fresh interpreter: import the server module, then finish its warm-up
+CHILD_SCRIPT = """
+import asyncio, json, sys, time
+sys.stderr.write({import_marker!r} + "\\n")
+started = time.perf_counter()
+import {module} as target
+imported = time.perf_counter()
+warm_up = getattr(target, 'warm_up', None)
+status = None
+if warm_up is not None and {warm_up}:
+    if warm_up.started_at is None:
+        # Async servers start warm-up when serving begins
+        asyncio.run(warm_up.run_async())
+    warm_up.ready.wait()
+    status = warm_up.status()
+print({marker!r} + json.dumps({{
+    'import_seconds': imported - started,
+    'ready_seconds': time.perf_counter() - started if status else None,
+    'warm_up': status
+}}))
+"""
+
+
+def parse_import_times(stderr, module):
+    """
+    (module, self_us, cumulative_us) for each line `python -X importtime` printed
+    while `module` was being imported, including imports made by threads it started.
+    """
+    modules = []
+    lines = stderr.splitlines()
+    for line in lines[lines.index(IMPORT_MARKER) + 1:]:
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+        if name.strip() == module:
+            break
+    return modules
+
+
+def run_once(module, directory, warm_up):
+    script = CHILD_SCRIPT.format(module=module, warm_up=warm_up, marker=RESULT_MARKER,
+                                 import_marker=IMPORT_MARKER)
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", script],
+                               cwd=directory, capture_output=True, text=True)
+    result = None
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            result = json.loads(line[len(RESULT_MARKER):])
+    if completed.returncode != 0 or result is None:
+        raise SystemExit(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+    return result, parse_import_times(completed.stderr, module)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure server import time per package and time to ready.")
+    parser.add_argument('--module', default='bot', help="Server module to import, e.g. bot, asyncBot, app")
+    parser.add_argument('--dir', default='.', help="Directory the module is imported from")
+    parser.add_argument('--runs', type=int, default=3, help="Fresh interpreters to start; medians are reported")
+    parser.add_argument('--top', type=int, default=15, help="Packages to list")
+    parser.add_argument('--no-warm-up', action='store_true', help="Only measure the import")
+    args = parser.parse_args()
+
+    results = []
+    package_times = defaultdict(list)
+    for _ in range(args.runs):
+        result, modules = run_once(args.module, os.path.abspath(args.dir), not args.no_warm_up)
+        results.append(result)
+        # Self time summed per top-level package; the server module's own self time
+        # is the work it does at import (building the chatbot and its stores)
+        totals = defaultdict(int)
+        for name, self_us, _ in modules:
+            totals[name.split('.')[0]] += self_us
+        for package, self_us in totals.items():
+            package_times[package].append(self_us / 1000)
+
+    import_ms = statistics.median(result['import_seconds'] for result in results) * 1000
+    print(f"Import {args.module}: {import_ms:.0f} ms (median of {args.runs})")
+    print(f"{'package':<32} {'self ms':>10} {'share':>7}")
+    medians = sorted(((statistics.median(times), package) for package, times in package_times.items()), reverse=True)
+    for ms, package in medians[:args.top]:
+        print(f"{package:<32} {ms:>10.1f} {ms / import_ms:>7.0%}")
+
+    if not args.no_warm_up and results[-1]['warm_up'] is not None:
+        ready_ms = statistics.median(result['ready_seconds'] for result in results) * 1000
+        print(f"\nReady after {ready_ms:.0f} ms (import + warm-up)")
+        for name, step in results[-1]['warm_up']['steps'].items():
+            error = f"  failed: {step['error']}" if step['error'] else ""
+            print(f"  {name:<30} {step['seconds'] * 1000:>8.0f} ms{error}")
+
+
+if __name__ == "__main__":
+    main()
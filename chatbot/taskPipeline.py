@@ -0,0 +1,138 @@
+import atexit
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+
+
+class TaskPipeline:
+    """
+    Post-response work (sentiment, logging, indexing, notifications) run by a
+    small worker pool so replies are sent without waiting for it.
+    Each worker has its own bounded queue. Tasks submitted with a `key` (e.g. a
+    session id) always go to the same worker and run in submission order; a
+    failed keyed task is retried on that worker before it takes anything else,
+    so a retry cannot land after a later task for the same key. Unkeyed tasks
+    are spread round-robin; when a queue stays full for `enqueue_timeout`
+    seconds the caller runs an unkeyed task itself (a keyed one waits for room),
+    which slows intake instead of dropping work. Failed unkeyed tasks are
+    requeued after an exponential backoff. Either way a task is tried at most
+    `max_retries` + 1 times.
+    """
+
+    def __init__(self, workers=2, max_queue=1000, max_retries=3, retry_delay=0.5, enqueue_timeout=0.1):
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.enqueue_timeout = enqueue_timeout
+        self._queues = [queue.Queue(maxsize=max(1, max_queue // workers)) for _ in range(workers)]
+        self._next_queue = itertools.count()
+        self._lock = threading.Lock()
+        self._lags = deque(maxlen=1000)  # seconds from submit to start, most recent tasks
+        self._counts = {'submitted': 0, 'completed': 0, 'retried': 0, 'failed': 0, 'ran_inline': 0}
+        self._in_flight = 0
+        self._workers = [
+            threading.Thread(target=self._work, args=(tasks,), name=f'post-process-{index}', daemon=True)
+            for index, tasks in enumerate(self._queues)
+        ]
+        for worker in self._workers:
+            worker.start()
+        atexit.register(self.drain, 5)
+
+    def submit(self, name, fn, *args, key=None):
+        """
+        Queue fn(*args) to run after the response; returns False if it had to run inline.
+        Tasks with the same key run one at a time, in the order they were submitted.
+        """
+        task = (name, fn, args, time.monotonic(), 0, key)
+        with self._lock:
+            self._counts['submitted'] += 1
+        if key is not None:
+            self._queue_for(key).put(task)
+            return True
+        try:
+            self._queue_for(None).put(task, timeout=self.enqueue_timeout)
+            return True
+        except queue.Full:
+            with self._lock:
+                self._counts['ran_inline'] += 1
+            self._run(task)
+            return False
+
+    def _queue_for(self, key):
+        if key is None:
+            return self._queues[next(self._next_queue) % len(self._queues)]
+        return self._queues[hash(key) % len(self._queues)]
+
+    def _work(self, tasks):
+        while True:
+            task = tasks.get()
+            try:
+                self._run(task)
+            finally:
+                tasks.task_done()
+
+    def _run(self, task):
+        name, fn, args, enqueued, attempt, key = task
+        with self._lock:
+            self._lags.append(time.monotonic() - enqueued)
+            self._in_flight += 1
+        while True:
+            try:
+                fn(*args)
+                outcome = 'completed'
+            except Exception as e:
+                outcome = self._retry(task, e)
+            if outcome != 'retried' or key is None:
+                break
+            # Keyed tasks are retried in place so later tasks for the same key stay behind them
+            with self._lock:
+                self._counts['retried'] += 1
+            time.sleep(self.retry_delay * 2 ** attempt)
+            attempt += 1
+            task = (name, fn, args, enqueued, attempt, key)
+        with self._lock:
+            self._in_flight -= 1
+            self._counts[outcome] += 1
+
+    def _retry(self, task, error):
+        name, fn, args, _, attempt, key = task
+        if attempt >= self.max_retries:
+            print(f"Warning: post-processing task '{name}' failed after {attempt + 1} attempts ({error}).")
+            return 'failed'
+        if key is None:
+            # Requeue after a backoff without holding a worker
+            timer = threading.Timer(self.retry_delay * 2 ** attempt, self._requeue, (name, fn, args, attempt + 1))
+            timer.daemon = True
+            timer.start()
+        return 'retried'
+
+    def _requeue(self, name, fn, args, attempt):
+        # Lag for a retry is measured from when it was requeued
+        task = (name, fn, args, time.monotonic(), attempt, None)
+        try:
+            self._queue_for(None).put(task, timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._run(task)
+
+    def drain(self, timeout=None):
+        """Wait until queued tasks have run (retries still waiting on backoff are not counted)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while any(tasks.unfinished_tasks for tasks in self._queues):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stats(self):
+        with self._lock:
+            lags = sorted(self._lags)
+            return {
+                **self._counts,
+                'queue_depth': sum(tasks.qsize() for tasks in self._queues),
+                'in_flight': self._in_flight,
+                'workers': len(self._workers),
+                'lag_ms_avg': 1000 * sum(lags) / len(lags) if lags else 0.0,
+                'lag_ms_p95': 1000 * lags[int(0.95 * (len(lags) - 1))] if lags else 0.0,
+                'lag_ms_max': 1000 * lags[-1] if lags else 0.0
+            }
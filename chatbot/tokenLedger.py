@@ -0,0 +1,90 @@
+import re
+from functools import lru_cache
+
+# Llama 3 chat template markers around each message:
+# <|start_header_id|>role<|end_header_id|>\n\n ... <|eot_id|>
+MESSAGE_OVERHEAD_TOKENS = 5
+# <|begin_of_text|> plus the assistant header the reply is generated after
+PROMPT_OVERHEAD_TOKENS = 5
+
+# Rough BPE estimate used only when the real tokenizer cannot be loaded
+APPROX_TOKEN_PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+
+
+@lru_cache(maxsize=None)
+def load_tokenizer(model_name):
+    """Load a Hugging Face tokenizer once per process; None when it is unavailable."""
+    try:
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(model_name)
+    except Exception as e:
+        print(f"Warning: could not load tokenizer '{model_name}' ({e}). Token counts are approximate.")
+        return None
+
+
+class TokenLedger:
+    """
+    Token accounting for prompts and sessions with the model's own tokenizer.
+    Counts are memoized per message text, and callers store each message's
+    count next to it so running totals never re-tokenize anything.
+    The tokenizer (and transformers) is only loaded on the first count.
+    """
+
+    def __init__(self, model_name, max_session_tokens, max_response_tokens, max_prompt_tokens, cache_size=4096):
+        self.model_name = model_name
+        self.max_session_tokens = max_session_tokens
+        self.max_response_tokens = max_response_tokens
+        self.max_prompt_tokens = max_prompt_tokens
+        self.count = lru_cache(maxsize=cache_size)(self._count)
+
+    @property
+    def tokenizer(self):
+        return load_tokenizer(self.model_name)
+
+    @property
+    def approximate(self):
+        return self.tokenizer is None
+
+    def _count(self, text):
+        if not text:
+            return 0
+        if self.tokenizer is None:
+            return len(APPROX_TOKEN_PATTERN.findall(text))
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def message_tokens(self, text):
+        """Tokens a chat message takes in the prompt, template markers included."""
+        return self.count(text) + MESSAGE_OVERHEAD_TOKENS
+
+    def fit_history(self, history, reserved_tokens):
+        """
+        Keep the newest history entries that fit the prompt budget.
+        Entries end with their stored token count; reserved_tokens covers the
+        system prompt and current query. Returns (entries, prompt_tokens).
+        """
+        used = PROMPT_OVERHEAD_TOKENS + reserved_tokens
+        start = len(history)
+        while start > 0:
+            cost = history[start - 1][-1] + MESSAGE_OVERHEAD_TOKENS
+            if used + cost > self.max_prompt_tokens:
+                break
+            used += cost
+            start -= 1
+        return history[start:], used
+
+    def response_budget(self, session_tokens):
+        """max_tokens for the next reply: the per-response cap, or what is left of the session."""
+        return max(0, min(self.max_response_tokens, self.max_session_tokens - session_tokens))
+
+    def session_exhausted(self, session_tokens):
+        return session_tokens >= self.max_session_tokens
+
+    def stats(self):
+        info = self.count.cache_info()
+        return {
+            'tokenizer': self.model_name,
+            'approximate': self.approximate,
+            'cache_hits': info.hits,
+            'cache_misses': info.misses,
+            'cached_messages': info.currsize
+        }
@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from transcriptStore import TranscriptStore, parse_time
+
+
+class TranscriptIndex:
+    """
+    Full-text index over logged interactions for support staff.
+    Rows live in SQLite with an FTS5 inverted index kept in sync by triggers,
+    so each saved interaction is searchable as soon as it is added.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript("""
+            CREATE TABLE IF NOT EXISTS interactions (
+                id INTEGER PRIMARY KEY,
+                ts REAL NOT NULL,
+                session_id TEXT,
+                name TEXT,
+                insurance_type TEXT,
+                state TEXT,
+                query TEXT,
+                response TEXT
+            );
+            CREATE INDEX IF NOT EXISTS interactions_ts ON interactions (ts);
+            CREATE INDEX IF NOT EXISTS interactions_session ON interactions (session_id, ts);
+            CREATE VIRTUAL TABLE IF NOT EXISTS interactions_fts USING fts5(
+                query, response, name, insurance_type,
+                content='interactions', content_rowid='id', tokenize='porter unicode61'
+            );
+            CREATE TRIGGER IF NOT EXISTS interactions_ai AFTER INSERT ON interactions BEGIN
+                INSERT INTO interactions_fts (rowid, query, response, name, insurance_type)
+                VALUES (new.id, new.query, new.response, new.name, new.insurance_type);
+            END;
+            CREATE TRIGGER IF NOT EXISTS interactions_ad AFTER DELETE ON interactions BEGIN
+                INSERT INTO interactions_fts (interactions_fts, rowid, query, response, name, insurance_type)
+                VALUES ('delete', old.id, old.query, old.response, old.name, old.insurance_type);
+            END;
+        """)
+        connection.commit()
+
+    def _connection(self):
+        # SQLite connections are not shared between threads
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.row_factory = sqlite3.Row
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _row(record):
+        state = record.get('conversation_state') or record.get('state')
+        return (
+            record.get('ts', time.time()), record.get('session_id'), record.get('name'),
+            record.get('insurance_type'), str(state) if state is not None else None,
+            record.get('query'), record.get('response')
+        )
+
+    def add(self, record):
+        self.add_many([record])
+
+    def add_many(self, records):
+        connection = self._connection()
+        connection.executemany(
+            "INSERT INTO interactions (ts, session_id, name, insurance_type, state, query, response) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self._row(record) for record in records)
+        )
+        connection.commit()
+
+    @staticmethod
+    def match_expression(text):
+        """Quote each word so user input is never parsed as FTS5 syntax; words are ANDed."""
+        return " ".join(f'"{word}"' for word in re.findall(r"\w+", text))
+
+    def search(self, text=None, start=None, end=None, state=None, session_id=None, limit=50):
+        """
+        Return matching interactions, newest first.
+        Filters: time range [start, end) in epoch seconds, conversation state and session id.
+        """
+        conditions = []
+        params = []
+        if text and self.match_expression(text):
+            columns = "snippet(interactions_fts, -1, '[', ']', '...', 12) AS snippet"
+            conditions.append("interactions_fts MATCH ?")
+            params.append(self.match_expression(text))
+            if session_id is not None:
+                # A session has few turns: read them first, then check each against the index
+                source = "interactions i CROSS JOIN interactions_fts ON interactions_fts.rowid = i.id"
+            else:
+                # Rowids follow insert order, not ts (late or retried turns), so matches are
+                # ordered and bounded by ts, which the interactions_ts index serves
+                source = "interactions_fts JOIN interactions i ON i.id = interactions_fts.rowid"
+        else:
+            source = "interactions i"
+            columns = "NULL AS snippet"
+        order = "i.ts DESC"
+
+        for condition, value in (("i.ts >= ?", start), ("i.ts < ?", end),
+                                 ("i.state = ?", state), ("i.session_id = ?", session_id)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+
+        sql = (f"SELECT i.*, {columns} FROM {source}"
+               + (" WHERE " + " AND ".join(conditions) if conditions else "")
+               + f" ORDER BY {order} LIMIT ?")
+        params.append(limit)
+        return [self._result(row) for row in self._connection().execute(sql, params)]
+
+    def conversation(self, session_id):
+        """Every indexed turn of one session, oldest first."""
+        rows = self._connection().execute(
+            "SELECT i.*, NULL AS snippet FROM interactions i WHERE session_id = ? ORDER BY ts", (session_id,)
+        )
+        return [self._result(row) for row in rows]
+
+    @staticmethod
+    def _result(row):
+        result = dict(row)
+        result['timestamp'] = datetime.fromtimestamp(result['ts'], timezone.utc).isoformat(timespec='seconds')
+        return result
+
+    def prune(self, max_age_days):
+        """Drop turns older than max_age_days, matching transcript retention; returns the count."""
+        connection = self._connection()
+        cursor = connection.execute("DELETE FROM interactions WHERE ts < ?", (time.time() - max_age_days * 86400,))
+        connection.commit()
+        return cursor.rowcount
+
+    def rebuild(self, store, batch_size=5000):
+        """Re-create the index from a TranscriptStore; returns the number of turns indexed."""
+        connection = self._connection()
+        connection.execute("DELETE FROM interactions")
+        connection.execute("INSERT INTO interactions_fts (interactions_fts) VALUES ('rebuild')")
+        connection.commit()
+
+        count = 0
+        batch = []
+        for record in store:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                self.add_many(batch)
+                count += len(batch)
+                batch = []
+        self.add_many(batch)
+        return count + len(batch)
+
+
+def main():
+    from appointmentBot import Config
+
+    parser = argparse.ArgumentParser(description="Search logged conversations.")
+    parser.add_argument('--index', default=Config.TRANSCRIPT_INDEX_PATH, help="Index database")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    search_parser = subparsers.add_parser('search', help="Find interactions by text and filters")
+    search_parser.add_argument('text', nargs='?', help="Words to find in query, response, name or insurance type")
+    search_parser.add_argument('--start', help="Epoch seconds or ISO date/time (UTC)")
+    search_parser.add_argument('--end', help="Epoch seconds or ISO date/time (UTC), exclusive")
+    search_parser.add_argument('--state', help="Conversation state, e.g. scheduling_appointment")
+    search_parser.add_argument('--session', help="Session id")
+    search_parser.add_argument('--limit', type=int, default=20)
+
+    subparsers.add_parser('reindex', help="Rebuild the index from the transcript store")
+    subparsers.add_parser('prune', help="Drop turns older than the transcript retention")
+    args = parser.parse_args()
+
+    index = TranscriptIndex(args.index)
+    if args.command == 'reindex':
+        store = TranscriptStore(Config.TRANSCRIPT_DIR, Config.TRANSCRIPT_PARTITION)
+        print(f"Indexed {index.rebuild(store)} interactions.")
+        return
+    if args.command == 'prune':
+        print(f"Removed {index.prune(Config.TRANSCRIPT_RETENTION_DAYS)} interactions.")
+        return
+
+    started = time.perf_counter()
+    results = index.search(args.text, parse_time(args.start), parse_time(args.end),
+                           args.state, args.session, args.limit)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False))
+    print(f"{len(results)} results in {elapsed_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
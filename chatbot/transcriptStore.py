@@ -0,0 +1,260 @@
+import argparse
+import csv
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+# Partition names sort chronologically
+PARTITION_FORMATS = {'hour': '%Y%m%d%H', 'day': '%Y%m%d'}
+PARTITION_SECONDS = {'hour': 3600, 'day': 86400}
+
+
+class TranscriptStore:
+    """
+    Interaction log stored as time-partitioned segments (UTC hours or days).
+    The current partition is an uncompressed JSON-lines file. Once writes move
+    on to a new partition, the old one is rewritten as independent gzip blocks
+    with a sparse index of (min_ts, max_ts, offset, length, count) per block,
+    so a time-range read only decompresses the blocks it needs. Compression
+    and retention run on a background thread so appends never wait on them.
+    One process should write to a directory; any number may read it.
+    """
+
+    ACTIVE_SUFFIX = '.jsonl'
+    SEGMENT_SUFFIX = '.jsonl.gz'
+    INDEX_SUFFIX = '.idx.json'
+
+    def __init__(self, directory, partition='hour', retention_days=None, block_records=256):
+        if partition not in PARTITION_FORMATS:
+            raise ValueError(f"Unknown partition '{partition}'; use one of {', '.join(PARTITION_FORMATS)}")
+        self.directory = directory
+        self.partition = partition
+        self.retention_days = retention_days
+        self.block_records = block_records
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._active_key = None
+        self._active_file = None
+        # Serializes compression and retention passes, separately from appends
+        self._maintenance_lock = threading.Lock()
+        self._maintenance = []
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def partition_key(self, ts):
+        return time.strftime(PARTITION_FORMATS[self.partition], time.gmtime(ts))
+
+    def partition_start(self, key):
+        return datetime.strptime(key, PARTITION_FORMATS[self.partition]).replace(tzinfo=timezone.utc).timestamp()
+
+    def append(self, record, ts=None):
+        """Write one interaction and return it as stored; records are filed by write time."""
+        ts = time.time() if ts is None else ts
+        record = {'ts': ts, **record}
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        key = self.partition_key(ts)
+
+        with self._lock:
+            if self._active_key is None or key > self._active_key:
+                self._open_partition(key)
+            self._active_file.write(line)
+            self._active_file.flush()
+        return record
+
+    def _open_partition(self, key):
+        if self._active_file is not None:
+            self._active_file.close()
+        self._active_key = key
+        self._active_file = open(self._path(key, self.ACTIVE_SUFFIX), 'a', encoding='utf-8')
+        # Closed partitions are never written again, so they can be compressed while appends continue
+        thread = threading.Thread(target=self._maintain, args=(key,), name='transcript-compress', daemon=True)
+        self._maintenance = [running for running in self._maintenance if running.is_alive()] + [thread]
+        thread.start()
+
+    def roll(self):
+        """Compress finished partitions and apply retention without writing anything."""
+        with self._lock:
+            current = self.partition_key(time.time())
+            if self._active_key is not None and current > self._active_key:
+                self._active_file.close()
+                self._active_file = None
+                self._active_key = None
+        self._maintain(current)
+
+    def _maintain(self, current):
+        with self._maintenance_lock:
+            try:
+                self._compress_closed(current)
+                self._apply_retention()
+            except OSError as e:
+                # The plain files stay readable; the next rollover or roll() retries
+                print(f"Warning: transcript compression failed: {e}")
+
+    def _compress_closed(self, current):
+        # Only partitions older than the one being opened are closed; newer ones may still take appends
+        for key, compressed, plain in self.segments():
+            if plain and key < current and key != self._active_key:
+                self._compress(key)
+
+    def _compress(self, key):
+        plain_path = self._path(key, self.ACTIVE_SUFFIX)
+        segment_path = self._path(key, self.SEGMENT_SUFFIX)
+        index_path = self._path(key, self.INDEX_SUFFIX)
+
+        records = []
+        with open(plain_path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    records.append((json.loads(line)['ts'], line))
+                except (ValueError, KeyError):
+                    continue  # torn final line from a crash
+
+        index = []
+        with open(segment_path + '.tmp', 'wb') as out:
+            for start in range(0, len(records), self.block_records):
+                block = records[start:start + self.block_records]
+                data = gzip.compress(''.join(line for _, line in block).encode('utf-8'))
+                timestamps = [ts for ts, _ in block]
+                index.append([min(timestamps), max(timestamps), out.tell(), len(data), len(block)])
+                out.write(data)
+
+        # The plain file stays the source of truth until both replacements land
+        with open(index_path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(index, file)
+        os.replace(index_path + '.tmp', index_path)
+        os.replace(segment_path + '.tmp', segment_path)
+        os.remove(plain_path)
+
+    def _apply_retention(self, now=None):
+        if not self.retention_days:
+            return 0
+        cutoff = (now or time.time()) - self.retention_days * 86400
+        removed = 0
+        for key, compressed, plain in self.segments():
+            if compressed and not plain and self.partition_start(key) + PARTITION_SECONDS[self.partition] <= cutoff:
+                os.remove(self._path(key, self.SEGMENT_SUFFIX))
+                if os.path.exists(self._path(key, self.INDEX_SUFFIX)):
+                    os.remove(self._path(key, self.INDEX_SUFFIX))
+                removed += 1
+        return removed
+
+    def segments(self):
+        """(key, compressed, plain) for every stored partition, oldest first."""
+        found = {}
+        for name in os.listdir(self.directory):
+            if name.endswith(self.SEGMENT_SUFFIX):
+                found.setdefault(name[:-len(self.SEGMENT_SUFFIX)], [False, False])[0] = True
+            elif name.endswith(self.ACTIVE_SUFFIX):
+                found.setdefault(name[:-len(self.ACTIVE_SUFFIX)], [False, False])[1] = True
+        return [(key, compressed, plain) for key, (compressed, plain) in sorted(found.items())]
+
+    def read(self, start=None, end=None):
+        """Yield records with start <= ts < end as one stream, oldest segment first."""
+        span = PARTITION_SECONDS[self.partition]
+        for key, compressed, plain in self.segments():
+            segment_start = self.partition_start(key)
+            if start is not None and segment_start + span <= start:
+                continue
+            if end is not None and segment_start >= end:
+                break
+            if plain:
+                # Still open, or mid-compression: the plain file is complete
+                lines = self._read_plain(key)
+            else:
+                lines = self._read_compressed(key, start, end)
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if (start is None or record['ts'] >= start) and (end is None or record['ts'] < end):
+                    yield record
+
+    def __iter__(self):
+        return self.read()
+
+    def _read_plain(self, key):
+        try:
+            with open(self._path(key, self.ACTIVE_SUFFIX), encoding='utf-8') as file:
+                yield from file
+        except FileNotFoundError:
+            return
+
+    def _read_compressed(self, key, start, end):
+        with open(self._path(key, self.INDEX_SUFFIX), encoding='utf-8') as file:
+            index = json.load(file)
+        with open(self._path(key, self.SEGMENT_SUFFIX), 'rb') as file:
+            for min_ts, max_ts, offset, length, _ in index:
+                if (start is not None and max_ts < start) or (end is not None and min_ts >= end):
+                    continue
+                file.seek(offset)
+                yield from gzip.decompress(file.read(length)).decode('utf-8').splitlines(keepends=True)
+
+    def close(self):
+        with self._lock:
+            if self._active_file is not None:
+                self._active_file.close()
+                self._active_file = None
+                self._active_key = None
+            maintenance, self._maintenance = self._maintenance, []
+        for thread in maintenance:
+            thread.join()
+
+
+def parse_time(value):
+    """Accept epoch seconds or an ISO date/datetime (UTC when no zone is given)."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+
+def main():
+    from appointmentBot import Config
+
+    parser = argparse.ArgumentParser(description="Read or maintain the partitioned interaction log.")
+    parser.add_argument('--dir', default=Config.TRANSCRIPT_DIR, help="Transcript directory")
+    parser.add_argument('--partition', default=Config.TRANSCRIPT_PARTITION, choices=sorted(PARTITION_FORMATS))
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    read_parser = subparsers.add_parser('read', help="Print interactions in a time range")
+    read_parser.add_argument('--start', help="Epoch seconds or ISO date/time (UTC)")
+    read_parser.add_argument('--end', help="Epoch seconds or ISO date/time (UTC), exclusive")
+    read_parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl')
+
+    subparsers.add_parser('roll', help="Compress finished partitions and apply retention")
+    args = parser.parse_args()
+
+    store = TranscriptStore(args.dir, args.partition, Config.TRANSCRIPT_RETENTION_DAYS)
+    if args.command == 'roll':
+        store.roll()
+        print(f"{len(store.segments())} segments in {args.dir}")
+        return
+
+    records = store.read(parse_time(args.start), parse_time(args.end))
+    if args.format == 'jsonl':
+        for record in records:
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return
+
+    writer = None
+    for record in records:
+        if writer is None:
+            writer = csv.DictWriter(sys.stdout, fieldnames=list(record), extrasaction='ignore')
+            writer.writeheader()
+        writer.writerow(record)
+
+
+if __name__ == "__main__":
+    main()
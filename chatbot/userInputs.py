@@ -1,5 +1,4 @@
-import re
-from datetime import datetime
+from bookingValidator import BookingValidator
 
 class UserInputCollector:
     @staticmethod
@@ -14,23 +13,26 @@ class UserInputCollector:
         # Name collection with validation
         while True:
             name = input("Full Name: ").strip()
-            if re.match(r'^[A-Za-z\s]{2,50}$', name):
+            error = BookingValidator.validate_name(name)
+            if not error:
                 break
-            print("Invalid name. Use only alphabets (2-50 characters).")
+            print(error)
         
         # Email collection with basic validation (optional)
         while True:
             email = input("Email (optional, press Enter to skip): ").strip()
-            if email == "" or re.match(r'^[\w\.-]+@[\w\.-]+\.\w+$', email):
+            error = BookingValidator.validate_email(email)
+            if not error:
                 break
-            print("Invalid email format. Please try again.")
+            print(error)
         
         # Mobile number collection
         while True:
             mobile = input("Mobile Number: ").strip()
-            if re.match(r'^[0-9]{10}$', mobile):
+            error = BookingValidator.validate_mobile(mobile)
+            if not error:
                 break
-            print("Invalid mobile number. Use 10 digits.")
+            print(error)
         
         # Insurance type selection
         print("\nSelect Insurance Type:")
@@ -48,20 +50,18 @@ class UserInputCollector:
         # Date selection
         while True:
             date = input("Preferred Date (YYYY-MM-DD): ").strip()
-            try:
-                datetime.strptime(date, '%Y-%m-%d')
+            error = BookingValidator.validate_date(date)
+            if not error:
                 break
-            except ValueError:
-                print("Invalid date format. Use YYYY-MM-DD.")
+            print(error)
         
         # Time selection
         while True:
             time = input("Preferred Time (HH:MM, 24-hour format): ").strip()
-            try:
-                datetime.strptime(time, '%H:%M')
+            error = BookingValidator.validate_time(time)
+            if not error:
                 break
-            except ValueError:
-                print("Invalid time format. Use HH:MM in 24-hour format.")
+            print(error)
         
         return {
             'name': name,
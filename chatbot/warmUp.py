@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+
+
+class WarmUp:
+    """
+    Start-up work (model loads, opening the LLM connection) run once, before
+    the server is reported ready. Each step is a (name, callable) pair and is
+    timed separately. A failed step is logged and skipped: everything it
+    prepares is also created lazily on first use, so the server still serves.
+    """
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.ready = threading.Event()
+        self.results = {}
+        self.started_at = None
+        self.seconds = None
+
+    def _record(self, name, started, error=None):
+        self.results[name] = {'seconds': round(time.perf_counter() - started, 3), 'error': error}
+        if error is not None:
+            print(f"Warning: warm-up step '{name}' failed ({error}). It will be retried on first use.")
+
+    def run(self):
+        """Run every step in order on the calling thread, then mark the server ready."""
+        self.started_at = time.perf_counter()
+        for name, step in self.steps:
+            started = time.perf_counter()
+            try:
+                step()
+                self._record(name, started)
+            except Exception as e:
+                self._record(name, started, str(e))
+        self._finish()
+
+    async def run_async(self):
+        """Async variant of run: coroutine steps are awaited, the rest run on a worker thread."""
+        self.started_at = time.perf_counter()
+        for name, step in self.steps:
+            started = time.perf_counter()
+            try:
+                if asyncio.iscoroutinefunction(step):
+                    await step()
+                else:
+                    await asyncio.to_thread(step)
+                self._record(name, started)
+            except Exception as e:
+                self._record(name, started, str(e))
+        self._finish()
+
+    def _finish(self):
+        self.seconds = round(time.perf_counter() - self.started_at, 3)
+        self.ready.set()
+
+    def start(self):
+        """Run the steps on a background thread so the server can accept connections meanwhile."""
+        self.started_at = time.perf_counter()
+        thread = threading.Thread(target=self.run, name='warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        return {
+            'ready': self.ready.is_set(),
+            'warm_up_seconds': self.seconds,
+            'steps': dict(self.results)
+        }
@@ -1,12 +1,14 @@
 from flask import Flask, request, jsonify
 from utils import *  # Import your chatbot function
-from langchain.prompts import PromptTemplate
-from langchain.vectorstores import FAISS
-from langchain.embeddings import HuggingFaceEmbeddings
+from warmup import WarmUp
+from deadline import Deadline
 from config import *
 
 app = Flask(__name__)
-prompt_template = set_custom_prompt()
+
+# Load the embedding model, FAISS index and tokenizer in the background; /ready reports when done
+warm_up = WarmUp(warm_up_steps())
+warm_up.start()
 
 # Define the chatbot endpoint
 @app.route("/chatbot", methods=["POST"])
@@ -18,14 +20,50 @@ def chatbot():
     if not query:
         return jsonify({"error": "No query provided"}), 400
 
+    # The time budget starts here; clients may ask for less than the default with deadline_ms
+    seconds = REQUEST_DEADLINE_SECONDS
+    if "deadline_ms" in data:
+        try:
+            deadline_ms = float(data["deadline_ms"])
+        except (TypeError, ValueError):
+            deadline_ms = None
+        if deadline_ms is None or not deadline_ms > 0:
+            return jsonify({"error": "deadline_ms must be a positive number of milliseconds"}), 400
+        seconds = min(seconds, deadline_ms / 1000)
+    deadline = Deadline(seconds)
+
     try:
         # Generate the response from the chatbot function
         prompt_template = set_custom_prompt()
-        response = generate_and_validate_response(query, prompt_template)
-        return jsonify({"response": response})
+        response, meta = generate_response(query, prompt_template, deadline=deadline)
+        return jsonify({"response": response, "meta": meta})
     except Exception as e:
         return jsonify({"error": f"Error generating response: {e}"}), 500
 
+# Warm retrieval for an insurance type as soon as a client knows the user picked it
+@app.route("/prefetch", methods=["POST"])
+def prefetch():
+    data = request.get_json()
+    insurance_type = data.get("insurance_type")
+    
+    if not insurance_type:
+        return jsonify({"error": "No insurance_type provided"}), 400
+
+    return jsonify({"queued": prefetch_insurance_type(insurance_type)}), 202
+
+# Readiness probe: 503 until warm-up has finished
+@app.route("/ready", methods=["GET"])
+def ready():
+    return jsonify(warm_up.status()), 200 if warm_up.ready.is_set() else 503
+
+# Counters for Groq calls saved by coalescing identical prompts, retrieval cache hits, which path served each answer
+# and prompt tokens saved by context assembly
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return jsonify({"llm_coalescing": coalescing_stats, "admission": admission.stats(), **retrieval_stats(),
+                    "served_by": dict(serving_stats), "answer_cache": answer_cache.stats(),
+                    "context_assembly": context_assembly_stats()})
+
 # Additional endpoints can go here if needed
 
 if __name__ == "__main__":
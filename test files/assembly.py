@@ -0,0 +1,166 @@
+import re
+import numpy as np
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Unit-length copy of a vector (zero vectors stay zero)
+def normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+# Length of the longest suffix of `first` that starts `second`, if at least min_chars long
+def boundary_overlap(first, second, min_chars, max_chars):
+    for size in range(min(len(first), len(second), max_chars), min_chars - 1, -1):
+        if first.endswith(second[:size]):
+            return size
+    return 0
+
+class Chunk:
+    """One retrieved passage with its location, unit embedding and relevance to the query."""
+
+    __slots__ = ("text", "source", "page", "vector", "relevance")
+
+    def __init__(self, text, source, page, vector, relevance=0.0):
+        self.text = text
+        self.source = source
+        self.page = page
+        self.vector = vector
+        self.relevance = relevance
+
+class ContextAssembler:
+    """
+    Turns retrieved chunks into the prompt context:
+    1. merge neighbours from the same page that share the splitter's overlap,
+    2. drop near-duplicates (cosine similarity at or above `duplicate_threshold`),
+    3. pick diverse chunks by maximal marginal relevance (`mmr_lambda` weighs
+       relevance against similarity to chunks already picked),
+    4. stop at `token_budget`, trimming the last chunk at a sentence boundary.
+    Returns the context and a stats dict with the token count of the plain
+    concatenation of the first `baseline_docs` chunks for comparison.
+    """
+
+    def __init__(self, count_tokens, token_budget=600, max_chunks=5, mmr_lambda=0.7,
+                 duplicate_threshold=0.95, min_overlap=20, max_overlap=200, baseline_docs=5):
+        self.count_tokens = count_tokens
+        self.token_budget = token_budget
+        self.max_chunks = max_chunks
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+        self.min_overlap = min_overlap
+        self.max_overlap = max_overlap
+        self.baseline_docs = baseline_docs
+
+    def merge_overlapping(self, chunks):
+        """Join chunks from the same source and page whose edges overlap; the merge keeps the higher relevance."""
+        merged = list(chunks)
+        changed = True
+        while changed:
+            changed = False
+            for i, first in enumerate(merged):
+                for j, second in enumerate(merged):
+                    if i == j or (first.source, first.page) != (second.source, second.page):
+                        continue
+                    size = boundary_overlap(first.text, second.text, self.min_overlap, self.max_overlap)
+                    if size:
+                        merged[i] = Chunk(first.text + second.text[size:], first.source, first.page,
+                                          normalize(first.vector + second.vector),
+                                          max(first.relevance, second.relevance))
+                        del merged[j]
+                        changed = True
+                        break
+                if changed:
+                    break
+        return merged
+
+    def drop_duplicates(self, chunks):
+        """Drop text already contained in another chunk, keeping the superset, then keep the most relevant of each group of near-identical chunks."""
+        supersets = []
+        for chunk in sorted(chunks, key=lambda chunk: len(chunk.text), reverse=True):
+            container = next((other for other in supersets if chunk.text in other.text), None)
+            if container is None:
+                supersets.append(chunk)
+            else:
+                # The superset carries everything the contained chunk did, so it takes the higher relevance
+                container.relevance = max(container.relevance, chunk.relevance)
+        kept = []
+        for chunk in sorted(supersets, key=lambda chunk: (chunk.relevance, len(chunk.text)), reverse=True):
+            if all(float(chunk.vector @ other.vector) < self.duplicate_threshold for other in kept):
+                kept.append(chunk)
+        return kept
+
+    def select_mmr(self, chunks):
+        """Greedy maximal marginal relevance selection of up to max_chunks chunks."""
+        if not chunks:
+            return []
+        matrix = np.stack([chunk.vector for chunk in chunks])
+        similarity = matrix @ matrix.T
+        relevance = np.array([chunk.relevance for chunk in chunks])
+        selected = [int(np.argmax(relevance))]
+        while len(selected) < min(self.max_chunks, len(chunks)):
+            redundancy = similarity[:, selected].max(axis=1)
+            scores = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * redundancy
+            scores[selected] = -np.inf
+            selected.append(int(np.argmax(scores)))
+        return [chunks[index] for index in selected]
+
+    def truncate(self, text, budget):
+        """Longest word prefix of text that fits in `budget` tokens, found by binary search."""
+        words = text.split()
+        low, high = 0, len(words)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count_tokens(" ".join(words[:middle])) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        return " ".join(words[:low])
+
+    def fit_budget(self, chunks):
+        """
+        Take chunks in order until the token budget is spent, cutting the last at a sentence end.
+        The top chunk is always included, cut mid-sentence if even its first sentence is over budget.
+        """
+        parts = []
+        remaining = self.token_budget
+        for chunk in chunks:
+            tokens = self.count_tokens(chunk.text)
+            if tokens <= remaining:
+                parts.append(chunk.text)
+                remaining -= tokens
+                continue
+            kept = []
+            for sentence in SENTENCE_END.split(chunk.text):
+                cost = self.count_tokens(sentence)
+                if cost > remaining:
+                    break
+                kept.append(sentence)
+                remaining -= cost
+            if kept:
+                parts.append(" ".join(kept))
+            elif not parts:
+                truncated = self.truncate(chunk.text, self.token_budget)
+                if truncated:
+                    parts.append(truncated)
+            break
+        return parts
+
+    def assemble(self, query_vector, chunks):
+        """Build the prompt context from chunks in retrieval order; returns (context, stats)."""
+        query = normalize(query_vector)
+        for chunk in chunks:
+            chunk.vector = normalize(chunk.vector)
+            chunk.relevance = float(chunk.vector @ query)
+
+        merged = self.merge_overlapping(chunks)
+        unique = self.drop_duplicates(merged)
+        parts = self.fit_budget(self.select_mmr(unique))
+        context = " ".join(parts)
+        return context, {
+            "candidates": len(chunks),
+            "merged": len(chunks) - len(merged),
+            "duplicates": len(merged) - len(unique),
+            "selected": len(parts),
+            "baseline_tokens": self.count_tokens(" ".join(chunk.text for chunk in chunks[:self.baseline_docs])),
+            "context_tokens": self.count_tokens(context)
+        }
@@ -0,0 +1,45 @@
+import time
+
+class DeadlineExceeded(Exception):
+    """Raised by a stage that finds the request's time budget used up."""
+
+    def __init__(self, stage):
+        super().__init__(f"Deadline exceeded before {stage}")
+        self.stage = stage
+
+class Deadline:
+    """
+    Time budget for one request, set at the edge and passed down to every stage.
+    Stages call check() before starting work and timeout() to bound blocking calls,
+    and lap() when they finish, so the request can report where its time went.
+    """
+
+    def __init__(self, seconds):
+        self.budget = seconds
+        self.started = time.monotonic()
+        self.expires = self.started + seconds
+        self.laps = {}
+        self._last_lap = self.started
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def check(self, stage, reserve=0.0):
+        """Raise DeadlineExceeded unless more than `reserve` seconds are left."""
+        if self.remaining() <= reserve:
+            raise DeadlineExceeded(stage)
+
+    def lap(self, stage):
+        """Charge the seconds since the previous lap (or the start) to `stage`."""
+        now = time.monotonic()
+        self.laps[stage] = self.laps.get(stage, 0.0) + now - self._last_lap
+        self._last_lap = now
+
+    def timeout(self, stage, cap=None):
+        """Seconds a blocking call in `stage` may take: what is left, at most `cap`."""
+        self.check(stage)
+        remaining = self.remaining()
+        return remaining if cap is None else min(cap, remaining)
@@ -0,0 +1,303 @@
+"""
+RAG quality-and-latency regression suite over a labelled question set.
+
+    python ingest.py --eval-fixture   # once: index eval_corpus/ into vectorstores/eval_fixture
+    python evaluate.py --output eval_report.json
+    python evaluate.py --no-faq --cold --baseline eval_report.json
+    python evaluate.py --llm groq   # the configured GROQ_BASE_URL, e.g. mock_llm.py
+    python evaluate.py --check-labels   # only verify the labels against the index
+
+Each question in eval_questions.json runs through generate_response against the
+fixture index built from eval_corpus/ (or another FAISS index with --index,
+e.g. DB_FAISS_PATH) and is scored on:
+- recall@k: share of its evidence phrases found in the top k retrieved chunks,
+  and in the assembled context that is actually sent to the LLM,
+- validator pass: an answerable question got an FAQ or LLM answer that is
+  grounded in its labels (contains one of its answer keywords, or one of its
+  evidence phrases when it has no keywords); an unanswerable one got
+  "I don't know the answer.",
+- answer keyword recall,
+- per-stage latency from the response metadata, plus the raw FAISS search and
+  context assembly times.
+The default LLM is an in-process extractive stub (the context sentence that
+shares the most words with the question), so runs are deterministic and time
+the pipeline rather than the provider. The report follows the layout of
+detailed_metrics.json; with --baseline, recall or pass-rate drops and median
+latency increases beyond the allowed margins exit with status 1.
+
+The labels in eval_questions.json are written against eval_corpus/, so every
+evidence phrase and answer keyword is in the fixture index; keep the two in
+step when either changes. Every run still lists label phrases that appear in
+no indexed chunk, and a baseline comparison refuses to gate (exit 1) while that
+list is not empty, which is what happens against an index the labels were not
+written for.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+import utils
+from config import (SEARCH_DOCS, CONTEXT_FETCH_DOCS, CONTEXT_TOKEN_BUDGET, CONTEXT_MMR_LAMBDA,
+                    CONTEXT_DUPLICATE_THRESHOLD)
+from deadline import Deadline
+from faq import normalize_question
+
+UNKNOWN_ANSWER = "I don't know the answer."
+# Built from eval_corpus/ by ingest.py --eval-fixture
+FIXTURE_INDEX_PATH = "vectorstores/eval_fixture"
+PROMPT_PATTERN = re.compile(r"Context:(.*)Question:(.*?)\n", re.DOTALL)
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+TREND_STATS = ("avg", "min", "med", "max", "p(90)", "p(95)")
+
+# Deterministic stand-in for get_groq_response; abstains when no sentence shares min_overlap words
+def extractive_llm(delay_seconds=0.0, min_overlap=2):
+    def respond(prompt, timeout=None, max_tokens=None, deadline=None):
+        if delay_seconds:
+            time.sleep(delay_seconds)
+        match = PROMPT_PATTERN.search(prompt)
+        if not match:
+            return UNKNOWN_ANSWER
+        context, question = match.group(1), match.group(2)
+        question_words = {word for word in normalize_question(question).split() if len(word) > 3}
+        best, overlap = UNKNOWN_ANSWER, 0
+        for sentence in SENTENCE_END.split(context.strip()):
+            shared = len(question_words & set(normalize_question(sentence).split()))
+            if shared > overlap:
+                best, overlap = sentence, shared
+        return best if overlap >= min_overlap else UNKNOWN_ANSWER
+    return respond
+
+# Share of phrases found in a text, ignoring case and punctuation; None when there is nothing to find
+def phrase_recall(phrases, text):
+    if not phrases:
+        return None
+    haystack = f" {normalize_question(text)} "
+    return sum(f" {normalize_question(phrase)} " in haystack for phrase in phrases) / len(phrases)
+
+# Answerable questions need an answer grounded in their labels; unanswerable ones must abstain. None when unlabelled
+def validator_pass(item, answer, served_by):
+    if not item.get("answerable", True):
+        return answer == UNKNOWN_ANSWER
+    if served_by not in ("faq", "llm") or answer == UNKNOWN_ANSWER or answer.startswith("Error:"):
+        return False
+    grounding = item.get("answer_keywords") or item.get("evidence")
+    if not grounding:
+        return None
+    return phrase_recall(grounding, answer) > 0
+
+# Evidence and answer keyword phrases that appear in no indexed chunk, per question
+def unsupported_labels(questions):
+    db = utils.get_db()
+    corpus = " ".join(f" {normalize_question(db.docstore.search(doc_id).page_content)} "
+                      for doc_id in db.index_to_docstore_id.values())
+    unsupported = {}
+    for item in questions:
+        missing = [phrase for phrase in item.get("evidence", []) + item.get("answer_keywords", [])
+                   if f" {normalize_question(phrase)} " not in corpus]
+        if missing:
+            unsupported[item["question"]] = sorted(set(missing))
+    return unsupported
+
+# Summary of a list of values in the detailed_metrics.json trend layout
+def trend(values):
+    if not values:
+        return None
+    values = np.asarray(values, dtype=float)
+    stats = (values.mean(), values.min(), np.median(values), values.max(),
+             np.percentile(values, 90), np.percentile(values, 95))
+    return {"type": "trend", "values": {name: round(float(value), 3) for name, value in zip(TREND_STATS, stats)}}
+
+# Mean of per-question scores, skipping questions without labels for it
+def rate(scores):
+    scores = [score for score in scores if score is not None]
+    if not scores:
+        return None
+    return {"type": "rate", "values": {"rate": round(sum(scores) / len(scores), 4),
+                                       "passes": sum(score == 1 for score in scores),
+                                       "fails": sum(score < 1 for score in scores)}}
+
+# Empty the query caches so the next question pays for embedding and retrieval again
+def clear_caches():
+    utils.embedding_cache.clear()
+    utils.retrieval_cache.clear()
+    utils.answer_cache.clear()
+
+# Run one labelled question through the pipeline and score it
+def evaluate_question(item, prompt_template, ks):
+    query = item["question"]
+    deadline = Deadline(float("inf"))
+    started = time.perf_counter()
+    answer, meta = utils.generate_response(query, prompt_template, deadline=deadline)
+    total_ms = (time.perf_counter() - started) * 1000
+
+    # Retrieval is scored separately so FAQ hits and cached contexts still get recall figures
+    query_vector = utils.embed_query(query)
+    started = time.perf_counter()
+    chunks = utils.retrieve_chunks(query_vector, max(max(ks), CONTEXT_FETCH_DOCS))
+    search_ms = (time.perf_counter() - started) * 1000
+    ranked_text = [chunk.text for chunk in chunks]
+    started = time.perf_counter()
+    context, assembly = utils.context_assembler.assemble(query_vector, chunks[:CONTEXT_FETCH_DOCS])
+    assembly_ms = (time.perf_counter() - started) * 1000
+
+    evidence = item.get("evidence", [])
+    answerable = item.get("answerable", True)
+    return {
+        "question": query,
+        "answerable": answerable,
+        "served_by": meta["served_by"],
+        "answer": answer,
+        "validator_pass": validator_pass(item, answer, meta["served_by"]),
+        "recall": {k: phrase_recall(evidence, " ".join(ranked_text[:k])) for k in ks},
+        "context_recall": phrase_recall(evidence, context),
+        "answer_keyword_recall": phrase_recall(item.get("answer_keywords", []), answer) if answerable else None,
+        "context_tokens": assembly["context_tokens"],
+        "stages_ms": meta.get("stages_ms", {}),
+        "search_ms": round(search_ms, 3),
+        "assembly_ms": round(assembly_ms, 3),
+        "total_ms": round(total_ms, 3)
+    }
+
+# Aggregate per-question results into report metrics
+def summarize(results, ks):
+    last_run = [result for result in results if result["run"] == results[-1]["run"]]
+    metrics = {f"recall@{k}": rate([result["recall"][k] for result in last_run]) for k in ks}
+    metrics["context_recall"] = rate([result["context_recall"] for result in last_run])
+    metrics["validator_pass"] = rate([None if result["validator_pass"] is None else float(result["validator_pass"])
+                                      for result in last_run])
+    metrics["answer_keyword_recall"] = rate([result["answer_keyword_recall"] for result in last_run])
+    metrics["context_tokens"] = trend([result["context_tokens"] for result in last_run])
+
+    # Latency over every run; a stage only counts for the questions that reached it
+    stages = sorted({stage for result in results for stage in result["stages_ms"]})
+    for stage in stages:
+        metrics[f"stage_{stage}_ms"] = trend([result["stages_ms"][stage] for result in results
+                                              if stage in result["stages_ms"]])
+    for name in ("search_ms", "assembly_ms", "total_ms"):
+        metrics[name] = trend([result[name] for result in results])
+    return {name: metric for name, metric in metrics.items() if metric is not None}
+
+# Print metric changes against an earlier report; returns the regressions beyond the allowed margins
+def compare(metrics, baseline, max_quality_drop, max_latency_increase):
+    regressions = []
+    print(f"\n{'metric':<26} {'baseline':>10} {'current':>10} {'change':>9}")
+    for name, metric in metrics.items():
+        previous = baseline.get("metrics", {}).get(name)
+        if previous is None:
+            continue
+        key = "rate" if metric["type"] == "rate" else "med"
+        before, after = previous["values"][key], metric["values"][key]
+        print(f"{name:<26} {before:>10.3f} {after:>10.3f} {after - before:>+9.3f}")
+        if metric["type"] == "rate" and before - after > max_quality_drop:
+            regressions.append(f"{name} dropped from {before:.3f} to {after:.3f}")
+        # Sub-millisecond stages are too noisy to judge by ratio alone
+        elif name.endswith("_ms") and after > before * (1 + max_latency_increase) and after - before >= 1:
+            regressions.append(f"{name} median rose from {before:.1f} ms to {after:.1f} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Score retrieval recall, answer validation and stage latency.")
+    parser.add_argument("--questions", default="eval_questions.json")
+    parser.add_argument("--output", default="eval_report.json")
+    parser.add_argument("--index", default=FIXTURE_INDEX_PATH,
+                        help=f"FAISS index directory (default {FIXTURE_INDEX_PATH}, built by ingest.py --eval-fixture)")
+    parser.add_argument("--k", type=int, action="append", help="recall cut-offs (default 1, 3 and SEARCH_DOCS)")
+    parser.add_argument("--llm", choices=["stub", "groq"], default="stub")
+    parser.add_argument("--llm-ms", type=float, default=0, help="stub LLM delay per call")
+    parser.add_argument("--no-faq", action="store_true", help="skip the FAQ index so every question reaches the LLM")
+    parser.add_argument("--cold", action="store_true", help="clear query caches before every question")
+    parser.add_argument("--runs", type=int, default=1, help="passes over the question set, for latency spread")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--max-quality-drop", type=float, default=0.05)
+    parser.add_argument("--max-latency-increase", type=float, default=0.25, help="allowed median increase, as a ratio")
+    parser.add_argument("--check-labels", action="store_true",
+                        help="only report label phrases missing from the index; exit 1 if any are")
+    args = parser.parse_args()
+    ks = sorted(set(args.k or [1, 3, SEARCH_DOCS]))
+
+    with open(args.questions, encoding="utf-8") as file:
+        questions = json.load(file)
+    # Read before the run: the baseline may be the report this run overwrites
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+    if not os.path.isdir(args.index):
+        sys.exit(f"No FAISS index at {args.index}; build the fixture with python ingest.py --eval-fixture")
+    utils.DB_FAISS_PATH = args.index
+    if args.llm == "stub":
+        utils.get_groq_response = extractive_llm(args.llm_ms / 1000)
+    if args.no_faq:
+        utils.get_faq_index = lambda: None
+    prompt_template = utils.set_custom_prompt()
+
+    # Load models and the index up front so the first question is not charged for them
+    started = time.perf_counter()
+    utils.get_db()
+    utils.embed_query("warm-up")
+    utils.get_tokenizer()
+    load_seconds = time.perf_counter() - started
+
+    unsupported = unsupported_labels(questions)
+    for question, phrases in unsupported.items():
+        print(f"Warning: labels not found in the index for '{question}': {', '.join(phrases)}")
+    if args.check_labels:
+        print(f"{len(unsupported)} of {len(questions)} questions have labels missing from {utils.DB_FAISS_PATH}")
+        sys.exit(1 if unsupported else 0)
+
+    results = []
+    started = time.perf_counter()
+    for run in range(args.runs):
+        for item in questions:
+            if args.cold:
+                clear_caches()
+            result = evaluate_question(item, prompt_template, ks)
+            result["run"] = run
+            results.append(result)
+    duration_ms = (time.perf_counter() - started) * 1000
+
+    metrics = summarize(results, ks)
+    report = {
+        "options": {
+            "questions": args.questions, "index": utils.DB_FAISS_PATH, "llm": args.llm, "faq": not args.no_faq,
+            "cold": args.cold, "runs": args.runs, "k": ks, "search_docs": SEARCH_DOCS,
+            "context_fetch_docs": CONTEXT_FETCH_DOCS, "context_token_budget": CONTEXT_TOKEN_BUDGET,
+            "context_mmr_lambda": CONTEXT_MMR_LAMBDA, "context_duplicate_threshold": CONTEXT_DUPLICATE_THRESHOLD
+        },
+        "state": {"testRunDurationMs": round(duration_ms, 3), "loadMs": round(load_seconds * 1000, 3),
+                  "labelsVerified": not unsupported},
+        "metrics": metrics,
+        "unsupported_labels": unsupported,
+        "served_by": {served_by: sum(result["served_by"] == served_by for result in results)
+                      for served_by in sorted({result["served_by"] for result in results})},
+        "questions": results
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+    print(f"{len(questions)} questions x {args.runs} run(s) in {duration_ms / 1000:.1f} s; report: {args.output}")
+    for name, metric in metrics.items():
+        values = metric["values"]
+        if metric["type"] == "rate":
+            print(f"{name:<26} {values['rate']:.3f}")
+        else:
+            print(f"{name:<26} med {values['med']:.2f}  p(95) {values['p(95)']:.2f}")
+
+    if baseline is not None:
+        regressions = compare(metrics, baseline, args.max_quality_drop, args.max_latency_increase)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        # Recall against labels the index cannot contain says nothing about a change
+        if unsupported:
+            print(f"Not a valid gate: {len(unsupported)} questions have labels missing from the index "
+                  f"(see --check-labels).")
+        if regressions or unsupported:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import json
+import os
+import re
+import numpy as np
+
+ANSWERS_FILE = "answers.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+
+# Normalize questions so trivial differences in case and punctuation still match
+def normalize_question(text):
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+# Pick the retrieved chunk that shares the most words with the answer
+def find_source_chunk(answer, docs):
+    answer_words = set(normalize_question(answer).split())
+    best_doc = max(docs, key=lambda doc: len(answer_words & set(normalize_question(doc.page_content).split())))
+    return {
+        "source": best_doc.metadata.get("source"),
+        "page": best_doc.metadata.get("page"),
+        "excerpt": best_doc.page_content[:300]
+    }
+
+# Precompute vetted answers for the curated FAQ set and save them with question embeddings
+def build_faq_index(faq_path, output_path, db, embeddings, answer_fn, search_docs):
+    with open(faq_path, encoding='utf-8') as file:
+        faqs = json.load(file)
+
+    entries = []
+    vectors = []
+    for faq in faqs:
+        question = faq["question"]
+        docs = db.similarity_search(question, k=search_docs)
+
+        # Curated answers win; otherwise generate one and keep it only if it passes validation
+        answer = faq.get("answer") or answer_fn(question, docs)
+        if not answer or not docs:
+            print(f"Skipping FAQ without a vetted answer: {question}")
+            continue
+
+        entries.append({
+            "question": question,
+            "answer": answer,
+            "source_chunk": find_source_chunk(answer, docs)
+        })
+        vectors.append(embeddings.embed_query(question))
+
+    # Leave any existing index in place rather than replace it with an empty one
+    if not entries:
+        print(f"Warning: no FAQ passed validation; {output_path} was not written")
+        return entries
+
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1, norms)
+
+    os.makedirs(output_path, exist_ok=True)
+    np.save(os.path.join(output_path, EMBEDDINGS_FILE), matrix)
+    with open(os.path.join(output_path, ANSWERS_FILE), 'w', encoding='utf-8') as file:
+        json.dump(entries, file, indent=2)
+
+    print(f"Saved {len(entries)} FAQ answers to {output_path}")
+    return entries
+
+class FaqIndex:
+    """Nearest-neighbour lookup over precomputed FAQ answers."""
+
+    def __init__(self, entries, matrix, threshold):
+        self.entries = entries
+        self.matrix = matrix
+        self.threshold = threshold
+        self.exact = {normalize_question(entry["question"]): entry for entry in entries}
+
+    @classmethod
+    def load(cls, path, threshold):
+        """Load a built index, or return None if it has not been built yet."""
+        answers_path = os.path.join(path, ANSWERS_FILE)
+        if not os.path.exists(answers_path):
+            return None
+        with open(answers_path, encoding='utf-8') as file:
+            entries = json.load(file)
+        matrix = np.load(os.path.join(path, EMBEDDINGS_FILE))
+        return cls(entries, matrix, threshold)
+
+    def match_text(self, query):
+        """Exact match on the normalized question; no embedding needed."""
+        return self.exact.get(normalize_question(query))
+
+    def match_vector(self, query_vector, threshold=None):
+        """Return the closest FAQ entry and its cosine score, if above the threshold (default: the index's)."""
+        if not self.entries:
+            return None, 0.0
+        vector = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None, 0.0
+        scores = self.matrix @ (vector / norm)
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        if score < (self.threshold if threshold is None else threshold):
+            return None, score
+        return self.entries[best], score
@@ -1,13 +1,19 @@
+import argparse
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.document_loaders import PyPDFLoader, DirectoryLoader
+from langchain.document_loaders import PyPDFLoader, DirectoryLoader, TextLoader
 from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.vectorstores import FAISS
 
 DATA_PATH= "data/"
 DB_FAISS_PATH= "vectorstores/db_faiss"
+FAQ_PATH= "faq.json"
+FAQ_INDEX_PATH= "vectorstores/faq_index"
+# Small text corpus the eval_questions.json labels are written against (evaluate.py's default index)
+EVAL_CORPUS_PATH= "eval_corpus/"
+EVAL_DB_FAISS_PATH= "vectorstores/eval_fixture"
 
-def create_vector_db():
-    loader= DirectoryLoader(DATA_PATH,glob="*.pdf", loader_cls=PyPDFLoader)
+def create_vector_db(data_path=DATA_PATH, db_path=DB_FAISS_PATH, glob="*.pdf", loader_cls=PyPDFLoader):
+    loader= DirectoryLoader(data_path,glob=glob, loader_cls=loader_cls)
     documents= loader.load()
     text_splitter= RecursiveCharacterTextSplitter(chunk_size= 500, chunk_overlap=50)
     texts=text_splitter.split_documents(documents)
@@ -16,9 +22,40 @@ def create_vector_db():
                                       model_kwargs={"device":"cpu"})
     
     db=FAISS.from_documents(texts,embeddings)
-    db.save_local(DB_FAISS_PATH)
+    db.save_local(db_path)
+
+# Same splitter and embeddings as the course index, so evaluation results carry over
+def create_eval_fixture_db():
+    create_vector_db(EVAL_CORPUS_PATH, EVAL_DB_FAISS_PATH, glob="*.txt", loader_cls=TextLoader)
+
+def create_faq_index():
+    # Imported here because utils loads the vector store built above
+    from faq import build_faq_index
+    from utils import set_custom_prompt, get_groq_response, validate_response, SEARCH_DOCS
+
+    embeddings= HuggingFaceEmbeddings(model_name= "sentence-transformers/all-MiniLM-L6-v2", 
+                                      model_kwargs={"device":"cpu"})
+    db=FAISS.load_local(DB_FAISS_PATH, embeddings, allow_dangerous_deserialization=True)
+    prompt_template= set_custom_prompt()
+
+    # Keep only answers that pass the same validation as live responses
+    def vetted_answer(question, docs):
+        context= " ".join([doc.page_content for doc in docs])
+        answer= validate_response(get_groq_response(prompt_template.format(context=context, question=question)), context)
+        if answer == "I don't know the answer." or answer.startswith("Error:"):
+            return None
+        return answer
+
+    build_faq_index(FAQ_PATH, FAQ_INDEX_PATH, db, embeddings, vetted_answer, SEARCH_DOCS)
 
 if __name__=="__main__":
-    create_vector_db()
+    parser= argparse.ArgumentParser(description="Build the FAISS and FAQ indexes.")
+    parser.add_argument("--eval-fixture", action="store_true", help="only build the evaluation index from eval_corpus/")
+    args= parser.parse_args()
+    if args.eval_fixture:
+        create_eval_fixture_db()
+    else:
+        create_vector_db()
+        create_faq_index()
 
     
\ No newline at end of file
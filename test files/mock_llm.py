@@ -0,0 +1,208 @@
+"""
+Local stand-in for the Groq (OpenAI-compatible) chat API, for offline load tests.
+
+    python mock_llm.py --latency lognormal --latency-ms 400 --rate-429 0.02
+
+Point the bots at it with GROQ_BASE_URL=http://localhost:8900 (any GROQ_API_KEY
+value is accepted). Runs are reproducible for a given --seed and request order.
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+
+from flask import Flask, Response, jsonify, request
+
+TOKEN_PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+SERVER_ERRORS = (500, 502, 503)
+
+
+class LatencyProfile:
+    """
+    Time to first token, in seconds.
+    fixed: always `median_ms`. lognormal: median `median_ms`, spread `sigma`.
+    brownout: lognormal, except for `duration` seconds out of every `period`
+    when latency is multiplied by `factor` (a slow upstream, not an outage).
+    """
+
+    def __init__(self, kind='fixed', median_ms=300, sigma=0.5, period=60, duration=10, factor=8):
+        if kind not in ('fixed', 'lognormal', 'brownout'):
+            raise ValueError(f"Unknown latency profile '{kind}'")
+        self.kind = kind
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.period = period
+        self.duration = duration
+        self.factor = factor
+        self.started = time.monotonic()
+
+    def in_brownout(self, now=None):
+        elapsed = (now or time.monotonic()) - self.started
+        return self.kind == 'brownout' and elapsed % self.period >= self.period - self.duration
+
+    def sample(self, rng):
+        if self.kind == 'fixed':
+            return self.median_ms / 1000
+        seconds = rng.lognormvariate(math.log(self.median_ms / 1000), self.sigma)
+        return seconds * self.factor if self.in_brownout() else seconds
+
+
+class Responder:
+    """Reply text: scripted regex matches (first match wins) with an echo fallback."""
+
+    def __init__(self, script_path=None):
+        self.rules = []
+        self.default = None
+        if script_path:
+            with open(script_path, encoding='utf-8') as file:
+                script = json.load(file)
+            self.rules = [(re.compile(rule['match'], re.IGNORECASE), rule['response']) for rule in script.get('rules', [])]
+            self.default = script.get('default')
+
+    def reply(self, messages, max_tokens):
+        question = next((m['content'] for m in reversed(messages) if m.get('role') == 'user'), '')
+        for pattern, response in self.rules:
+            if pattern.search(question):
+                return self.truncate(response, max_tokens)
+        if self.default is not None:
+            return self.truncate(self.default, max_tokens)
+        return self.truncate(f"Mock answer to: {question}", max_tokens)
+
+    @staticmethod
+    def truncate(text, max_tokens):
+        """Cut the reply at max_tokens, as the real API would."""
+        if not max_tokens:
+            return text
+        words = []
+        used = 0
+        for word in text.split():
+            used += count_tokens(word)
+            if used > max_tokens:
+                break
+            words.append(word)
+        return " ".join(words)
+
+
+def count_tokens(text):
+    return len(TOKEN_PATTERN.findall(text or ''))
+
+
+def create_app(latency, responder, rate_429=0.0, rate_5xx=0.0, token_ms=0.0, seed=None):
+    app = Flask(__name__)
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+    stats = {'requests': 0, 'streamed': 0, 'errors_429': 0, 'errors_5xx': 0, 'completion_tokens': 0}
+
+    def draw():
+        # One draw per request keeps a seeded run reproducible for the same request order
+        with rng_lock:
+            stats['requests'] += 1
+            roll = rng.random()
+            return roll, latency.sample(rng), rng.choice(SERVER_ERRORS)
+
+    def error(status, message, kind):
+        response = jsonify({'error': {'message': message, 'type': kind}})
+        response.status_code = status
+        if status == 429:
+            response.headers['Retry-After'] = '1'
+        return response
+
+    @app.route('/openai/v1/chat/completions', methods=['POST'])
+    @app.route('/v1/chat/completions', methods=['POST'])
+    def chat_completions():
+        body = request.get_json(force=True)
+        roll, delay, server_error = draw()
+
+        if roll < rate_429:
+            with rng_lock:
+                stats['errors_429'] += 1
+            return error(429, "Rate limit reached (mock)", 'rate_limit_exceeded')
+        time.sleep(delay)
+        if roll < rate_429 + rate_5xx:
+            with rng_lock:
+                stats['errors_5xx'] += 1
+            return error(server_error, "Upstream error (mock)", 'server_error')
+
+        messages = body.get('messages', [])
+        text = responder.reply(messages, body.get('max_tokens'))
+        prompt_tokens = sum(count_tokens(m.get('content')) for m in messages)
+        completion_tokens = count_tokens(text)
+        with rng_lock:
+            stats['completion_tokens'] += completion_tokens
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get('model', 'mock')
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                 'total_tokens': prompt_tokens + completion_tokens}
+
+        if body.get('stream'):
+            with rng_lock:
+                stats['streamed'] += 1
+            return Response(stream(completion_id, created, model, text, usage), mimetype='text/event-stream')
+
+        if token_ms:
+            time.sleep(completion_tokens * token_ms / 1000)
+        return jsonify({
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': created,
+            'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+            'usage': usage
+        })
+
+    def stream(completion_id, created, model, text, usage):
+        def chunk(delta, finish_reason=None, **extra):
+            payload = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                       'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}], **extra}
+            return f"data: {json.dumps(payload)}\n\n"
+
+        yield chunk({'role': 'assistant', 'content': ''})
+        for index, word in enumerate(text.split(" ")):
+            if token_ms:
+                time.sleep(count_tokens(word) * token_ms / 1000)
+            yield chunk({'content': word if index == 0 else " " + word})
+        yield chunk({}, 'stop', usage=usage)
+        yield "data: [DONE]\n\n"
+
+    @app.route('/openai/v1/models', methods=['GET'])
+    @app.route('/v1/models', methods=['GET'])
+    def models():
+        return jsonify({'object': 'list', 'data': [{'id': 'llama-3.2-3b-preview', 'object': 'model', 'owned_by': 'mock'}]})
+
+    @app.route('/mock/stats', methods=['GET'])
+    def get_stats():
+        with rng_lock:
+            return jsonify(dict(stats, latency=latency.kind, in_brownout=latency.in_brownout()))
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Groq/OpenAI chat completions server for load tests.")
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', choices=['fixed', 'lognormal', 'brownout'], default='fixed')
+    parser.add_argument('--latency-ms', type=float, default=300, help="Fixed or median time to first token")
+    parser.add_argument('--sigma', type=float, default=0.5, help="Lognormal spread")
+    parser.add_argument('--brownout-period', type=float, default=60, help="Seconds between brownout starts")
+    parser.add_argument('--brownout-duration', type=float, default=10, help="Seconds each brownout lasts")
+    parser.add_argument('--brownout-factor', type=float, default=8, help="Latency multiplier during a brownout")
+    parser.add_argument('--token-ms', type=float, default=0, help="Generation time per completion token")
+    parser.add_argument('--script', help='JSON {"rules": [{"match": regex, "response": text}], "default": text}')
+    parser.add_argument('--rate-429', type=float, default=0.0, help="Fraction of requests rejected with 429")
+    parser.add_argument('--rate-5xx', type=float, default=0.0, help="Fraction of requests failing with 500/502/503")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    latency = LatencyProfile(args.latency, args.latency_ms, args.sigma,
+                             args.brownout_period, args.brownout_duration, args.brownout_factor)
+    app = create_app(latency, Responder(args.script), args.rate_429, args.rate_5xx, args.token_ms, args.seed)
+    app.run(host="127.0.0.1", port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from datetime import datetime
-from config import MAX_SESSION_TOKENS
+from config import MAX_SESSION_TOKENS, MAX_TOKENS_PER_RESPONSE
 from utils import (count_tokens, set_custom_prompt, is_greeting, is_booking_intent, appointment_booking, 
                    is_insurance_related, generate_and_validate_response, save_interaction)
 
@@ -8,7 +8,7 @@ def qa_bot():
     prompt_template = set_custom_prompt()
     tokens_count = 0
 
-    while tokens_count <= MAX_SESSION_TOKENS:
+    while tokens_count < MAX_SESSION_TOKENS:
         query = input("YOU: ")
         ques_tok = count_tokens(query)
         tokens_count += ques_tok
@@ -28,8 +28,14 @@ def qa_bot():
             tokens_count += count_tokens(booking_response)
             continue
 
+        # Cap the answer at what is left of the session budget
+        remaining_tokens = MAX_SESSION_TOKENS - tokens_count
+        if remaining_tokens <= 0:
+            break
+
         # Generate and validate response
-        validated_answer = generate_and_validate_response(query, prompt_template)
+        validated_answer = generate_and_validate_response(
+            query, prompt_template, min(MAX_TOKENS_PER_RESPONSE, remaining_tokens))
 
         # Token counts and logging
         ans_tok = count_tokens(validated_answer)
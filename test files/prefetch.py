@@ -0,0 +1,92 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+class QueryCache:
+    """Thread-safe LRU cache keyed by normalized query that tracks which entries were prefetched."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, prefetched and not yet used)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "prefetched": 0, "prefetch_hits": 0}
+
+    def __contains__(self, key):
+        # Peek without touching recency or hit counters
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            value, prefetched = entry
+            if prefetched:
+                # Count each warmed entry once, on its first real use
+                self._stats["prefetch_hits"] += 1
+                self._entries[key] = (value, False)
+            return value
+
+    def put(self, key, value, prefetched=False):
+        with self._lock:
+            self._entries[key] = (value, prefetched)
+            self._entries.move_to_end(key)
+            if prefetched:
+                self._stats["prefetched"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["prefetch_hit_rate"] = stats["prefetch_hits"] / stats["prefetched"] if stats["prefetched"] else 0.0
+        return stats
+
+class Prefetcher:
+    """Run speculative work on a small thread pool, dropping it rather than queueing past max_pending."""
+
+    def __init__(self, max_workers, max_pending):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "dropped": 0}
+
+    def submit(self, key, fn):
+        """Queue fn unless work for the same key is already pending; returns whether it was queued."""
+        with self._lock:
+            if key in self._pending:
+                return False
+            if len(self._pending) >= self.max_pending:
+                self._stats["dropped"] += 1
+                return False
+            self._pending.add(key)
+            self._stats["submitted"] += 1
+        self._executor.submit(self._run, key, fn)
+        return True
+
+    def _run(self, key, fn):
+        try:
+            fn()
+            outcome = "completed"
+        except Exception as e:
+            print(f"Prefetch for {key} failed: {e}")
+            outcome = "failed"
+        with self._lock:
+            self._pending.discard(key)
+            self._stats[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, pending=len(self._pending))
@@ -1,15 +1,30 @@
 import os
+import re
 import csv
 import json
-from langchain_huggingface import HuggingFaceEmbeddings
+import hashlib
+import threading
+import time
+from functools import lru_cache
+import numpy as np
 import requests
 from datetime import datetime
-from langchain.prompts import PromptTemplate
 from dotenv import load_dotenv
 from config import (GREETINGS, INSURANCE_KEYWORDS, BOOKING_KEYWORDS, CUSTOM_PROMPT_TEMPLATE, 
-                    APPOINTMENTS_CSV_PATH, CHATBOT_DATA_PATH, db, SEARCH_DOCS)
+                    APPOINTMENTS_CSV_PATH, CHATBOT_DATA_PATH, db, SEARCH_DOCS, GROQ_TIMEOUT,
+                    FAQ_INDEX_PATH, FAQ_MATCH_THRESHOLD, TOKENIZER_MODEL, MAX_TOKENS_PER_RESPONSE,
+                    INSURANCE_TYPES, PREFETCH_FOLLOWUPS, EMBEDDING_CACHE_SIZE, RETRIEVAL_CACHE_SIZE,
+                    PREFETCH_WORKERS, PREFETCH_MAX_PENDING, GROQ_REQUESTS_PER_MINUTE,
+                    GROQ_TOKENS_PER_MINUTE, GROQ_MAX_CONCURRENT, GROQ_MAX_QUEUE, GROQ_QUEUE_TIMEOUT,
+                    BUSY_RESPONSE, GROQ_BASE_URL, LLM_MIN_BUDGET_SECONDS,
+                    ANSWER_CACHE_SIZE, FAQ_FALLBACK_THRESHOLD, DEADLINE_RESPONSE, CONTEXT_FETCH_DOCS,
+                    CONTEXT_TOKEN_BUDGET, CONTEXT_MMR_LAMBDA, CONTEXT_DUPLICATE_THRESHOLD)
 from difflib import SequenceMatcher
-from langchain.vectorstores import FAISS
+from faq import FaqIndex, normalize_question
+from prefetch import QueryCache, Prefetcher
+from admission import AdmissionController, AdmissionRejected
+from deadline import Deadline, DeadlineExceeded
+from assembly import Chunk, ContextAssembler
 
 # Load environment variables at the start
 load_dotenv()
@@ -18,12 +33,31 @@ load_dotenv()
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 DB_FAISS_PATH = os.getenv('DB_FAISS_PATH')
 
-# Token counting function
+# Rough BPE estimate used only when the tokenizer cannot be loaded
+APPROX_TOKEN_PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+
+# Load the tokenizer matching the Groq model once per process
+@lru_cache(maxsize=1)
+def get_tokenizer():
+    try:
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(TOKENIZER_MODEL)
+    except Exception as e:
+        print(f"Warning: could not load tokenizer '{TOKENIZER_MODEL}' ({e}). Token counts are approximate.")
+        return None
+
+# Token counting function, memoized so each message is tokenized once
+@lru_cache(maxsize=4096)
 def count_tokens(text):
-    return len(text.split())
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return len(APPROX_TOKEN_PATTERN.findall(text))
+    return len(tokenizer.encode(text, add_special_tokens=False))
 
-# Load the custom prompt template
+# Load the custom prompt template once; LangChain is imported on first use
+@lru_cache(maxsize=1)
 def set_custom_prompt():
+    from langchain.prompts import PromptTemplate
     return PromptTemplate(template=CUSTOM_PROMPT_TEMPLATE, input_variables=['context', 'question'])
 
 # Check if the query is a greeting
@@ -70,9 +104,85 @@ def save_interaction(timestamp, query, ques_tok, answer, ans_tok, tokens_count):
         writer = csv.writer(file)
         writer.writerow([timestamp, query, ques_tok, answer, ans_tok, tokens_count])
 
-# Send a prompt to the Groq API and get response
-def get_groq_response(prompt):
-    url = "https://api.groq.com/openai/v1/chat/completions"
+# Identical prompts in flight at the same time share one upstream Groq call
+_inflight_lock = threading.Lock()
+_inflight_calls = {}
+coalescing_stats = {'upstream_calls': 0, 'upstream_calls_saved': 0, 'timeouts': 0, 'abandoned': 0}
+
+# Reused HTTP connections to Groq instead of a new TLS handshake per call
+groq_session = requests.Session()
+
+# Every upstream call waits here so a traffic spike cannot exhaust the Groq quota
+admission = AdmissionController(GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE,
+                                GROQ_MAX_CONCURRENT, GROQ_MAX_QUEUE, GROQ_QUEUE_TIMEOUT)
+
+# Send a prompt to the Groq API and get response, within what is left of the deadline if given
+def get_groq_response(prompt, timeout=GROQ_TIMEOUT, max_tokens=MAX_TOKENS_PER_RESPONSE, deadline=None):
+    if deadline is not None:
+        timeout = deadline.timeout("llm", timeout)
+    normalized = f"{max_tokens}:{' '.join(prompt.split()).lower()}"
+    key = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+    
+    expires = time.monotonic() + timeout
+    with _inflight_lock:
+        call = _inflight_calls.get(key)
+        leader = call is None
+        if leader:
+            # waiters holds the monotonic expiry of every caller still waiting for the result
+            call = _inflight_calls[key] = {'done': threading.Event(), 'result': None, 'error': None, 'waiters': []}
+            coalescing_stats['upstream_calls'] += 1
+        else:
+            coalescing_stats['upstream_calls_saved'] += 1
+        call['waiters'].append(expires)
+    if leader:
+        threading.Thread(target=run_shared_call, args=(key, call, prompt, max_tokens), daemon=True).start()
+    
+    # Every caller, including the one that started the call, waits within its own timeout
+    if not call['done'].wait(timeout):
+        with _inflight_lock:
+            call['waiters'].remove(expires)
+            coalescing_stats['timeouts'] += 1
+        if deadline is not None:
+            raise DeadlineExceeded("llm")
+        return "Error: Unable to get response. Timed out."
+    if call['error'] is not None:
+        raise call['error']
+    return call['result']
+
+# One upstream call shared by every caller of the same prompt; the request is bounded by GROQ_TIMEOUT, not by
+# any one caller's deadline, but admission waits no longer than the caller who can wait longest and the call
+# is skipped once every caller has given up
+def run_shared_call(key, call, prompt, max_tokens):
+    try:
+        remaining = shared_call_budget(key, call)
+        if remaining > 0:
+            with admission.admit(tokens=count_tokens(prompt) + max_tokens, timeout=min(GROQ_TIMEOUT, remaining)):
+                remaining = shared_call_budget(key, call)
+                if remaining > 0:
+                    call['result'] = request_groq_completion(prompt, GROQ_TIMEOUT, max_tokens)
+        if remaining <= 0:
+            call['error'] = DeadlineExceeded("llm")
+    except Exception as e:
+        call['error'] = e
+    finally:
+        with _inflight_lock:
+            if _inflight_calls.get(key) is call:
+                del _inflight_calls[key]
+        call['done'].set()
+
+# Seconds left for the caller of a shared call that can wait longest; at zero the call is abandoned
+# and taken out of the table in the same step, so no new caller can join it
+def shared_call_budget(key, call):
+    with _inflight_lock:
+        now = time.monotonic()
+        remaining = max(call['waiters'], default=now) - now
+        if remaining <= 0 and _inflight_calls.get(key) is call:
+            del _inflight_calls[key]
+            coalescing_stats['abandoned'] += 1
+        return remaining
+
+def request_groq_completion(prompt, timeout, max_tokens):
+    url = f"{GROQ_BASE_URL}/openai/v1/chat/completions"
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {GROQ_API_KEY}"
@@ -82,39 +192,269 @@ def get_groq_response(prompt):
         "messages": [{
             "role": "user",
             "content": prompt
-        }]
+        }],
+        "max_tokens": max_tokens
     }
     
-    response = requests.post(url, headers=headers, json=data)
+    response = groq_session.post(url, headers=headers, json=data, timeout=timeout)
     if response.status_code == 200:
         return response.json()['choices'][0]['message']['content']
     else:
         return f"Error: Unable to get response. Status code: {response.status_code}"
 
+# Query embeddings and retrieved context, keyed by normalized query text
+embedding_cache = QueryCache(EMBEDDING_CACHE_SIZE)
+retrieval_cache = QueryCache(RETRIEVAL_CACHE_SIZE)
+prefetcher = Prefetcher(PREFETCH_WORKERS, PREFETCH_MAX_PENDING)
+
+# Embed a query, reusing the vector for repeated or prefetched questions
+def embed_query(query):
+    key = normalize_question(query)
+    vector = embedding_cache.get(key)
+    if vector is None:
+        vector = get_embeddings().embed_query(query)
+        embedding_cache.put(key, vector)
+    return vector
+
+# Merges overlapping chunks, drops near-duplicates and picks diverse ones within the token budget
+context_assembler = ContextAssembler(count_tokens, CONTEXT_TOKEN_BUDGET, SEARCH_DOCS, CONTEXT_MMR_LAMBDA,
+                                     CONTEXT_DUPLICATE_THRESHOLD, baseline_docs=SEARCH_DOCS)
+_context_lock = threading.Lock()
+context_stats = {"prompts": 0, "baseline_prompt_tokens": 0, "prompt_tokens": 0}
+
+# Nearest chunks with their stored vectors, read straight from the FAISS index
+def retrieve_chunks(query_vector, k=CONTEXT_FETCH_DOCS):
+    db = get_db()
+    _, ids = db.index.search(np.asarray([query_vector], dtype=np.float32), k)
+    chunks = []
+    for index in ids[0]:
+        if index == -1:
+            continue
+        doc = db.docstore.search(db.index_to_docstore_id[index])
+        chunks.append(Chunk(doc.page_content, doc.metadata.get("source"), doc.metadata.get("page"),
+                            db.index.reconstruct(int(index))))
+    return chunks
+
+# Assembled context for a query vector, with the token count of the raw top SEARCH_DOCS chunks it replaces
+def assemble_context(query_vector):
+    context, stats = context_assembler.assemble(query_vector, retrieve_chunks(query_vector))
+    return context, stats["baseline_tokens"]
+
+# Get (context, baseline_tokens) from FAISS; a cached context is returned even when the deadline has passed
+def retrieve_context(query, query_vector=None, deadline=None):
+    key = normalize_question(query)
+    cached = retrieval_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    if deadline is not None:
+        deadline.check("retrieval")
+    if query_vector is None:
+        query_vector = embed_query(query)
+    cached = assemble_context(query_vector)
+    retrieval_cache.put(key, cached)
+    return cached
+
 # Get relevant context from FAISS database
-def get_relevant_context(query):
-    docs = db.similarity_search(query, k=SEARCH_DOCS)
-    return " ".join([doc.page_content for doc in docs])
+def get_relevant_context(query, query_vector=None, deadline=None):
+    return retrieve_context(query, query_vector, deadline)[0]
 
-# Initialize embeddings and database if not already initialized
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-db = FAISS.load_local(DB_FAISS_PATH, embeddings, allow_dangerous_deserialization=True)
+# Log a prompt's tokens next to what the raw concatenated chunks would have cost
+def log_prompt_tokens(prompt, context, baseline_context_tokens):
+    prompt_tokens = count_tokens(prompt)
+    baseline = prompt_tokens - count_tokens(context) + baseline_context_tokens
+    with _context_lock:
+        context_stats["prompts"] += 1
+        context_stats["baseline_prompt_tokens"] += baseline
+        context_stats["prompt_tokens"] += prompt_tokens
+    print(f"Prompt tokens: {baseline} before context assembly, {prompt_tokens} after")
+    return {"before": baseline, "after": prompt_tokens}
 
-# Generate and validate response
-def generate_and_validate_response(query, prompt_template ):
-    """
-    Generate and validate response for a given query using Groq API with context from FAISS.
-    """
-    # Get relevant context from FAISS database
-    context = get_relevant_context(query)
+def context_assembly_stats():
+    with _context_lock:
+        stats = dict(context_stats)
+    baseline = stats["baseline_prompt_tokens"]
+    stats["tokens_saved_rate"] = 1 - stats["prompt_tokens"] / baseline if baseline else 0.0
+    return stats
+
+# Find the insurance type a query is about, matched on its product word (e.g. "health")
+def find_insurance_type(query):
+    words = set(normalize_question(query).split())
+    for insurance_type in INSURANCE_TYPES:
+        if insurance_type.split()[0] in words:
+            return insurance_type
+    return None
+
+# Warm both caches for one question without counting it as a lookup
+def warm_query(query):
+    key = normalize_question(query)
+    if key in retrieval_cache:
+        return
+    vector = get_embeddings().embed_query(query)
+    embedding_cache.put(key, vector, prefetched=True)
+    retrieval_cache.put(key, assemble_context(vector), prefetched=True)
+
+# Speculatively retrieve the top chunks for an insurance type and its common follow-ups
+def prefetch_insurance_type(insurance_type):
+    if normalize_question(insurance_type) in retrieval_cache:
+        return False
     
-    # Format prompt with the query and context
-    prompt = prompt_template.format(context=context, question=query)
+    def warm():
+        warm_query(insurance_type)
+        for followup in PREFETCH_FOLLOWUPS:
+            warm_query(followup.format(insurance_type=insurance_type))
     
-    # Generate the response using Groq API
-    answer = get_groq_response(prompt)
+    return prefetcher.submit(insurance_type, warm)
+
+# Cache and prefetch counters for the metrics endpoint
+def retrieval_stats():
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "retrieval_cache": retrieval_cache.stats(),
+        "prefetch": prefetcher.stats()
+    }
+
+# Look up a precomputed FAQ answer by exact question, or by nearest neighbour when given a query vector
+def find_faq_answer(query, query_vector=None):
+    faq_index = get_faq_index()
+    if faq_index is None:
+        return None
+    if query_vector is None:
+        return faq_index.match_text(query)
+    entry, _ = faq_index.match_vector(query_vector)
+    return entry
+
+# Embedding model, FAISS database and FAQ index load on first use (or during warm-up),
+# so importing this module does not pull in LangChain or the model
+@lru_cache(maxsize=1)
+def get_embeddings():
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+
+@lru_cache(maxsize=1)
+def get_db():
+    from langchain.vectorstores import FAISS
+    return FAISS.load_local(DB_FAISS_PATH, get_embeddings(), allow_dangerous_deserialization=True)
+
+@lru_cache(maxsize=1)
+def get_faq_index():
+    return FaqIndex.load(FAQ_INDEX_PATH, FAQ_MATCH_THRESHOLD)
+
+# Open a pooled connection to Groq with a request that uses no completion quota
+def open_groq_connection():
+    response = groq_session.get(f"{GROQ_BASE_URL}/openai/v1/models",
+                                headers={"Authorization": f"Bearer {GROQ_API_KEY}"}, timeout=GROQ_TIMEOUT)
+    response.raise_for_status()
+
+# Work that would otherwise land on the first request, as (name, step) pairs for WarmUp
+def warm_up_steps():
+    return [
+        ("prompt_template", set_custom_prompt),
+        ("tokenizer", get_tokenizer),
+        ("embedding_model", lambda: get_embeddings().embed_query("warm-up")),
+        ("faiss_index", get_db),
+        ("faq_index", get_faq_index),
+        ("llm_connection", open_groq_connection)
+    ]
+
+# Validated LLM answers by normalized query, served only when a request cannot get a fresh one
+answer_cache = QueryCache(ANSWER_CACHE_SIZE)
+_serving_lock = threading.Lock()
+serving_stats = {}
+
+# Best answer available without more work: a cached LLM answer, a close FAQ entry, or the template
+def fallback_response(query, query_vector, template):
+    answer = answer_cache.get(normalize_question(query))
+    if answer is not None:
+        return answer, "cache"
+    faq_index = get_faq_index()
+    if faq_index is not None and query_vector is not None:
+        entry, _ = faq_index.match_vector(query_vector, FAQ_FALLBACK_THRESHOLD)
+        if entry is not None:
+            return entry["answer"], "faq_fallback"
+    return template, "template"
+
+# Count which path served each answer and describe it for the response metadata
+def served(answer, served_by, deadline, degraded_at=None, **extra):
+    with _serving_lock:
+        serving_stats[served_by] = serving_stats.get(served_by, 0) + 1
+    return answer, {
+        "served_by": served_by,
+        "degraded": degraded_at is not None,
+        "degraded_at": degraded_at,
+        "elapsed_ms": round(deadline.elapsed() * 1000),
+        "stages_ms": {stage: round(seconds * 1000, 1) for stage, seconds in deadline.laps.items()},
+        **extra
+    }
+
+# Generate a response and report which path produced it
+def generate_response(query, prompt_template, max_tokens=MAX_TOKENS_PER_RESPONSE, deadline=None):
+    """
+    Answer a query from the FAQ index or the Groq API with context from FAISS.
+    Each stage checks the deadline (none by default); when it runs out, or admission
+    control sheds the LLM call, the best fallback is served instead.
+    Returns (answer, meta) where meta["served_by"] is faq, llm, cache, faq_fallback or template.
+    """
+    deadline = deadline or Deadline(float("inf"))
+    query_vector = None
+    try:
+        # Once the user names an insurance type, warm retrieval for the questions likely to follow
+        insurance_type = find_insurance_type(query)
+        if insurance_type:
+            prefetch_insurance_type(insurance_type)
+        
+        # Serve vetted FAQ answers without calling the LLM
+        entry = find_faq_answer(query)
+        deadline.lap("faq")
+        if entry is not None:
+            return served(entry["answer"], "faq", deadline)
+        
+        # Embed once and reuse the vector for the FAQ match and retrieval
+        deadline.check("embedding")
+        query_vector = embed_query(query)
+        deadline.lap("embedding")
+        entry = find_faq_answer(query, query_vector)
+        deadline.lap("faq")
+        if entry is not None:
+            return served(entry["answer"], "faq", deadline)
+        
+        # Get relevant context from FAISS database, merged, de-duplicated and trimmed to budget
+        context, baseline_context_tokens = retrieve_context(query, query_vector, deadline)
+        deadline.lap("retrieval")
+        
+        # Format prompt with the query and context
+        prompt = prompt_template.format(context=context, question=query)
+        prompt_tokens = log_prompt_tokens(prompt, context, baseline_context_tokens)
+        deadline.lap("prompt")
+        
+        # Not worth starting a completion that cannot finish in time
+        deadline.check("llm", LLM_MIN_BUDGET_SECONDS)
+        answer = get_groq_response(prompt, max_tokens=max_tokens, deadline=deadline)
+        deadline.lap("llm")
+        
+        # Validate response
+        validated_answer = validate_response(answer, context)
+        deadline.lap("validation")
+        if not answer.startswith("Error:"):
+            answer_cache.put(normalize_question(query), validated_answer)
+        return served(validated_answer, "llm", deadline, prompt_tokens=prompt_tokens)
     
-    # Validate response
-    validated_answer = validate_response(answer, context)
+    except DeadlineExceeded as e:
+        degraded_at, template = e.stage, DEADLINE_RESPONSE
+    except requests.Timeout:
+        degraded_at, template = "llm", DEADLINE_RESPONSE
+    except AdmissionRejected:
+        # Shed to a canned reply when over quota
+        degraded_at, template = "admission", BUSY_RESPONSE
     
-    return validated_answer
\ No newline at end of file
+    answer, served_by = fallback_response(query, query_vector, template)
+    return served(answer, served_by, deadline, degraded_at)
+
+# Generate and validate response
+def generate_and_validate_response(query, prompt_template, max_tokens=MAX_TOKENS_PER_RESPONSE, deadline=None):
+    """
+    Generate and validate response for a given query using Groq API with context from FAISS.
+    max_tokens caps the generated answer, e.g. to what is left of a session's budget.
+    """
+    answer, _ = generate_response(query, prompt_template, max_tokens, deadline)
+    return answer
\ No newline at end of file
@@ -4,7 +4,8 @@ import { Rate, Trend } from 'k6/metrics';
 import { randomItem } from 'https://jslib.k6.io/k6-utils/1.2.0/index.js';
 
 // Configuration constants
-const BASE_URL = 'http://localhost:5005/chat';
+// Override with `k6 run -e BASE_URL=...` to compare the Flask and ASGI servers
+const BASE_URL = __ENV.BASE_URL || 'http://localhost:5005/chat';
 const TEST_DURATION = '15s';
 const VIRTUAL_USERS = 10;
 